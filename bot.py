@@ -1,7 +1,12 @@
 import os
+import html
+import signal
 import logging
 import asyncio
+import time
+import uuid
 from telegram import InputMediaVideo, Update, InputFile, InlineKeyboardButton, InlineKeyboardMarkup, ChatMember
+from telegram import InlineQueryResultCachedVideo
 from telegram.constants import ChatMemberStatus
 from telegram.ext import (
     Application,
@@ -10,19 +15,47 @@ from telegram.ext import (
     filters,
     ContextTypes,
     CallbackQueryHandler,
+    InlineQueryHandler,
+    TypeHandler,
+    ApplicationHandlerStop,
 )
-from config import config
 import sys
 from updater import update_from_upstream
 from telegram.error import BadRequest, RetryAfter
 import random
 from database import (
     save_thumbnail, get_thumbnail, delete_thumbnail, has_thumbnail,
+    get_thumbnail_record, migrate_thumbnail_refs, get_auto_cover, set_auto_cover,
+    get_overlay, set_overlay, set_channel, get_user_channels, remove_channel,
+    add_recent_result, get_recent_results,
+    get_user_ids, create_broadcast, claim_broadcast, update_broadcast,
+    save_cluster_state, get_cluster_state, reconcile_thumbnail_refs, get_live_nodes, requeue_stale_jobs,
     ban_user, unban_user, is_user_banned, get_total_users, get_banned_users_count, get_stats,
     format_log_message, log_new_user, log_user_banned, log_user_unbanned,
     log_thumbnail_set, log_thumbnail_removed
 )
 from telegram import MessageEntity
+import metrics
+import tracing
+import botapi
+import transport
+from profiles import PROFILES, ProfileLocal, activate, current_profile
+from sharding import SHARD_WORKERS, run_sharded, shard_rate
+import cluster
+from cluster import CLUSTER_MODE, SharedVerifiedSet, VerifiedSet, cluster_node
+from cover_queue import CoverJobQueue
+from scheduler import PriorityRateLimiter, RATE_LIMIT_PER_SECOND, BACKGROUND, COVER, spawn, fan_out
+from ingest import UserOrderedUpdateProcessor, guard_update, deduplicator, catch_up
+from scheduler import drain_background_tasks, pending_background_tasks
+from exporter import metrics_server
+from shutdown import coordinator
+from bulk import bulk_sessions
+from flood import ACTION_VIDEO, flood_control, flood_gate
+from channels import ChannelQueue, ChannelConfigCache
+from router import CallbackRouter, require
+from screens import Screen, screens
+from imaging import shutdown_pool, auto_cover, download_file
+from imaging import OVERLAY_POSITIONS, render_cover
 
 def bold_entities(text: str):
     """Return entities list to make full caption bold"""
@@ -36,18 +69,35 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Token from config or environment
-TOKEN = getattr(config, "BOT_TOKEN", None) or os.environ.get("BOT_TOKEN")
-if not TOKEN:
+# Tokens from BOT_PROFILES_FILE, or BOT_TOKEN from config or environment
+if not PROFILES or not all(profile.token for profile in PROFILES):
     logger.error("BOT_TOKEN not set in config or environment (config.env).")
     raise SystemExit("BOT_TOKEN not set")
 
 OWNER_ID = int(os.environ.get("OWNER_ID", "0"))
-FORCE_SUB_CHANNEL_ID = os.environ.get("FORCE_SUB_CHANNEL_ID")
-FORCE_SUB_BANNER_URL = os.environ.get("FORCE_SUB_BANNER_URL")
-HOME_MENU_BANNER_URL = os.environ.get("HOME_MENU_BANNER_URL")
 OWNER_USERNAME = os.environ.get("OWNER_USERNAME", "")
-LOG_CHANNEL_ID = os.environ.get("LOG_CHANNEL_ID")
+# Force-sub channel, banners and log channel are per bot: see profiles.BotProfile
+
+# Drop updates that queued up while the bot was offline
+DROP_PENDING_UPDATES = os.environ.get("DROP_PENDING_UPDATES", "false").lower() in ("1", "true", "yes")
+
+# Cover send mode: "direct" (one send_video call) or "edit" (placeholder + edit_message_media)
+COVER_SEND_MODE = os.environ.get("COVER_SEND_MODE", "direct").lower()
+
+# Users fetched per page while broadcasting (progress is saved per page in cluster mode)
+BROADCAST_PAGE_SIZE = int(os.environ.get("BROADCAST_PAGE_SIZE", "200"))
+
+# Video pre-check limits (applied from message metadata, before any API call)
+MAX_VIDEO_SIZE_MB = int(os.environ.get("MAX_VIDEO_SIZE_MB", "2000"))
+MAX_VIDEO_DURATION = int(os.environ.get("MAX_VIDEO_DURATION", "0"))  # seconds, 0 = no limit
+ALLOWED_VIDEO_MIME_TYPES = [
+    m.strip().lower()
+    for m in os.environ.get(
+        "ALLOWED_VIDEO_MIME_TYPES",
+        "video/mp4,video/x-matroska,video/quicktime,video/webm,video/x-msvideo",
+    ).split(",")
+    if m.strip()
+]
 
 # Fallback: collect images from ./ui/ and pick randomly when showing banner
 FALLBACK_BANNER = None
@@ -62,13 +112,10 @@ except Exception:
     UI_BANNERS = []
     FALLBACK_BANNER = None
 
-# Final banner env value (may be URL) or local fallback
-FORCE_SUB_BANNER = FORCE_SUB_BANNER_URL or FALLBACK_BANNER
-
 def get_force_banner():
     """Return a banner URL or local file path. Prefer env URL; else pick random local image."""
-    if FORCE_SUB_BANNER_URL:
-        return FORCE_SUB_BANNER_URL
+    if current_profile().force_sub_banner_url:
+        return current_profile().force_sub_banner_url
     try:
         if UI_BANNERS:
             return random.choice(UI_BANNERS)
@@ -77,23 +124,30 @@ def get_force_banner():
     return FALLBACK_BANNER
 
 
-# In-memory set of users who completed the verify step
-verified_users = set()
+# Users who completed the verify step (per bot: each has its own force-sub channel); shared by all nodes in cluster mode
+verified_users = ProfileLocal(SharedVerifiedSet if CLUSTER_MODE else VerifiedSet)
 
 """═════════════════ LOGGING HELPER ═════════════════"""
 async def send_log(context: ContextTypes.DEFAULT_TYPE, log_message: str) -> bool:
-    """Send log message to log channel"""
-    if not LOG_CHANNEL_ID:
+    """Queue log message for the log channel (sent in the background at low priority)"""
+    if not current_profile().log_channel_id:
         logger.debug("LOG_CHANNEL_ID not configured")
         return False
-    
+
+    spawn(deliver_log(context.bot, log_message))
+    return True
+
+
+async def deliver_log(bot, log_message: str) -> bool:
+    """Send log message to log channel"""
     try:
-        await context.bot.send_message(
-            chat_id=LOG_CHANNEL_ID,
+        await bot.send_message(
+            chat_id=current_profile().log_channel_id,
             text=log_message,
-            parse_mode="HTML"
+            parse_mode="HTML",
+            **BACKGROUND
         )
-        logger.debug(f"✅ Log sent to channel {LOG_CHANNEL_ID}")
+        logger.debug(f"✅ Log sent to channel {current_profile().log_channel_id}")
         return True
     except Exception as e:
         logger.error(f"❌ Error sending log to channel: {e}")
@@ -163,6 +217,70 @@ async def get_invite_link(bot, chat_id):
         logger.error(f"get_invite_link failed: {e}")
         return None
 
+"""--------------------VIDEO SOURCE HELPERS-----------------"""
+
+def get_video_source(message):
+    """Return the video-like attachment of a message (video, animation or video document)"""
+    if message.video:
+        return message.video
+    if message.animation:
+        return message.animation
+    document = message.document
+    if document and (document.mime_type or "").lower().startswith("video/"):
+        return document
+    return None
+
+
+# Telegram's answers when a document/animation file_id can't be re-sent as a video
+FILE_TYPE_REJECTIONS = ("type of file mismatch", "wrong file identifier")
+
+
+def is_file_type_rejection(error: Exception) -> bool:
+    return isinstance(error, BadRequest) and any(marker in str(error).lower() for marker in FILE_TYPE_REJECTIONS)
+
+
+def is_cover_rejection(error: Exception) -> bool:
+    """Telegram refused the `cover` of a send (e.g. cover parameter unsupported or invalid cover file)"""
+    return isinstance(error, BadRequest) and "cover" in str(error).lower()
+
+
+async def upload_video_source(bot, payload: dict) -> bytes:
+    """
+    Download a document/animation Telegram refused to send by file_id as a video,
+    so it can be uploaded as a new video. Raises ValueError when it is too large.
+    """
+    file_size = payload.get("file_size") or 0
+    rejection = f"ꜰɪʟᴇ ɴᴏᴛ ᴀᴄᴄᴇᴘᴛᴇᴅ ᴀs ᴠɪᴅᴇᴏ (ᴏᴠᴇʀ {botapi.DOWNLOAD_LIMIT_MB} ᴍʙ)"
+    if file_size > botapi.DOWNLOAD_LIMIT_MB * 1024 * 1024:
+        raise ValueError(rejection)
+    try:
+        return await download_file(bot, payload["video"])
+    except BadRequest as e:
+        # Size unknown up front: getFile refuses files over the download limit
+        raise ValueError(rejection) from e
+
+
+def precheck_video(media) -> str | None:
+    """Validate attachment metadata without calling the API. Returns a rejection reason or None"""
+    if media is None:
+        return "ᴜɴsᴜᴘᴘᴏʀᴛᴇᴅ ꜰɪʟᴇ ᴛʏᴘᴇ"
+
+    mime_type = (getattr(media, "mime_type", None) or "").lower()
+    # Telegram omits mime_type for some native videos; only reject explicit mismatches
+    if mime_type and ALLOWED_VIDEO_MIME_TYPES and mime_type not in ALLOWED_VIDEO_MIME_TYPES:
+        return f"ᴜɴsᴜᴘᴘᴏʀᴛᴇᴅ ꜰᴏʀᴍᴀᴛ: {mime_type}"
+
+    file_size = getattr(media, "file_size", None) or 0
+    if MAX_VIDEO_SIZE_MB and file_size > MAX_VIDEO_SIZE_MB * 1024 * 1024:
+        return f"ꜰɪʟᴇ ᴛᴏᴏ ʟᴀʀɢᴇ (ᴍᴀx {MAX_VIDEO_SIZE_MB} ᴍʙ)"
+
+    duration = getattr(media, "duration", None) or 0
+    if MAX_VIDEO_DURATION and duration > MAX_VIDEO_DURATION:
+        return f"ᴠɪᴅᴇᴏ ᴛᴏᴏ ʟᴏɴɢ (ᴍᴀx {MAX_VIDEO_DURATION}s)"
+
+    return None
+
+
 """--------------------ADMIN CHECK-----------------"""
 
 # Fancy text function removed - all text is now pre-converted to fancy font style
@@ -174,6 +292,11 @@ def is_admin(user_id: int) -> bool:
     return user_id in admin_list
 
 
+def flood_exempt(user_id: int, action: str) -> bool:
+    """Admins are never throttled, nor are videos sent into an open bulk session"""
+    return is_admin(user_id) or (action == ACTION_VIDEO and bulk_sessions.get(user_id) is not None)
+
+
 async def check_admin(update: Update) -> bool:
     """Check if user is admin and send error if not"""
     user_id = update.effective_user.id
@@ -208,15 +331,15 @@ async def check_force_sub(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         return True
 
     # If no force-sub configured, allow access
-    if not FORCE_SUB_CHANNEL_ID:
+    if not current_profile().force_sub_channel_id:
         return True
 
     # If user already verified through verify button, verify they're still a member
-    if user_id in verified_users:
+    if await verified_users.has(user_id):
         logger.info(f"🔍 User {user_id} is cached - checking if still a member...")
         
         try:
-            channel_id_str = str(FORCE_SUB_CHANNEL_ID).strip()
+            channel_id_str = str(current_profile().force_sub_channel_id).strip()
             
             # Parse channel ID
             try:
@@ -240,18 +363,18 @@ async def check_force_sub(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             
             # If no longer a member, remove from cache and show join prompt
             logger.warning(f"⚠️ User {user_id} left the channel - removing from cache")
-            verified_users.discard(user_id)
+            await verified_users.discard(user_id)
             
         except Exception as e:
             logger.warning(f"Could not verify membership for cached user {user_id}: {e}")
             # On error, remove from cache to be safe
-            verified_users.discard(user_id)
+            await verified_users.discard(user_id)
     
     logger.info(f"🔒 User {user_id} not verified or left channel - showing join prompt")
 
     # User not verified - show join prompt
     try:
-        channel_id_str = str(FORCE_SUB_CHANNEL_ID).strip()
+        channel_id_str = str(current_profile().force_sub_channel_id).strip()
         logger.info(f"📌 Channel config: {channel_id_str}")
         
         # Parse channel ID
@@ -320,7 +443,7 @@ async def check_force_sub(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         )
 
         try:
-            banner = FORCE_SUB_BANNER_URL
+            banner = current_profile().force_sub_banner_url
             
             if update.message:
                 # Send with banner if available
@@ -388,620 +511,588 @@ async def check_force_sub(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
 
 
-async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle callback query with proper force-sub verification"""
-    query = update.callback_query
-    
-    logger.info(f"🔵 CALLBACK | Data: {query.data}")
-    
-    if not query or not query.data:
-        logger.error("❌ Invalid query!")
-        return
+"""═════════════════ SCREENS ═════════════════"""
+
+# Keyboards are immutable, so static ones are built once
+ADMIN_BACK_KB = InlineKeyboardMarkup([
+    [InlineKeyboardButton("⬅️ Back", callback_data="admin_back")]
+])
+MENU_BACK_KB = InlineKeyboardMarkup([
+    [InlineKeyboardButton("⬅️ Back", callback_data="menu_back")]
+])
+THUMBNAILS_BACK_KB = InlineKeyboardMarkup([
+    [InlineKeyboardButton("⬅️ Back", callback_data="submenu_thumbnails")]
+])
+ADMIN_PANEL_KB = InlineKeyboardMarkup([
+    [InlineKeyboardButton("📊 sᴛᴀᴛɪsᴛɪᴄs", callback_data="admin_stats"),
+     InlineKeyboardButton("⏱️ sᴛᴀᴛᴜs", callback_data="admin_status")],
+    [InlineKeyboardButton("🚫 ʙᴀɴ ᴜsᴇʀ", callback_data="admin_ban"),
+     InlineKeyboardButton("✅ ᴜɴʙᴀɴ ᴜsᴇʀ", callback_data="admin_unban")],
+    [InlineKeyboardButton("📢 ʙʀᴏᴀᴅᴄᴀsᴛ", callback_data="admin_broadcast"),
+     InlineKeyboardButton("⬅️ ʙᴀᴄᴋ", callback_data="menu_back")],
+])
+ADMIN_MENU_KB = InlineKeyboardMarkup([
+    [InlineKeyboardButton("📊 sᴛᴀᴛɪsᴛɪᴄs", callback_data="admin_stats"),
+     InlineKeyboardButton("⏱️ sᴛᴀᴛᴜs", callback_data="admin_status")],
+    [InlineKeyboardButton("👥 ᴜsᴇʀs", callback_data="admin_users"),
+     InlineKeyboardButton("🚫 ʙᴀɴ ᴜsᴇʀ", callback_data="admin_ban")],
+    [InlineKeyboardButton("✅ ᴜɴʙᴀɴ ᴜsᴇʀ", callback_data="admin_unban"),
+     InlineKeyboardButton("📢 ʙʀᴏᴀᴅᴄᴀsᴛ", callback_data="admin_broadcast")],
+    [InlineKeyboardButton("⬅️ ʙᴀᴄᴋ", callback_data="menu_back")],
+])
+HOME_MENU_ROWS = [
+    [InlineKeyboardButton("❓ ʜᴇʟᴘ", callback_data="menu_help"),
+     InlineKeyboardButton("ℹ️ ᴀʙᴏᴜᴛ", callback_data="menu_about")],
+    [InlineKeyboardButton("⚙️ sᴇᴛᴛɪɴɢs", callback_data="menu_settings"),
+     InlineKeyboardButton("👨‍💻 ᴅᴇᴠᴇʟᴏᴘᴇʀ", callback_data="menu_developer")],
+]
+HOME_MENU_KB = InlineKeyboardMarkup(HOME_MENU_ROWS)
+# Admins get an extra row with the admin panel
+HOME_ADMIN_KB = InlineKeyboardMarkup(HOME_MENU_ROWS + [
+    [InlineKeyboardButton("🛡️ ᴀᴅᴍɪɴ ᴘᴀɴᴇʟ", callback_data="admin_back")]
+])
+SETTINGS_KB = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🖼 ᴛʜᴜᴍʙɴᴀɪʟs", callback_data="submenu_thumbnails")],
+    [InlineKeyboardButton("⬅️ ʙᴀᴄᴋ", callback_data="menu_back")]
+])
+THUMBNAILS_KB = InlineKeyboardMarkup([
+    [InlineKeyboardButton("💾 sᴀᴠᴇ ᴛʜᴜᴍʙɴᴀɪʟ", callback_data="thumb_save_info"),
+     InlineKeyboardButton("👁️ sʜᴏᴡ ᴛʜᴜᴍʙɴᴀɪʟ", callback_data="thumb_show")],
+    [InlineKeyboardButton("🗑️ ᴅᴇʟᴇᴛᴇ ᴛʜᴜᴍʙɴᴀɪʟ", callback_data="thumb_delete"),
+     InlineKeyboardButton("⬅️ ʙᴀᴄᴋ", callback_data="menu_settings")]
+])
+
+DEV_CONTACT = f"https://t.me/{OWNER_USERNAME}" if OWNER_USERNAME else f"tg://user?id={OWNER_ID}"
+HOME_TEXT = (
+    "<b>ᴡᴇʟᴄᴏᴍᴇ ᴛᴏ ɪɴsᴛᴀɴᴛ ᴄᴏᴠᴇʀ ʙᴏᴛ</b>\n\n"
+    "🎬 ᴘʀᴏꜰᴇssɪᴏɴᴀʟ ᴠɪᴅᴇᴏ ᴄᴏᴠᴇʀ ᴛᴏᴏʟ\n\n"
+    "ǫᴜɪᴄᴋ sᴛᴀʀᴛ:\n\n"
+    "📸 ᴜᴘʟᴏᴀᴅ ᴘʜᴏᴛᴏ\n"
+    "   ʏᴏᴜʀ ᴛʜᴜᴍʙɴᴀɪʟ sᴀᴠᴇs ᴀᴜᴛᴏᴍᴀᴛɪᴄᴀʟʟʏ\n\n"
+    "🎥 sᴇɴᴅ ᴠɪᴅᴇᴏ\n"
+    "   ᴛʜᴜᴍʙɴᴀɪʟ ᴀᴘᴘʟɪᴇs ɪɴsᴛᴀɴᴛʟʏ\n\n"
+    "ᴋᴇʏ ꜰᴇᴀᴛᴜʀᴇs:\n"
+    "✅ ᴏɴᴇ-ᴄʟɪᴄᴋ ᴀᴘᴘʟɪᴄᴀᴛɪᴏɴ\n"
+    "✅ ʜɪɢʜ-ǫᴜᴀʟɪᴛʏ ᴄᴏᴠᴇʀs\n"
+    "✅ ᴀᴜᴛᴏᴍᴀᴛɪᴄ ᴍᴀɴᴀɢᴇᴍᴇɴᴛ\n\n"
+    "ᴄᴏᴍᴍᴀɴᴅs:\n"
+    "/help – ᴄᴏᴍᴘʟᴇᴛᴇ ɢᴜɪᴅᴇ\n"
+    "/settings – ᴍᴀɴᴀɢᴇ ᴄᴏɴᴛᴇɴᴛ\n"
+    "/about – ᴍᴏʀᴇ ɪɴꜰᴏʀᴍᴀᴛɪᴏɴ"
+)
+THUMBNAILS_TEXT = (
+    "🖼️ <b>ᴛʜᴜᴍʙɴᴀɪʟ ᴍᴀɴᴀɢᴇʀ</b>\n\n"
+    "<b>ᴄᴜʀʀᴇɴᴛ sᴛᴀᴛᴜs:</b> {status}\n\n"
+    "📚 <b>ᴀᴠᴀɪʟᴀʙʟᴇ ᴀᴄᴛɪᴏɴs:</b>\n\n"
+    "💾 sᴀᴠᴇ ᴛʜᴜᴍʙɴᴀɪʟ\n"
+    "ᴜᴘʟᴏᴀᴅ ᴀ ɴᴇᴡ ᴘʜᴏᴛᴏ ᴀs ʏᴏᴜʀ ᴠɪᴅᴇᴏ ᴄᴏᴠᴇʀ\n\n"
+    "👁️ sʜᴏᴡ ᴛʜᴜᴍʙɴᴀɪʟ\n"
+    "ᴘʀᴇᴠɪᴇᴡ ʏᴏᴜʀ ᴄᴜʀʀᴇɴᴛʟʏ sᴀᴠᴇᴅ ᴛʜᴜᴍʙɴᴀɪʟ\n\n"
+    "🗑️ ᴅᴇʟᴇᴛᴇ ᴛʜᴜᴍʙɴᴀɪʟ\n"
+    "ʀᴇᴍᴏᴠᴇ ʏᴏᴜʀ sᴀᴠᴇᴅ ᴛʜᴜᴍʙɴᴀɪʟ"
+)
 
+# Rendered once here; handlers only pick a screen
+screens.add("home", HOME_TEXT, HOME_MENU_KB)
+screens.add("home_admin", HOME_TEXT, HOME_ADMIN_KB)
+screens.add("menu_home", (
+    "👋 ᴡᴇʟᴄᴏᴍᴇ ᴛᴏ ɪɴsᴛᴀɴᴛ ᴄᴏᴠᴇʀ ʙᴏᴛ\n\n"
+    "<b>Quick Start Guide:</b>\n\n"
+    "📸 <b>Step 1:</b> Send a photo as thumbnail\n"
+    "🎥 <b>Step 2:</b> Send a video to apply cover\n\n"
+    "<b>Navigation:</b>\n"
+    "❓ /help – Usage guide\n"
+    "⚙️ /settings – Manage thumbnails\n"
+    "ℹ️ /about – Bot information"
+), HOME_MENU_KB)
+screens.add("help", (
+    "📖 ᴄᴏᴍᴘʟᴇᴛᴇ ɢᴜɪᴅᴇ\n\n"
+    "<b>sᴛᴇᴘ-ʙʏ-sᴛᴇᴘ ɪɴsᴛʀᴜᴄᴛɪᴏɴs:</b>\n\n"
+    "<b>1️⃣ ᴜᴘʟᴏᴀᴅ ʏᴏᴜʀ ᴛʜᴜᴍʙɴᴀɪʟ</b>\n"
+    "   • sᴇɴᴅ ᴀ ʜɪɢʜ-qᴜᴀʟɪᴛʏ ᴘʜᴏᴛᴏ\n"
+    "   • ɪᴛ sᴀᴠᴇs ᴀᴜᴛᴏᴍᴀᴛɪᴄᴀʟʟʏ ᴀs ʏᴏᴜʀ ᴄᴏᴠᴇʀ\n\n"
+    "<b>2️⃣ ᴀᴘᴘʟʏ ᴛᴏ ᴠɪᴅᴇᴏs</b>\n"
+    "   • sᴇɴᴅ ᴀɴʏ ᴠɪᴅᴇᴏ ꜰɪʟᴇ\n"
+    "   • ᴄᴏᴠᴇʀ ᴀᴘᴘʟɪᴇs ɪɴsᴛᴀɴᴛʟʏ\n\n"
+    "<b>3️⃣ ᴅᴏᴡɴʟᴏᴀᴅ & sʜᴀʀᴇ</b>\n"
+    "   • ʏᴏᴜʀ ᴠɪᴅᴇᴏ ᴡɪᴛʜ ᴄᴏᴠᴇʀ ɪs ʀᴇᴀᴅʏ\n"
+    "   • ᴅᴏᴡɴʟᴏᴀᴅ ᴀɴᴅ sʜᴀʀᴇ ᴀɴʏᴡʜᴇʀᴇ\n\n"
+    "<b>💡 ᴘʀᴏ ᴛɪᴘs:</b>\n"
+    "✓ ʜɪɢʜ-qᴜᴀʟɪᴛʏ ᴘʜᴏᴛᴏs ᴡᴏʀᴋ ʙᴇsᴛ\n"
+    "✓ ᴜᴘᴅᴀᴛᴇ ᴛʜᴜᴍʙɴᴀɪʟ ᴀɴʏᴛɪᴍᴇ\n"
+    "✓ ʀᴇᴍᴏᴠᴇ ᴏʟᴅ ᴄᴏᴠᴇʀs ꜰʀᴏᴍ sᴇᴛᴛɪɴɢs\n\n"
+    "📞 ɴᴇᴇᴅ ʜᴇʟᴘ? ᴄᴏɴᴛᴀᴄᴛ: /about"
+))
+screens.add("about", (
+    "🤖 ᴀʙᴏᴜᴛ ᴛʜɪs ʙᴏᴛ\n\n"
+    "<b>ᴘʀᴏꜰᴇssɪᴏɴᴀʟ ᴠɪᴅᴇᴏ ᴄᴏᴠᴇʀ ᴛᴏᴏʟ</b>\n\n"
+    "<b>ᴅᴇsᴄʀɪᴘᴛɪᴏɴ:</b>\n"
+    "ᴀᴘᴘʟʏ ᴄᴜsᴛᴏᴍ ᴛʜᴜᴍʙɴᴀɪʟs ᴛᴏ ʏᴏᴜʀ ᴠɪᴅᴇᴏs ɪɴsᴛᴀɴᴛʟʏ\n\n"
+    "<b>ᴘʀᴇᴍɪᴜᴍ ꜰᴇᴀᴛᴜʀᴇs:</b>\n"
+    "✅ ʟɪɢʜᴛɴɪɴɢ-ꜰᴀsᴛ ᴘʀᴏᴄᴇssɪɴɢ\n"
+    "✅ ʜɪɢʜ-qᴜᴀʟɪᴛʏ ᴛʜᴜᴍʙɴᴀɪʟ sᴛᴏʀᴀɢᴇ\n"
+    "✅ ᴘʀᴏꜰᴇssɪᴏɴᴀʟ ᴠɪᴅᴇᴏ ᴄᴏᴠᴇʀs\n"
+    "✅ sɪᴍᴘʟᴇ ɪɴᴛᴇʀꜰᴀᴄᴇ\n"
+    "✅ ɪɴsᴛᴀɴᴛ ʀᴇsᴜʟᴛs\n\n"
+    "<b>ᴛᴇᴄʜɴᴏʟᴏɢʏ sᴛᴀᴄᴋ:</b>\n"
+    "⚙️ ᴀᴅᴠᴀɴᴄᴇᴅ ᴘʏᴛʜᴏɴ ᴀᴘɪ\n"
+    "<b>sᴜᴘᴘᴏʀᴛ & ᴄᴏɴᴛᴀᴄᴛ:</b>\n"
+    f"👨‍💻 ᴅᴇᴠᴇʟᴏᴘᴇʀ: @{OWNER_USERNAME or 'sᴜᴘᴘᴏʀᴛ'}\n"
+    "📧 ꜰᴏʀ ʜᴇʟᴘ: /about → ᴅᴇᴠᴇʟᴏᴘᴇʀ\n\n"
+    "ᴛʜᴀɴᴋ ʏᴏᴜ ꜰᴏʀ ᴜsɪɴɢ ᴛʜɪs ʙᴏᴛ! 🎬"
+))
+screens.add("menu_help", (
+    "ℹ️ ʜᴇʟᴘ ᴍᴇɴᴜ\n\n"
+    "<b>ʜᴏᴡ ᴛᴏ ᴜsᴇ:</b>\n\n"
+    "<b>1️⃣ ᴜᴘʟᴏᴀᴅ ᴛʜᴜᴍʙɴᴀɪʟ</b>\n"
+    "   • sᴇɴᴅ ᴀɴʏ ᴘʜᴏᴛᴏ\n"
+    "   • ᴀᴜᴛᴏᴍᴀᴛɪᴄᴀʟʟʏ sᴀᴠᴇᴅ ᴛᴏ ᴘʀᴏꜰɪʟᴇ\n\n"
+    "<b>2️⃣ ᴀᴘᴘʟʏ ᴛᴏ ᴠɪᴅᴇᴏ</b>\n"
+    "   • sᴇɴᴅ ᴀ ᴠɪᴅᴇᴏ ꜰɪʟᴇ\n"
+    "   • ᴛʜᴜᴍʙɴᴀɪʟ ᴀᴘᴘʟɪᴇᴅ ɪɴsᴛᴀɴᴛʟʏ\n\n"
+    "<b>ᴀᴅᴅɪᴛɪᴏɴᴀʟ ᴄᴏᴍᴍᴀɴᴅs:</b>\n"
+    "/remove – ᴅᴇʟᴇᴛᴇ sᴀᴠᴇᴅ ᴛʜᴜᴍʙɴᴀɪʟ\n"
+    "/settings – ᴠɪᴇᴡ & ᴍᴀɴᴀɢᴇ sᴇᴛᴛɪɴɢs\n"
+    "/about – ɪɴꜰᴏʀᴍᴀᴛɪᴏɴ ᴀʙᴏᴜᴛ ʙᴏᴛ"
+), MENU_BACK_KB)
+screens.add("menu_about", (
+    "🤖 ɪɴsᴛᴀɴᴛ ᴠɪᴅᴇᴏ ᴄᴏᴠᴇʀ ʙᴏᴛ\n\n"
+    "<b>ᴘʀᴇᴍɪᴜᴍ ꜰᴇᴀᴛᴜʀᴇs:</b>\n\n"
+    "✅ <b>ᴏɴᴇ-ᴄʟɪᴄᴋ ᴛʜᴜᴍʙɴᴀɪʟ</b>\n"
+    "   ᴜᴘʟᴏᴀᴅ ᴏɴᴄᴇ, ᴀᴘᴘʟʏ ᴛᴏ ᴜɴʟɪᴍɪᴛᴇᴅ ᴠɪᴅᴇᴏs\n\n"
+    "✅ <b>ɪɴsᴛᴀɴᴛ ᴘʀᴏᴄᴇssɪɴɢ</b>\n"
+    "   ꜰᴀsᴛ ᴄᴏᴠᴇʀ ᴀᴘᴘʟɪᴄᴀᴛɪᴏɴ\n\n"
+    "✅ <b>sᴇᴄᴜʀᴇ & ᴘʀɪᴠᴀᴛᴇ</b>\n"
+    "   ʏᴏᴜʀ ᴅᴀᴛᴀ sᴛᴀʏs ᴇɴᴄʀʏᴘᴛᴇᴅ\n\n"
+    "<b>ᴛᴇᴄʜɴᴏʟᴏɢʏ:</b>\n"
+    "⚙️ ᴀᴅᴠᴀɴᴄᴇᴅ ᴘʏᴛʜᴏɴ ᴀᴘɪ\n"
+    "🔐 sᴇᴄᴜʀᴇ ᴛᴇʟᴇɢʀᴀᴍ ɪɴᴛᴇɢʀᴀᴛɪᴏɴ"
+), MENU_BACK_KB)
+screens.add("menu_developer", (
+    "👨‍💻 <b>ᴅᴇᴠᴇʟᴏᴘᴇʀ</b>\n\n"
+    f"ᴄᴏɴᴛᴀᴄᴛ: {DEV_CONTACT}\n"
+    "ɪꜰ ʏᴏᴜ ɴᴇᴇᴅ ʜᴇʟᴘ, ʀᴇᴀᴄʜ ᴏᴜᴛ ᴛᴏ ᴛʜᴇ ᴅᴇᴠᴇʟᴏᴘᴇʀ."
+), MENU_BACK_KB)
+screens.add("menu_unknown", (
+    "ℹ️ <b>ɪɴꜰᴏ</b>\n\n"
+    "ɴᴏ ɪɴꜰᴏʀᴍᴀᴛɪᴏɴ ᴀᴠᴀɪʟᴀʙʟᴇ ꜰᴏʀ ᴛʜɪs ᴍᴇɴᴜ."
+), MENU_BACK_KB)
+screens.add("menu_settings", (
+    "⚙️ sᴇᴛᴛɪɴɢs\n\n"
+    "<b>ᴍᴀɴᴀɢᴇ ʏᴏᴜʀ ᴄᴏɴᴛᴇɴᴛ:</b>\n\n"
+    "🖼️ <b>ᴛʜᴜᴍʙɴᴀɪʟ ᴍᴀɴᴀɢᴇᴍᴇɴᴛ</b>\n"
+    "   • ᴠɪᴇᴡ ᴄᴜʀʀᴇɴᴛ ᴛʜᴜᴍʙɴᴀɪʟ\n"
+    "   • ᴅᴇʟᴇᴛᴇ & ᴜᴘʟᴏᴀᴅ ɴᴇᴡ\n\n"
+    "sᴇʟᴇᴄᴛ ᴏᴘᴛɪᴏɴ ᴛᴏ ᴄᴏɴᴛɪɴᴜᴇ:"
+), SETTINGS_KB)
+screens.add("thumbnails_saved", THUMBNAILS_TEXT.format(status="✅ sᴀᴠᴇᴅ"), THUMBNAILS_KB)
+screens.add("thumbnails_empty", THUMBNAILS_TEXT.format(status="❌ ɴᴏᴛ sᴀᴠᴇᴅ"), THUMBNAILS_KB)
+screens.add("thumb_save_info", (
+    "💾 sᴀᴠᴇ ʏᴏᴜʀ ᴛʜᴜᴍʙɴᴀɪʟ\n\n"
+    "📸 ʜᴏᴡ ɪᴛ ᴡᴏʀᴋs:\n\n"
+    "<b>sᴛᴇᴘ 1️⃣:</b> sᴇɴᴅ ᴀ ᴘʜᴏᴛᴏ\n"
+    "→ ɢᴏ ʙᴀᴄᴋ ᴀɴᴅ sᴇɴᴅ ᴀɴʏ ᴘʜᴏᴛᴏ\n"
+    "→ ᴛʜɪs ᴡɪʟʟ ʙᴇ ʏᴏᴜʀ ᴄᴏᴠᴇʀ\n\n"
+    "<b>sᴛᴇᴘ 2️⃣:</b> ᴀᴜᴛᴏᴍᴀᴛɪᴄ sᴀᴠᴇ\n"
+    "→ ᴛʜᴜᴍʙɴᴀɪʟ sᴀᴠᴇs ᴀᴜᴛᴏᴍᴀᴛɪᴄᴀʟʟʏ\n"
+    "→ ʀᴇᴘʟᴀᴄᴇ ᴀɴʏᴛɪᴍᴇ\n\n"
+    "<b>sᴛᴇᴘ 3️⃣:</b> ʀᴇᴀᴅʏ ᴛᴏ ᴜsᴇ\n"
+    "→ sᴇɴᴅ ᴀɴʏ ᴠɪᴅᴇᴏ\n"
+    "→ ᴄᴏᴠᴇʀ ᴀᴘᴘʟɪᴇs ɪɴsᴛᴀɴᴛʟʏ\n\n"
+    "💡 ᴛɪᴘs:\n"
+    "• ʜɪɢʜ-ʀᴇsᴏʟᴜᴛɪᴏɴ ɪᴍᴀɢᴇs\n"
+    "• sqᴜᴀʀᴇ ꜰᴏʀᴍᴀᴛ 1:1\n"
+    "• ᴍᴀx 5ᴍʙ ꜰɪʟᴇ\n\n"
+    "📸 ʀᴇᴀᴅʏ? sᴇɴᴅ ʏᴏᴜʀ ᴘʜᴏᴛᴏ ɴᴏᴡ"
+), THUMBNAILS_BACK_KB)
+screens.add("thumb_current", (
+    "👁️ ʏᴏᴜʀ ᴄᴜʀʀᴇɴᴛ ᴛʜᴜᴍʙɴᴀɪʟ\n\nᴛʜɪs ᴘʜᴏᴛᴏ ᴡɪʟʟ ʙᴇ ᴀᴘᴘʟɪᴇᴅ ᴛᴏ ʏᴏᴜʀ ᴠɪᴅᴇᴏs\nᴄʜᴀɴɢᴇ ɪᴛ ᴀɴʏᴛɪᴍᴇ ʙʏ ᴜᴘʟᴏᴀᴅɪɴɢ ᴀ ɴᴇᴡ ᴏɴᴇ"
+), THUMBNAILS_BACK_KB)
+screens.add("thumb_none", (
+    "❌ ɴᴏ ᴛʜᴜᴍʙɴᴀɪʟ sᴀᴠᴇᴅ ʏᴇᴛ\n\nꜱᴇɴᴅ ᴀ ᴘʜᴏᴛᴏ ᴛᴏ ᴄʀᴇᴀᴛᴇ ᴏɴᴇ ɴᴏᴡ"
+), THUMBNAILS_BACK_KB)
+screens.add("thumb_deleted", (
+    "✅ ᴛʜᴜᴍʙɴᴀɪʟ ᴅᴇʟᴇᴛᴇᴅ\n\nʀᴇᴍᴏᴠᴇᴅ ꜰʀᴏᴍ sʏsᴛᴇᴍ. ᴜᴘʟᴏᴀᴅ ɴᴇᴡ ᴏɴᴇ ᴀɴʏᴛɪᴍᴇ"
+), THUMBNAILS_BACK_KB)
+screens.add("thumb_not_found", (
+    "⚠️ ɴᴏ ᴛʜᴜᴍʙɴᴀɪʟ ꜰᴏᴜɴᴅ\n\nꜱᴇɴᴅ ᴀ ᴘʜᴏᴛᴏ ᴛᴏ ᴄʀᴇᴀᴛᴇ ᴏɴᴇ"
+), THUMBNAILS_BACK_KB)
+screens.add("admin_panel", (
+    "🛡️ ᴀᴅᴍɪɴ ᴄᴏɴᴛʀᴏʟ ᴘᴀɴᴇʟ\n\n"
+    "<b>Management Options:</b>\n\n"
+    "📊 <b>Statistics</b> – View user analytics\n"
+    "⏱️ <b>Status</b> – Bot performance\n"
+    "🚫 <b>Ban User</b> – Block users\n"
+    "✅ <b>Unban</b> – Restore access"
+), ADMIN_PANEL_KB)
+screens.add("admin_menu", (
+    "🛡️ ᴀᴅᴍɪɴ ᴄᴏɴᴛʀᴏʟ ᴘᴀɴᴇʟ\n\n"
+    "👑 <b>ᴡᴇʟᴄᴏᴍᴇ ᴀᴅᴍɪɴ</b>\n\n"
+    "<b>ᴍᴀɴᴀɢᴇᴍᴇɴᴛ ᴛᴏᴏʟs ᴀᴠᴀɪʟᴀʙʟᴇ:</b>\n\n"
+    "📊 <b>sᴛᴀᴛɪsᴛɪᴄs</b> – ᴜsᴇʀ ᴀɴᴀʟʏᴛɪᴄs\n"
+    "⏱️ <b>sᴛᴀᴛᴜs</b> – ʙᴏᴛ ᴘᴇʀꜰᴏʀᴍᴀɴᴄᴇ\n"
+    "👥 <b>ᴜsᴇʀs</b> – ᴛᴏᴛᴀʟ ᴜsᴇʀs ᴄᴏᴜɴᴛ\n"
+    "🚫 <b>ʙᴀɴ ᴜsᴇʀ</b> – ʙʟᴏᴄᴋ ᴜsᴇʀs\n"
+    "✅ <b>ᴜɴʙᴀɴ ᴜsᴇʀ</b> – ʀᴇsᴛᴏʀᴇ ᴀᴄᴄᴇss\n"
+    "📢 <b>ʙʀᴏᴀᴅᴄᴀsᴛ</b> – sᴇɴᴅ ᴀɴɴᴏᴜɴᴄᴇᴍᴇɴᴛs\n\n"
+    "sᴇʟᴇᴄᴛ ᴀɴ ᴏᴘᴛɪᴏɴ:"
+), ADMIN_MENU_KB)
+screens.add("admin_ban", "🚫 ʙᴀɴ ᴜsᴇʀ\n\nꜱᴇɴᴅ ᴜsᴇʀ ɪᴅ ᴛᴏ ʙᴀɴ ᴏʀ /ʙᴀɴ ᴜsᴇʀɪᴅ ʀᴇᴀsᴏɴ", ADMIN_BACK_KB)
+screens.add("admin_unban", "✅ ᴜɴʙᴀɴ ᴜsᴇʀ\n\nꜱᴇɴᴅ ᴜsᴇʀ ɪᴅ ᴛᴏ ᴜɴʙᴀɴ ᴏʀ /ᴜɴʙᴀɴ ᴜsᴇʀɪᴅ", ADMIN_BACK_KB)
+screens.add("admin_broadcast", "📢 ʙʀᴏᴀᴅᴄᴀsᴛ ᴍᴇssᴀɢᴇ\n\nꜱᴇɴᴅ ᴍᴇssᴀɢᴇ ᴛᴏ ʙʀᴏᴀᴅᴄᴀsᴛ ᴛᴏ ᴀʟʟ ᴜsᴇʀs", ADMIN_BACK_KB)
+
+
+def banner_photo(banner):
+    """Banner setting -> photo argument (local files are uploaded)"""
+    if isinstance(banner, str) and os.path.isfile(banner):
+        return InputFile(banner)
+    return banner
+
+
+"""═════════════════ CALLBACK ROUTES ═════════════════"""
+
+callbacks = CallbackRouter()
+admin_only = require(is_admin, "❌ Unauthorized")
+
+
+@callbacks.route("check_fsub")
+async def cb_check_fsub(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Force-sub verification button"""
+    query = update.callback_query
     user_id = query.from_user.id
-    logger.info(f"👤 User ID: {user_id} | Channel ID Config: {FORCE_SUB_CHANNEL_ID}")
-    
-    # Handle force-sub verification button
-    if query.data == "check_fsub":
-        logger.info(f"🔍 Verify button clicked by user {user_id}")
-        
-        if not FORCE_SUB_CHANNEL_ID:
-            logger.warning("⚠️ FORCE_SUB_CHANNEL_ID not configured")
-            await query.answer("✅ Bot configured successfully!", show_alert=False)
-            await open_home(update, context)
-            return
-        
-        try:
-            # Parse channel ID - make sure we handle it as string first
-            channel_id_str = str(FORCE_SUB_CHANNEL_ID).strip()
-            logger.info(f"📌 Channel ID string: {channel_id_str}")
-            
-            # Try to convert to int
-            try:
-                if channel_id_str.startswith("-"):
-                    channel_id = int(channel_id_str)
-                else:
-                    # Try as int first, otherwise keep as string
-                    try:
-                        channel_id = int(channel_id_str)
-                    except ValueError:
-                        channel_id = channel_id_str
-            except Exception as parse_error:
-                logger.error(f"❌ Failed to parse channel ID: {parse_error}")
-                channel_id = channel_id_str
-            
-            logger.info(f"🔎 Checking membership for user {user_id} in channel {channel_id}")
-            
-            # Direct membership check
-            try:
-                member = await context.bot.get_chat_member(chat_id=channel_id, user_id=user_id)
-                logger.info(f"📊 Member status: {member.status}")
-            except Exception as member_error:
-                logger.error(f"❌ Error checking membership: {member_error}")
-                await query.answer("❌ ᴄʜᴀɴɴᴇʟ ᴄʜᴇᴄᴋ ꜰᴀɪʟᴇᴅ! ᴛʀʏ ᴀɢᴀɪɴ ʟᴀᴛᴇʀ.", show_alert=True)
-                return
-            
-            # Check if user is member
-            if member.status in (
-                ChatMemberStatus.MEMBER,
-                ChatMemberStatus.ADMINISTRATOR,
-                ChatMemberStatus.OWNER
-            ):
-                verified_users.add(user_id)
-                logger.info(f"✅ User {user_id} verified successfully with status {member.status}")
-                
-                # Show success alert
-                await query.answer("✅ ᴄʜᴀɴɴᴇʟ ᴠᴇʀɪꜰɪᴇᴅ sᴜᴄᴄᴇssꜰᴜʟʟʏ!", show_alert=False)
-                
-                # Try to delete verification message
-                try:
-                    await query.message.delete()
-                    logger.info(f"🗑️ Verification message deleted")
-                except Exception as del_error:
-                    logger.warning(f"Could not delete message: {del_error}")
-                
-                # Show home screen
-                logger.info(f"🏠 Showing home screen for user {user_id}")
-                await open_home(update, context)
-                return
-            
-            # User not in channel yet
-            logger.warning(f"⚠️ User {user_id} not a member. Status: {member.status}")
-            await query.answer("❌ ᴊᴏɪɴ ᴛʜᴇ ᴄʜᴀɴɴᴇʟ ꜰɪʀsᴛ!\n\nᴘʟᴇᴀsᴇ ᴊᴏɪɴ ᴛʜᴇ ᴄʜᴀɴɴᴇʟ ᴀɴᴅ ᴛʜᴇɴ ᴄʟɪᴄᴋ ᴠᴇʀɪꜰʏ.", show_alert=True)
-            return
-            
-        except Exception as e:
-            logger.error(f"❌ Verification error: {type(e).__name__}: {e}", exc_info=True)
-            await query.answer("❌ ᴠᴇʀɪꜰɪᴄᴀᴛɪᴏɴ ꜰᴀɪʟᴇᴅ!\n\nᴘʟᴇᴀsᴇ ᴍᴀᴋᴇ sᴜʀᴇ ʏᴏᴜ ᴊᴏɪɴᴇᴅ ᴛʜᴇ ᴄʜᴀɴɴᴇʟ ꜰɪʀsᴛ.", show_alert=True)
-            return
-    
-    # Handle close button
-    if query.data == "close_banner":
-        logger.info(f"❌ User {user_id} closed banner")
-        try:
-
-            await query.answer()
-            await query.message.delete()
-        except Exception as e:
-            logger.error(f"Close error: {e}")
-            try:
-                await query.message.edit_text("Closed", parse_mode="HTML")
-            except Exception:
-                pass
-        return
+    logger.info(f"🔍 Verify button clicked by user {user_id}")
     
-    # Handle admin callbacks
-    if query.data == "admin_stats":
-        if not is_admin(user_id):
-            await query.answer("❌ Unauthorized", show_alert=True)
-            return
-        await query.answer()
-        stats = get_stats()
-        text = (
-            "📊 ʙᴏᴛ sᴛᴀᴛɪsᴛɪᴄs\n\n"
-            f"👥 ᴛᴏᴛᴀʟ ᴜsᴇʀs: {stats['total_users']}\n"
-            f"🚫 ʙᴀɴɴᴇᴅ ᴜsᴇʀs: {stats['banned_users']}\n"
-            f"🖼 ᴡɪᴛʜ ᴛʜᴜᴍʙɴᴀɪʟ: {stats['users_with_thumbnail']}"
+    if not current_profile().force_sub_channel_id:
+        logger.warning("⚠️ FORCE_SUB_CHANNEL_ID not configured")
+        await fan_out(
+            query.answer("✅ Bot configured successfully!", show_alert=False),
+            open_home(update, context),
+            label="verify",
         )
-        back_kb = InlineKeyboardMarkup([
-            [InlineKeyboardButton("⬅️ Back", callback_data="admin_back")]
-        ])
-        try:
-            msg = query.message
-            if getattr(msg, "photo", None):
-                await msg.edit_caption(text, reply_markup=back_kb, parse_mode="HTML")
-            else:
-                await msg.edit_text(text, reply_markup=back_kb, parse_mode="HTML")
-        except Exception:
-            pass
         return
     
-    if query.data == "admin_users":
-        if not is_admin(user_id):
-            await query.answer("❌ Unauthorized", show_alert=True)
-            return
-        await query.answer()
-        stats = get_stats()
-        total_users = stats['total_users']
-        banned_users = stats['banned_users']
-        active_users = total_users - banned_users
+    try:
+        # Parse channel ID - make sure we handle it as string first
+        channel_id_str = str(current_profile().force_sub_channel_id).strip()
         
-        text = (
-            "👥 ᴜsᴇʀ ᴍᴀɴᴀɢᴇᴍᴇɴᴛ\n\n"
-            f"📊 ᴛᴏᴛᴀʟ ᴜsᴇʀs: {total_users}\n"
-            f"✅ ᴀᴄᴛɪᴠᴇ ᴜsᴇʀs: {active_users}\n"
-            f"🚫 ʙᴀɴɴᴇᴅ ᴜsᴇʀs: {banned_users}\n\n"
-            f"📈 ʙᴀɴ ʀᴀᴛᴇ: {(banned_users/total_users*100):.1f}%"
-        )
-        back_kb = InlineKeyboardMarkup([
-            [InlineKeyboardButton("⬅️ Back", callback_data="admin_back")]
-        ])
+        # Try to convert to int
         try:
-            msg = query.message
-            if getattr(msg, "photo", None):
-                await msg.edit_caption(text, reply_markup=back_kb, parse_mode="HTML")
+            if channel_id_str.startswith("-"):
+                channel_id = int(channel_id_str)
             else:
-                await msg.edit_text(text, reply_markup=back_kb, parse_mode="HTML")
-        except Exception:
-            pass
-        return
-    
-    if query.data == "admin_status":
-        if not is_admin(user_id):
-            await query.answer("❌ Unauthorized", show_alert=True)
-            return
-        await query.answer()
-        try:
-            import psutil
-            import time
-            cpu_percent = psutil.cpu_percent(interval=1)
-            ram = psutil.virtual_memory()
-            text = (
-                "⏱️ ʙᴏᴛ sᴛᴀᴛᴜs\n\n"
-                f"🟢 sᴛᴀᴛᴜs: ᴏɴʟɪɴᴇ\n\n"
-                f"🖥 sʏsᴛᴇᴍ ʀᴇsᴏᴜʀᴄᴇs:\n"
-                f"ᴄᴘᴜ: {cpu_percent}%\n"
-                f"ʀᴀᴍ: {ram.percent}%"
-            )
-        except ImportError:
-            text = "⏱️ <b>Bot Status</b>\n\n🟢 Status: <b>Online</b>"
+                # Try as int first, otherwise keep as string
+                try:
+                    channel_id = int(channel_id_str)
+                except ValueError:
+                    channel_id = channel_id_str
+        except Exception as parse_error:
+            logger.error(f"❌ Failed to parse channel ID: {parse_error}")
+            channel_id = channel_id_str
         
-        back_kb = InlineKeyboardMarkup([
-            [InlineKeyboardButton("⬅️ Back", callback_data="admin_back")]
-        ])
+        # Direct membership check
         try:
-            msg = query.message
-            if getattr(msg, "photo", None):
-                await msg.edit_caption(text, reply_markup=back_kb, parse_mode="HTML")
-            else:
-                await msg.edit_text(text, reply_markup=back_kb, parse_mode="HTML")
-        except Exception:
-            pass
-        return
-    
-    if query.data == "admin_ban":
-        if not is_admin(user_id):
-            await query.answer("❌ Unauthorized", show_alert=True)
-            return
-        await query.answer()
-        text = "🚫 ʙᴀɴ ᴜsᴇʀ\n\nꜱᴇɴᴅ ᴜsᴇʀ ɪᴅ ᴛᴏ ʙᴀɴ ᴏʀ /ʙᴀɴ ᴜsᴇʀɪᴅ ʀᴇᴀsᴏɴ"
-        back_kb = InlineKeyboardMarkup([
-            [InlineKeyboardButton("⬅️ Back", callback_data="admin_back")]
-        ])
-        await context.bot.send_message(chat_id=user_id, text=text, reply_markup=back_kb, parse_mode="HTML")
-        return
-    
-    if query.data == "admin_unban":
-        if not is_admin(user_id):
-            await query.answer("❌ Unauthorized", show_alert=True)
-            return
-        await query.answer()
-        text = "✅ ᴜɴʙᴀɴ ᴜsᴇʀ\n\nꜱᴇɴᴅ ᴜsᴇʀ ɪᴅ ᴛᴏ ᴜɴʙᴀɴ ᴏʀ /ᴜɴʙᴀɴ ᴜsᴇʀɪᴅ"
-        back_kb = InlineKeyboardMarkup([
-            [InlineKeyboardButton("⬅️ Back", callback_data="admin_back")]
-        ])
-        await context.bot.send_message(chat_id=user_id, text=text, reply_markup=back_kb, parse_mode="HTML")
-        return
-    
-    if query.data == "admin_broadcast":
-        if not is_admin(user_id):
-            await query.answer("❌ Unauthorized", show_alert=True)
-            return
-        await query.answer()
-        text = "📢 ʙʀᴏᴀᴅᴄᴀsᴛ ᴍᴇssᴀɢᴇ\n\nꜱᴇɴᴅ ᴍᴇssᴀɢᴇ ᴛᴏ ʙʀᴏᴀᴅᴄᴀsᴛ ᴛᴏ ᴀʟʟ ᴜsᴇʀs"
-        back_kb = InlineKeyboardMarkup([
-            [InlineKeyboardButton("⬅️ Back", callback_data="admin_back")]
-        ])
-        await context.bot.send_message(chat_id=user_id, text=text, reply_markup=back_kb, parse_mode="HTML")
-        return
-    
-    if query.data == "admin_back":
-        if not is_admin(user_id):
-            await query.answer("❌ Unauthorized", show_alert=True)
+            member = await context.bot.get_chat_member(chat_id=channel_id, user_id=user_id)
+        except Exception as member_error:
+            logger.error(f"❌ Error checking membership: {member_error}")
+            await query.answer("❌ ᴄʜᴀɴɴᴇʟ ᴄʜᴇᴄᴋ ꜰᴀɪʟᴇᴅ! ᴛʀʏ ᴀɢᴀɪɴ ʟᴀᴛᴇʀ.", show_alert=True)
             return
-        await query.answer()
-        text = (
-            "🛡️ ᴀᴅᴍɪɴ ᴄᴏɴᴛʀᴏʟ ᴘᴀɴᴇʟ\n\n"
-            "<b>Management Options:</b>\n\n"
-            "📊 <b>Statistics</b> – View user analytics\n"
-            "⏱️ <b>Status</b> – Bot performance\n"
-            "🚫 <b>Ban User</b> – Block users\n"
-            "✅ <b>Unban</b> – Restore access"
-        )
-        admin_kb = InlineKeyboardMarkup([
-            [InlineKeyboardButton("📊 sᴛᴀᴛɪsᴛɪᴄs", callback_data="admin_stats"),
-             InlineKeyboardButton("⏱️ sᴛᴀᴛᴜs", callback_data="admin_status")],
-            [InlineKeyboardButton("🚫 ʙᴀɴ ᴜsᴇʀ", callback_data="admin_ban"),
-             InlineKeyboardButton("✅ ᴜɴʙᴀɴ ᴜsᴇʀ", callback_data="admin_unban")],
-            [InlineKeyboardButton("📢 ʙʀᴏᴀᴅᴄᴀsᴛ", callback_data="admin_broadcast"),
-             InlineKeyboardButton("⬅️ ʙᴀᴄᴋ", callback_data="menu_back")],
-        ])
-        try:
-            msg = query.message
-            if getattr(msg, "photo", None):
-                await msg.edit_caption(text, reply_markup=admin_kb, parse_mode="HTML")
-            else:
-                await msg.edit_text(text, reply_markup=admin_kb, parse_mode="HTML")
-        except Exception:
-            pass
-        return
-
-    if query.data == "contact_owner":
-        logger.info(f"📞 Contact owner for user {user_id}")
-        try:
-            await query.answer()
-            if OWNER_USERNAME:
-                await context.bot.send_message(chat_id=query.message.chat_id, text=f"Contact owner: https://t.me/{OWNER_USERNAME}")
-            else:
-                await context.bot.send_message(chat_id=query.message.chat_id, text="Owner contact not configured.")
-        except Exception as e:
-            logger.error(f"Contact error: {e}")
-        return
-
-    # Menu callbacks: show help/about/settings/developer inline
-    if query.data.startswith("menu_"):
-        key = query.data.split("menu_")[1]
-        logger.info(f"📋 Menu callback: {key} for user {user_id}")
-        await query.answer()
         
-        # Handle back button - return to home menu
-        if key == "back":
-            text = (
-                "👋 ᴡᴇʟᴄᴏᴍᴇ ᴛᴏ ɪɴsᴛᴀɴᴛ ᴄᴏᴠᴇʀ ʙᴏᴛ\n\n"
-                "<b>Quick Start Guide:</b>\n\n"
-                "📸 <b>Step 1:</b> Send a photo as thumbnail\n"
-                "🎥 <b>Step 2:</b> Send a video to apply cover\n\n"
-                "<b>Navigation:</b>\n"
-                "❓ /help – Usage guide\n"
-                "⚙️ /settings – Manage thumbnails\n"
-                "ℹ️ /about – Bot information"
+        # Check if user is member
+        if member.status in (
+            ChatMemberStatus.MEMBER,
+            ChatMemberStatus.ADMINISTRATOR,
+            ChatMemberStatus.OWNER
+        ):
+            await verified_users.add(user_id)
+            logger.info(f"✅ User {user_id} verified successfully with status {member.status}")
+            
+            # Success alert and home screen together (open_home replaces the verification message)
+            await fan_out(
+                query.answer("✅ ᴄʜᴀɴɴᴇʟ ᴠᴇʀɪꜰɪᴇᴅ sᴜᴄᴄᴇssꜰᴜʟʟʏ!", show_alert=False),
+                open_home(update, context),
+                label="verify",
             )
-            kb_rows = [
-                [InlineKeyboardButton("❓ ʜᴇʟᴘ", callback_data="menu_help"),
-                 InlineKeyboardButton("ℹ️ ᴀʙᴏᴜᴛ", callback_data="menu_about")],
-                [InlineKeyboardButton("⚙️ sᴇᴛᴛɪɴɢs", callback_data="menu_settings"),
-                 InlineKeyboardButton("👨‍💻 ᴅᴇᴠᴇʟᴏᴘᴇʀ", callback_data="menu_developer")],
-            ]
-            kb = InlineKeyboardMarkup(kb_rows)
-            try:
-                msg = query.message
-                if getattr(msg, "photo", None):
-                    await msg.edit_caption(text, reply_markup=kb, parse_mode="HTML")
-                else:
-                    await msg.edit_text(text, reply_markup=kb, parse_mode="HTML")
-            except Exception as e:
-                logger.debug(f"Back button message edit error: {e}")
             return
         
-        try:
-            if key == "help":
-                text = (
-                    "ℹ️ ʜᴇʟᴘ ᴍᴇɴᴜ\n\n"
-                    "<b>ʜᴏᴡ ᴛᴏ ᴜsᴇ:</b>\n\n"
-                    "<b>1️⃣ ᴜᴘʟᴏᴀᴅ ᴛʜᴜᴍʙɴᴀɪʟ</b>\n"
-                    "   • sᴇɴᴅ ᴀɴʏ ᴘʜᴏᴛᴏ\n"
-                    "   • ᴀᴜᴛᴏᴍᴀᴛɪᴄᴀʟʟʏ sᴀᴠᴇᴅ ᴛᴏ ᴘʀᴏꜰɪʟᴇ\n\n"
-                    "<b>2️⃣ ᴀᴘᴘʟʏ ᴛᴏ ᴠɪᴅᴇᴏ</b>\n"
-                    "   • sᴇɴᴅ ᴀ ᴠɪᴅᴇᴏ ꜰɪʟᴇ\n"
-                    "   • ᴛʜᴜᴍʙɴᴀɪʟ ᴀᴘᴘʟɪᴇᴅ ɪɴsᴛᴀɴᴛʟʏ\n\n"
-                    "<b>ᴀᴅᴅɪᴛɪᴏɴᴀʟ ᴄᴏᴍᴍᴀɴᴅs:</b>\n"
-                    "/remove – ᴅᴇʟᴇᴛᴇ sᴀᴠᴇᴅ ᴛʜᴜᴍʙɴᴀɪʟ\n"
-                    "/settings – ᴠɪᴇᴡ & ᴍᴀɴᴀɢᴇ sᴇᴛᴛɪɴɢs\n"
-                    "/about – ɪɴꜰᴏʀᴍᴀᴛɪᴏɴ ᴀʙᴏᴜᴛ ʙᴏᴛ"
-                )
-            elif key == "about":
-                text = (
-                    "🤖 ɪɴsᴛᴀɴᴛ ᴠɪᴅᴇᴏ ᴄᴏᴠᴇʀ ʙᴏᴛ\n\n"
-                    "<b>ᴘʀᴇᴍɪᴜᴍ ꜰᴇᴀᴛᴜʀᴇs:</b>\n\n"
-                    "✅ <b>ᴏɴᴇ-ᴄʟɪᴄᴋ ᴛʜᴜᴍʙɴᴀɪʟ</b>\n"
-                    "   ᴜᴘʟᴏᴀᴅ ᴏɴᴄᴇ, ᴀᴘᴘʟʏ ᴛᴏ ᴜɴʟɪᴍɪᴛᴇᴅ ᴠɪᴅᴇᴏs\n\n"
-                    "✅ <b>ɪɴsᴛᴀɴᴛ ᴘʀᴏᴄᴇssɪɴɢ</b>\n"
-                    "   ꜰᴀsᴛ ᴄᴏᴠᴇʀ ᴀᴘᴘʟɪᴄᴀᴛɪᴏɴ\n\n"
-                    "✅ <b>sᴇᴄᴜʀᴇ & ᴘʀɪᴠᴀᴛᴇ</b>\n"
-                    "   ʏᴏᴜʀ ᴅᴀᴛᴀ sᴛᴀʏs ᴇɴᴄʀʏᴘᴛᴇᴅ\n\n"
-                    "<b>ᴛᴇᴄʜɴᴏʟᴏɢʏ:</b>\n"
-                    "⚙️ ᴀᴅᴠᴀɴᴄᴇᴅ ᴘʏᴛʜᴏɴ ᴀᴘɪ\n"
-                    "🔐 sᴇᴄᴜʀᴇ ᴛᴇʟᴇɢʀᴀᴍ ɪɴᴛᴇɢʀᴀᴛɪᴏɴ"
-                )
-            elif key == "settings":
-                uid = query.from_user.id
-                text = (
-                    "⚙️ sᴇᴛᴛɪɴɢs\n\n"
-                    "<b>ᴍᴀɴᴀɢᴇ ʏᴏᴜʀ ᴄᴏɴᴛᴇɴᴛ:</b>\n\n"
-                    "🖼️ <b>ᴛʜᴜᴍʙɴᴀɪʟ ᴍᴀɴᴀɢᴇᴍᴇɴᴛ</b>\n"
-                    "   • ᴠɪᴇᴡ ᴄᴜʀʀᴇɴᴛ ᴛʜᴜᴍʙɴᴀɪʟ\n"
-                    "   • ᴅᴇʟᴇᴛᴇ & ᴜᴘʟᴏᴀᴅ ɴᴇᴡ\n\n"
-                    "sᴇʟᴇᴄᴛ ᴏᴘᴛɪᴏɴ ᴛᴏ ᴄᴏɴᴛɪɴᴜᴇ:"
-                )
-                # Add settings submenus buttons
-                settings_kb = InlineKeyboardMarkup([
-                    [InlineKeyboardButton("🖼 ᴛʜᴜᴍʙɴᴀɪʟs", callback_data="submenu_thumbnails")],
-                    [InlineKeyboardButton("⬅️ ʙᴀᴄᴋ", callback_data="menu_back")]
-                ])
-                try:
-                    msg = query.message
-                    if getattr(msg, "photo", None):
-                        await msg.edit_caption(text, reply_markup=settings_kb, parse_mode="HTML")
-                    else:
-                        await msg.edit_text(text, reply_markup=settings_kb, parse_mode="HTML")
-                except Exception as e:
-                    logger.debug(f"Settings menu edit error: {e}")
-                return
-            elif key == "developer":
-                dev_contact = f"https://t.me/{OWNER_USERNAME}" if OWNER_USERNAME else f"tg://user?id={OWNER_ID}"
-                text = (
-                    "👨‍💻 <b>ᴅᴇᴠᴇʟᴏᴘᴇʀ</b>\n\n"
-                    f"ᴄᴏɴᴛᴀᴄᴛ: {dev_contact}\n"
-                    "ɪꜰ ʏᴏᴜ ɴᴇᴇᴅ ʜᴇʟᴘ, ʀᴇᴀᴄʜ ᴏᴜᴛ ᴛᴏ ᴛʜᴇ ᴅᴇᴠᴇʟᴏᴘᴇʀ."
-                )
-            else:
-                text = (
-                    "ℹ️ <b>ɪɴꜰᴏ</b>\n\n"
-                    "ɴᴏ ɪɴꜰᴏʀᴍᴀᴛɪᴏɴ ᴀᴠᴀɪʟᴀʙʟᴇ ꜰᴏʀ ᴛʜɪs ᴍᴇɴᴜ."
-                )
-            
-            # Add back button to all menus (except settings which has its own)
-            if key != "settings":
-                back_kb = InlineKeyboardMarkup([
-                    [InlineKeyboardButton("⬅️ Back", callback_data="menu_back")]
-                ])
-                
-                # Try to edit original message's caption/text first
-                try:
-                    msg = query.message
-                    if getattr(msg, "photo", None):
-                        await msg.edit_caption(text, reply_markup=back_kb, parse_mode="HTML")
-                    else:
-                        await msg.edit_text(text, reply_markup=back_kb, parse_mode="HTML")
-                except Exception as e:
-                    logger.debug(f"Menu edit error: {e}")
-                    await context.bot.send_message(chat_id=query.message.chat.id, text=text, reply_markup=back_kb, parse_mode="HTML")
-        except Exception as e:
-            logger.error(f"Menu error: {e}", exc_info=True)
-        return
-    
-    # Handle Thumbnails submenu
-    if query.data == "submenu_thumbnails":
-        await query.answer()
-        uid = query.from_user.id
-        thumb_status = "✅ sᴀᴠᴇᴅ" if has_thumbnail(uid) else "❌ ɴᴏᴛ sᴀᴠᴇᴅ"
-        text = (
-            "🖼️ <b>ᴛʜᴜᴍʙɴᴀɪʟ ᴍᴀɴᴀɢᴇʀ</b>\n\n"
-            f"<b>ᴄᴜʀʀᴇɴᴛ sᴛᴀᴛᴜs:</b> {thumb_status}\n\n"
-            "📚 <b>ᴀᴠᴀɪʟᴀʙʟᴇ ᴀᴄᴛɪᴏɴs:</b>\n\n"
-            "💾 sᴀᴠᴇ ᴛʜᴜᴍʙɴᴀɪʟ\n"
-            "ᴜᴘʟᴏᴀᴅ ᴀ ɴᴇᴡ ᴘʜᴏᴛᴏ ᴀs ʏᴏᴜʀ ᴠɪᴅᴇᴏ ᴄᴏᴠᴇʀ\n\n"
-            "👁️ sʜᴏᴡ ᴛʜᴜᴍʙɴᴀɪʟ\n"
-            "ᴘʀᴇᴠɪᴇᴡ ʏᴏᴜʀ ᴄᴜʀʀᴇɴᴛʟʏ sᴀᴠᴇᴅ ᴛʜᴜᴍʙɴᴀɪʟ\n\n"
-            "🗑️ ᴅᴇʟᴇᴛᴇ ᴛʜᴜᴍʙɴᴀɪʟ\n"
-            "ʀᴇᴍᴏᴠᴇ ʏᴏᴜʀ sᴀᴠᴇᴅ ᴛʜᴜᴍʙɴᴀɪʟ"
-        )
-        thumb_kb = InlineKeyboardMarkup([
-            [InlineKeyboardButton("💾 sᴀᴠᴇ ᴛʜᴜᴍʙɴᴀɪʟ", callback_data="thumb_save_info"),
-             InlineKeyboardButton("👁️ sʜᴏᴡ ᴛʜᴜᴍʙɴᴀɪʟ", callback_data="thumb_show")],
-            [InlineKeyboardButton("🗑️ ᴅᴇʟᴇᴛᴇ ᴛʜᴜᴍʙɴᴀɪʟ", callback_data="thumb_delete"),
-             InlineKeyboardButton("⬅️ ʙᴀᴄᴋ", callback_data="menu_settings")]
-        ])
-        try:
-            msg = query.message
-            if getattr(msg, "photo", None):
-                await msg.edit_caption(text, reply_markup=thumb_kb, parse_mode="HTML")
-            else:
-                await msg.edit_text(text, reply_markup=thumb_kb, parse_mode="HTML")
-        except Exception as e:
-            logger.debug(f"Thumbnails submenu edit error: {e}")
-        return
-    
-    
-    # Handle thumbnail operations
-    if query.data == "thumb_save_info":
-        await query.answer()
-        text = (
-            "💾 sᴀᴠᴇ ʏᴏᴜʀ ᴛʜᴜᴍʙɴᴀɪʟ\n\n"
-            "📸 ʜᴏᴡ ɪᴛ ᴡᴏʀᴋs:\n\n"
-            "<b>sᴛᴇᴘ 1️⃣:</b> sᴇɴᴅ ᴀ ᴘʜᴏᴛᴏ\n"
-            "→ ɢᴏ ʙᴀᴄᴋ ᴀɴᴅ sᴇɴᴅ ᴀɴʏ ᴘʜᴏᴛᴏ\n"
-            "→ ᴛʜɪs ᴡɪʟʟ ʙᴇ ʏᴏᴜʀ ᴄᴏᴠᴇʀ\n\n"
-            "<b>sᴛᴇᴘ 2️⃣:</b> ᴀᴜᴛᴏᴍᴀᴛɪᴄ sᴀᴠᴇ\n"
-            "→ ᴛʜᴜᴍʙɴᴀɪʟ sᴀᴠᴇs ᴀᴜᴛᴏᴍᴀᴛɪᴄᴀʟʟʏ\n"
-            "→ ʀᴇᴘʟᴀᴄᴇ ᴀɴʏᴛɪᴍᴇ\n\n"
-            "<b>sᴛᴇᴘ 3️⃣:</b> ʀᴇᴀᴅʏ ᴛᴏ ᴜsᴇ\n"
-            "→ sᴇɴᴅ ᴀɴʏ ᴠɪᴅᴇᴏ\n"
-            "→ ᴄᴏᴠᴇʀ ᴀᴘᴘʟɪᴇs ɪɴsᴛᴀɴᴛʟʏ\n\n"
-            "💡 ᴛɪᴘs:\n"
-            "• ʜɪɢʜ-ʀᴇsᴏʟᴜᴛɪᴏɴ ɪᴍᴀɢᴇs\n"
-            "• sqᴜᴀʀᴇ ꜰᴏʀᴍᴀᴛ 1:1\n"
-            "• ᴍᴀx 5ᴍʙ ꜰɪʟᴇ\n\n"
-            "📸 ʀᴇᴀᴅʏ? sᴇɴᴅ ʏᴏᴜʀ ᴘʜᴏᴛᴏ ɴᴏᴡ"
-        )
-        back_kb = InlineKeyboardMarkup([
-            [InlineKeyboardButton("⬅️ Back", callback_data="submenu_thumbnails")]
-        ])
-        try:
-            msg = query.message
-            if getattr(msg, "photo", None):
-                await msg.edit_caption(text, reply_markup=back_kb, parse_mode="HTML")
-            else:
-                await msg.edit_text(text, reply_markup=back_kb, parse_mode="HTML")
-        except Exception:
-            pass
-        return
-    
-    if query.data == "thumb_show":
-        await query.answer()
-        photo_id = get_thumbnail(user_id)
-        if photo_id:
-            text = "👁️ ʏᴏᴜʀ ᴄᴜʀʀᴇɴᴛ ᴛʜᴜᴍʙɴᴀɪʟ\n\nᴛʜɪs ᴘʜᴏᴛᴏ ᴡɪʟʟ ʙᴇ ᴀᴘᴘʟɪᴇᴅ ᴛᴏ ʏᴏᴜʀ ᴠɪᴅᴇᴏs\nᴄʜᴀɴɢᴇ ɪᴛ ᴀɴʏᴛɪᴍᴇ ʙʏ ᴜᴘʟᴏᴀᴅɪɴɢ ᴀ ɴᴇᴡ ᴏɴᴇ"
-            back_kb = InlineKeyboardMarkup([
-                [InlineKeyboardButton("⬅️ Back", callback_data="submenu_thumbnails")]
-            ])
-            try:
-                await query.message.delete()
-            except Exception:
-                pass
-            try:
-                await context.bot.send_photo(
-                    chat_id=user_id,
-                    photo=photo_id,
-                    caption=text,
-                    reply_markup=back_kb,
-                    parse_mode="HTML"
-                )
-            except Exception as e:
-                logger.error(f"Error sending thumbnail: {e}")
-        else:
-            text = "❌ ɴᴏ ᴛʜᴜᴍʙɴᴀɪʟ sᴀᴠᴇᴅ ʏᴇᴛ\n\nꜱᴇɴᴅ ᴀ ᴘʜᴏᴛᴏ ᴛᴏ ᴄʀᴇᴀᴛᴇ ᴏɴᴇ ɴᴏᴡ"
-            back_kb = InlineKeyboardMarkup([
-                [InlineKeyboardButton("⬅️ Back", callback_data="submenu_thumbnails")]
-            ])
-            try:
-                msg = query.message
-                if getattr(msg, "photo", None):
-                    await msg.edit_caption(text, reply_markup=back_kb, parse_mode="HTML")
-                else:
-                    await msg.edit_text(text, reply_markup=back_kb, parse_mode="HTML")
-            except Exception:
-                pass
-        return
-    
-    if query.data == "thumb_delete":
+        # User not in channel yet
+        logger.warning(f"⚠️ User {user_id} not a member. Status: {member.status}")
+        await query.answer("❌ ᴊᴏɪɴ ᴛʜᴇ ᴄʜᴀɴɴᴇʟ ꜰɪʀsᴛ!\n\nᴘʟᴇᴀsᴇ ᴊᴏɪɴ ᴛʜᴇ ᴄʜᴀɴɴᴇʟ ᴀɴᴅ ᴛʜᴇɴ ᴄʟɪᴄᴋ ᴠᴇʀɪꜰʏ.", show_alert=True)
+        
+    except Exception as e:
+        logger.error(f"❌ Verification error: {type(e).__name__}: {e}", exc_info=True)
+        await query.answer("❌ ᴠᴇʀɪꜰɪᴄᴀᴛɪᴏɴ ꜰᴀɪʟᴇᴅ!\n\nᴘʟᴇᴀsᴇ ᴍᴀᴋᴇ sᴜʀᴇ ʏᴏᴜ ᴊᴏɪɴᴇᴅ ᴛʜᴇ ᴄʜᴀɴɴᴇʟ ꜰɪʀsᴛ.", show_alert=True)
+
+
+@callbacks.route("close_banner")
+async def cb_close_banner(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    try:
         await query.answer()
-        if delete_thumbnail(user_id):
-            text = "✅ ᴛʜᴜᴍʙɴᴀɪʟ ᴅᴇʟᴇᴛᴇᴅ\n\nʀᴇᴍᴏᴠᴇᴅ ꜰʀᴏᴍ sʏsᴛᴇᴍ. ᴜᴘʟᴏᴀᴅ ɴᴇᴡ ᴏɴᴇ ᴀɴʏᴛɪᴍᴇ"
-        else:
-            text = "⚠️ ɴᴏ ᴛʜᴜᴍʙɴᴀɪʟ ꜰᴏᴜɴᴅ\n\nꜱᴇɴᴅ ᴀ ᴘʜᴏᴛᴏ ᴛᴏ ᴄʀᴇᴀᴛᴇ ᴏɴᴇ"
-        back_kb = InlineKeyboardMarkup([
-            [InlineKeyboardButton("⬅️ Back", callback_data="submenu_thumbnails")]
-        ])
+        await query.message.delete()
+    except Exception as e:
+        logger.error(f"Close error: {e}")
         try:
-            msg = query.message
-            if getattr(msg, "photo", None):
-                await msg.edit_caption(text, reply_markup=back_kb, parse_mode="HTML")
-            else:
-                await msg.edit_text(text, reply_markup=back_kb, parse_mode="HTML")
+            await query.message.edit_text("Closed", parse_mode="HTML")
         except Exception:
             pass
-        return
-    
-    logger.warning(f"⚠️ Unknown callback: {query.data}")
+
+
+@callbacks.route("admin_stats")
+@admin_only
+async def cb_admin_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    stats = get_stats()
+    text = (
+        "📊 ʙᴏᴛ sᴛᴀᴛɪsᴛɪᴄs\n\n"
+        f"👥 ᴛᴏᴛᴀʟ ᴜsᴇʀs: {stats['total_users']}\n"
+        f"🚫 ʙᴀɴɴᴇᴅ ᴜsᴇʀs: {stats['banned_users']}\n"
+        f"🖼 ᴡɪᴛʜ ᴛʜᴜᴍʙɴᴀɪʟ: {stats['users_with_thumbnail']}\n"
+        f"🧬 ᴜɴɪǫᴜᴇ ɪᴍᴀɢᴇs: {stats['unique_thumbnails']} (ᴅᴇᴅᴜᴘ {stats['thumbnail_dedup_ratio']:.2f}x)"
+    )
     try:
-        await query.answer("Unknown action", show_alert=False)
+        await screens.edit(query.message, Screen("admin_stats", text, ADMIN_BACK_KB))
     except Exception:
         pass
 
 
-"""---------------------- Menus--------------------- """
-
-async def open_home(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@callbacks.route("admin_users")
+@admin_only
+async def cb_admin_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    stats = get_stats()
+    total_users = stats['total_users']
+    banned_users = stats['banned_users']
+    active_users = total_users - banned_users
+    
     text = (
-        "<b>ᴡᴇʟᴄᴏᴍᴇ ᴛᴏ ɪɴsᴛᴀɴᴛ ᴄᴏᴠᴇʀ ʙᴏᴛ</b>\n\n"
-        "🎬 ᴘʀᴏꜰᴇssɪᴏɴᴀʟ ᴠɪᴅᴇᴏ ᴄᴏᴠᴇʀ ᴛᴏᴏʟ\n\n"
-        "ǫᴜɪᴄᴋ sᴛᴀʀᴛ:\n\n"
-        "📸 ᴜᴘʟᴏᴀᴅ ᴘʜᴏᴛᴏ\n"
-        "   ʏᴏᴜʀ ᴛʜᴜᴍʙɴᴀɪʟ sᴀᴠᴇs ᴀᴜᴛᴏᴍᴀᴛɪᴄᴀʟʟʏ\n\n"
-        "🎥 sᴇɴᴅ ᴠɪᴅᴇᴏ\n"
-        "   ᴛʜᴜᴍʙɴᴀɪʟ ᴀᴘᴘʟɪᴇs ɪɴsᴛᴀɴᴛʟʏ\n\n"
-        "ᴋᴇʏ ꜰᴇᴀᴛᴜʀᴇs:\n"
-        "✅ ᴏɴᴇ-ᴄʟɪᴄᴋ ᴀᴘᴘʟɪᴄᴀᴛɪᴏɴ\n"
-        "✅ ʜɪɢʜ-ǫᴜᴀʟɪᴛʏ ᴄᴏᴠᴇʀs\n"
-        "✅ ᴀᴜᴛᴏᴍᴀᴛɪᴄ ᴍᴀɴᴀɢᴇᴍᴇɴᴛ\n\n"
-        "ᴄᴏᴍᴍᴀɴᴅs:\n"
-        "/help – ᴄᴏᴍᴘʟᴇᴛᴇ ɢᴜɪᴅᴇ\n"
-        "/settings – ᴍᴀɴᴀɢᴇ ᴄᴏɴᴛᴇɴᴛ\n"
-        "/about – ᴍᴏʀᴇ ɪɴꜰᴏʀᴍᴀᴛɪᴏɴ"
+        "👥 ᴜsᴇʀ ᴍᴀɴᴀɢᴇᴍᴇɴᴛ\n\n"
+        f"📊 ᴛᴏᴛᴀʟ ᴜsᴇʀs: {total_users}\n"
+        f"✅ ᴀᴄᴛɪᴠᴇ ᴜsᴇʀs: {active_users}\n"
+        f"🚫 ʙᴀɴɴᴇᴅ ᴜsᴇʀs: {banned_users}\n\n"
+        f"📈 ʙᴀɴ ʀᴀᴛᴇ: {(banned_users/total_users*100):.1f}%"
     )
+    try:
+        await screens.edit(query.message, Screen("admin_users", text, ADMIN_BACK_KB))
+    except Exception:
+        pass
 
-    kb = InlineKeyboardMarkup([
-        [InlineKeyboardButton("❓ ʜᴇʟᴘ", callback_data="menu_help"),
-         InlineKeyboardButton("ℹ️ ᴀʙᴏᴜᴛ", callback_data="menu_about")],
-        [InlineKeyboardButton("⚙️ sᴇᴛᴛɪɴɢs", callback_data="menu_settings"),
-         InlineKeyboardButton("👨‍💻 ᴅᴇᴠᴇʟᴏᴘᴇʀ", callback_data="menu_developer")],
-    ])
+
+@callbacks.route("admin_status")
+@admin_only
+async def cb_admin_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    try:
+        import psutil
+        cpu_percent = psutil.cpu_percent(interval=1)
+        ram = psutil.virtual_memory()
+        text = (
+            "⏱️ ʙᴏᴛ sᴛᴀᴛᴜs\n\n"
+            f"🟢 sᴛᴀᴛᴜs: ᴏɴʟɪɴᴇ\n\n"
+            f"🖥 sʏsᴛᴇᴍ ʀᴇsᴏᴜʀᴄᴇs:\n"
+            f"ᴄᴘᴜ: {cpu_percent}%\n"
+            f"ʀᴀᴍ: {ram.percent}%"
+        )
+    except ImportError:
+        text = "⏱️ <b>Bot Status</b>\n\n🟢 Status: <b>Online</b>"
     
-    # Get home menu banner
-    home_banner = HOME_MENU_BANNER_URL
+    try:
+        await screens.edit(query.message, Screen("admin_status", text, ADMIN_BACK_KB))
+    except Exception:
+        pass
 
-    if update.callback_query:
-        msg = update.callback_query.message
-        try:
-            # Always delete old message first and send new one with home banner
-            try:
-                await msg.delete()
-            except Exception:
-                pass
-            
+
+@callbacks.route("admin_ban")
+@admin_only
+async def cb_admin_ban(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    await screens.send(context.bot, query.from_user.id, screens["admin_ban"])
+
+
+@callbacks.route("admin_unban")
+@admin_only
+async def cb_admin_unban(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    await screens.send(context.bot, query.from_user.id, screens["admin_unban"])
+
+
+@callbacks.route("admin_broadcast")
+@admin_only
+async def cb_admin_broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    await screens.send(context.bot, query.from_user.id, screens["admin_broadcast"])
+
+
+@callbacks.route("admin_back")
+@admin_only
+async def cb_admin_back(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    try:
+        await screens.edit(query.message, screens["admin_panel"])
+    except Exception:
+        pass
+
+
+@callbacks.route("contact_owner")
+async def cb_contact_owner(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    try:
+        await query.answer()
+        if OWNER_USERNAME:
+            await context.bot.send_message(chat_id=query.message.chat_id, text=f"Contact owner: https://t.me/{OWNER_USERNAME}")
+        else:
+            await context.bot.send_message(chat_id=query.message.chat_id, text="Owner contact not configured.")
+    except Exception as e:
+        logger.error(f"Contact error: {e}")
+
+
+@callbacks.route("menu_back")
+async def cb_menu_back(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Back button - return to home menu"""
+    query = update.callback_query
+    await query.answer()
+    try:
+        await screens.edit(query.message, screens["menu_home"])
+    except Exception as e:
+        logger.debug(f"Back button message edit error: {e}")
+
+
+@callbacks.route("menu_settings")
+async def cb_menu_settings(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    try:
+        await screens.edit(query.message, screens["menu_settings"])
+    except Exception as e:
+        logger.debug(f"Settings menu edit error: {e}")
+
+
+async def show_menu_page(update: Update, context: ContextTypes.DEFAULT_TYPE, name: str):
+    """Info page with a back button to the home menu"""
+    query = update.callback_query
+    await query.answer()
+    screen = screens[name]
+    # Try to edit original message's caption/text first
+    try:
+        await screens.edit(query.message, screen)
+    except Exception as e:
+        logger.debug(f"Menu edit error: {e}")
+        try:
+            await screens.send(context.bot, query.message.chat.id, screen)
+        except Exception as e:
+            logger.error(f"Menu error: {e}", exc_info=True)
+
+
+@callbacks.route("menu_help")
+async def cb_menu_help(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await show_menu_page(update, context, "menu_help")
+
+
+@callbacks.route("menu_about")
+async def cb_menu_about(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await show_menu_page(update, context, "menu_about")
+
+
+@callbacks.route("menu_developer")
+async def cb_menu_developer(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await show_menu_page(update, context, "menu_developer")
+
+
+@callbacks.route("menu_", prefix=True)
+async def cb_menu_unknown(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Menu buttons from older messages whose page no longer exists"""
+    await show_menu_page(update, context, "menu_unknown")
+
+
+@callbacks.route("submenu_thumbnails")
+async def cb_submenu_thumbnails(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    screen = screens["thumbnails_saved" if has_thumbnail(query.from_user.id) else "thumbnails_empty"]
+    try:
+        await screens.edit(query.message, screen)
+    except Exception as e:
+        logger.debug(f"Thumbnails submenu edit error: {e}")
+
+
+@callbacks.route("thumb_save_info")
+async def cb_thumb_save_info(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    try:
+        await screens.edit(query.message, screens["thumb_save_info"])
+    except Exception:
+        pass
+
+
+@callbacks.route("thumb_show")
+async def cb_thumb_show(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    user_id = query.from_user.id
+    await query.answer()
+    photo_id = get_thumbnail(user_id)
+    if photo_id:
+        # Replace the menu with the thumbnail preview in one round trip
+        await fan_out(
+            query.message.delete(),
+            screens.send(context.bot, user_id, screens["thumb_current"], photo=photo_id),
+            label="thumbnail preview",
+        )
+    else:
+        try:
+            await screens.edit(query.message, screens["thumb_none"])
+        except Exception:
+            pass
+
+
+@callbacks.route("thumb_delete")
+async def cb_thumb_delete(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    screen = screens["thumb_deleted" if delete_thumbnail(query.from_user.id) else "thumb_not_found"]
+    try:
+        await screens.edit(query.message, screen)
+    except Exception:
+        pass
+
+
+"""---------------------- Menus--------------------- """
+
+async def open_home(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    screen = screens["home"]
+    
+    # Get home menu banner
+    home_banner = current_profile().home_menu_banner_url
+
+    if update.callback_query:
+        msg = update.callback_query.message
+
+        async def send_home() -> None:
             if home_banner:
                 # Send with banner
                 try:
-                    if isinstance(home_banner, str) and os.path.isfile(home_banner):
-                        photo = InputFile(home_banner)
-                    else:
-                        photo = home_banner
-                    
-                    await context.bot.send_photo(
-                        chat_id=msg.chat.id,
-                        photo=photo,
-                        caption=text,
-                        reply_markup=kb,
-                        parse_mode="HTML"
-                    )
+                    await screens.send(context.bot, msg.chat.id, screen, photo=banner_photo(home_banner))
+                    return
                 except Exception as banner_err:
                     logger.warning(f"Could not send home banner: {banner_err}")
-                    await context.bot.send_message(
-                        chat_id=msg.chat.id,
-                        text=text,
-                        reply_markup=kb,
-                        parse_mode="HTML"
-                    )
-            else:
-                await context.bot.send_message(
-                    chat_id=msg.chat.id,
-                    text=text,
-                    reply_markup=kb,
-                    parse_mode="HTML"
-                )
-        except Exception as e:
-            logger.warning(f"Error sending home menu: {e}")
-            try:
-                await context.bot.send_message(
-                    chat_id=msg.chat.id,
-                    text=text,
-                    reply_markup=kb,
-                    parse_mode="HTML"
-                )
-            except Exception:
-                pass
+            await screens.send(context.bot, msg.chat.id, screen)
+
+        # Replace the old message: delete it while the new one is sent
+        await fan_out(msg.delete(), send_home(), label="home menu")
     else:
         if home_banner:
             try:
-                if isinstance(home_banner, str) and os.path.isfile(home_banner):
-                    await update.message.reply_photo(photo=InputFile(home_banner), caption=text, reply_markup=kb, parse_mode="HTML")
-                else:
-                    await update.message.reply_photo(photo=home_banner, caption=text, reply_markup=kb, parse_mode="HTML")
+                await screens.reply(update.message, screen, photo=banner_photo(home_banner))
                 return
             except Exception as e:
                 logger.warning(f"Could not send home banner: {e}")
-        await update.message.reply_text(text, reply_markup=kb, parse_mode="HTML")
+        await screens.reply(update.message, screen)
 
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -1018,6 +1109,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_check = get_thumbnail(user_id)
     if user_check is None:
         # New user - log it
+        metrics.incr("users.new")
         log_data = log_new_user(user_id, username, first_name)
         log_msg = format_log_message(user_id, username, log_data["action"], log_data.get("details", ""))
         await send_log(context, log_msg)
@@ -1027,135 +1119,57 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         logger.warning(f"❌ User {user_id} blocked by force-sub check")
         return
     
-    text = (
-        "<b>ᴡᴇʟᴄᴏᴍᴇ ᴛᴏ ɪɴsᴛᴀɴᴛ ᴄᴏᴠᴇʀ ʙᴏᴛ</b>\n\n"
-        "🎬 ᴘʀᴏꜰᴇssɪᴏɴᴀʟ ᴠɪᴅᴇᴏ ᴄᴏᴠᴇʀ ᴛᴏᴏʟ\n\n"
-        "ǫᴜɪᴄᴋ sᴛᴀʀᴛ:\n\n"
-        "📸 ᴜᴘʟᴏᴀᴅ ᴘʜᴏᴛᴏ\n"
-        "   ʏᴏᴜʀ ᴛʜᴜᴍʙɴᴀɪʟ sᴀᴠᴇs ᴀᴜᴛᴏᴍᴀᴛɪᴄᴀʟʟʏ\n\n"
-        "🎥 sᴇɴᴅ ᴠɪᴅᴇᴏ\n"
-        "   ᴛʜᴜᴍʙɴᴀɪʟ ᴀᴘᴘʟɪᴇs ɪɴsᴛᴀɴᴛʟʏ\n\n"
-        "ᴋᴇʏ ꜰᴇᴀᴛᴜʀᴇs:\n"
-        "✅ ᴏɴᴇ-ᴄʟɪᴄᴋ ᴀᴘᴘʟɪᴄᴀᴛɪᴏɴ\n"
-        "✅ ʜɪɢʜ-ǫᴜᴀʟɪᴛʏ ᴄᴏᴠᴇʀs\n"
-        "✅ ᴀᴜᴛᴏᴍᴀᴛɪᴄ ᴍᴀɴᴀɢᴇᴍᴇɴᴛ\n\n"
-        "ᴄᴏᴍᴍᴀɴᴅs:\n"
-        "/help – ᴄᴏᴍᴘʟᴇᴛᴇ ɢᴜɪᴅᴇ\n"
-        "/settings – ᴍᴀɴᴀɢᴇ ᴄᴏɴᴛᴇɴᴛ\n"
-        "/about – ᴍᴏʀᴇ ɪɴꜰᴏʀᴍᴀᴛɪᴏɴ"
-    )
-
-    # Build home menu with all buttons
-    kb_rows = [
-        [InlineKeyboardButton("❓ ʜᴇʟᴘ", callback_data="menu_help"),
-         InlineKeyboardButton("ℹ️ ᴀʙᴏᴜᴛ", callback_data="menu_about")],
-        [InlineKeyboardButton("⚙️ sᴇᴛᴛɪɴɢs", callback_data="menu_settings"),
-         InlineKeyboardButton("👨‍💻 ᴅᴇᴠᴇʟᴏᴘᴇʀ", callback_data="menu_developer")],
-    ]
-    
-    # Add admin panel button if user is admin
-    if is_admin(user_id):
-        kb_rows.append([InlineKeyboardButton("🛡️ ᴀᴅᴍɪɴ ᴘᴀɴᴇʟ", callback_data="admin_back")])
-    
-    kb = InlineKeyboardMarkup(kb_rows)
-    banner = HOME_MENU_BANNER_URL
+    # Home menu, with the admin panel button for admins
+    screen = screens["home_admin" if is_admin(user_id) else "home"]
+    banner = current_profile().home_menu_banner_url
     
     # Handle both callback_query and regular message
     if update.callback_query:
         msg = update.callback_query.message
         if banner:
             try:
-                if isinstance(banner, str) and os.path.isfile(banner):
-                    photo = InputFile(banner)
-                else:
-                    photo = banner
                 if getattr(msg, "photo", None):
-                    await msg.edit_caption(caption=text, reply_markup=kb, parse_mode="HTML")
+                    await screens.edit(msg, screen)
                 else:
                     try:
                         await msg.delete()
                     except Exception:
                         pass
-                    await msg.chat.send_photo(photo=photo, caption=text, reply_markup=kb, parse_mode="HTML")
+                    await screens.send(context.bot, msg.chat.id, screen, photo=banner_photo(banner))
             except Exception:
-                await msg.edit_text(text, reply_markup=kb, parse_mode="HTML")
+                await screens.edit(msg, screen)
         else:
-            await msg.edit_text(text, reply_markup=kb, parse_mode="HTML")
+            await screens.edit(msg, screen)
     else:
         if banner:
             try:
-                if isinstance(banner, str) and os.path.isfile(banner):
-                    await update.message.reply_photo(photo=InputFile(banner), caption=text, reply_markup=kb, parse_mode="HTML")
-                else:
-                    await update.message.reply_photo(photo=banner, caption=text, reply_markup=kb, parse_mode="HTML")
+                await screens.reply(update.message, screen, photo=banner_photo(banner))
                 return
             except Exception:
                 pass
-        await update.message.reply_text(text, reply_markup=kb, parse_mode="HTML")
+        await screens.reply(update.message, screen)
 async def help_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not await check_force_sub(update, context):
         return
-    text = (
-        "📖 ᴄᴏᴍᴘʟᴇᴛᴇ ɢᴜɪᴅᴇ\n\n"
-        "<b>sᴛᴇᴘ-ʙʏ-sᴛᴇᴘ ɪɴsᴛʀᴜᴄᴛɪᴏɴs:</b>\n\n"
-        "<b>1️⃣ ᴜᴘʟᴏᴀᴅ ʏᴏᴜʀ ᴛʜᴜᴍʙɴᴀɪʟ</b>\n"
-        "   • sᴇɴᴅ ᴀ ʜɪɢʜ-qᴜᴀʟɪᴛʏ ᴘʜᴏᴛᴏ\n"
-        "   • ɪᴛ sᴀᴠᴇs ᴀᴜᴛᴏᴍᴀᴛɪᴄᴀʟʟʏ ᴀs ʏᴏᴜʀ ᴄᴏᴠᴇʀ\n\n"
-        "<b>2️⃣ ᴀᴘᴘʟʏ ᴛᴏ ᴠɪᴅᴇᴏs</b>\n"
-        "   • sᴇɴᴅ ᴀɴʏ ᴠɪᴅᴇᴏ ꜰɪʟᴇ\n"
-        "   • ᴄᴏᴠᴇʀ ᴀᴘᴘʟɪᴇs ɪɴsᴛᴀɴᴛʟʏ\n\n"
-        "<b>3️⃣ ᴅᴏᴡɴʟᴏᴀᴅ & sʜᴀʀᴇ</b>\n"
-        "   • ʏᴏᴜʀ ᴠɪᴅᴇᴏ ᴡɪᴛʜ ᴄᴏᴠᴇʀ ɪs ʀᴇᴀᴅʏ\n"
-        "   • ᴅᴏᴡɴʟᴏᴀᴅ ᴀɴᴅ sʜᴀʀᴇ ᴀɴʏᴡʜᴇʀᴇ\n\n"
-        "<b>💡 ᴘʀᴏ ᴛɪᴘs:</b>\n"
-        "✓ ʜɪɢʜ-qᴜᴀʟɪᴛʏ ᴘʜᴏᴛᴏs ᴡᴏʀᴋ ʙᴇsᴛ\n"
-        "✓ ᴜᴘᴅᴀᴛᴇ ᴛʜᴜᴍʙɴᴀɪʟ ᴀɴʏᴛɪᴍᴇ\n"
-        "✓ ʀᴇᴍᴏᴠᴇ ᴏʟᴅ ᴄᴏᴠᴇʀs ꜰʀᴏᴍ sᴇᴛᴛɪɴɢs\n\n"
-        "📞 ɴᴇᴇᴅ ʜᴇʟᴘ? ᴄᴏɴᴛᴀᴄᴛ: /about"
-    )
-    banner = HOME_MENU_BANNER_URL
+    banner = current_profile().home_menu_banner_url
     if banner:
         try:
-            if isinstance(banner, str) and os.path.isfile(banner):
-                await update.message.reply_photo(photo=InputFile(banner), caption=text, parse_mode="HTML")
-            else:
-                await update.message.reply_photo(photo=banner, caption=text, parse_mode="HTML")
+            await screens.reply(update.message, screens["help"], photo=banner_photo(banner))
             return
         except Exception:
             pass
-    await update.message.reply_text(text, parse_mode="HTML")
+    await screens.reply(update.message, screens["help"])
 async def about(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not await check_force_sub(update, context):
         return
-    text = (
-        "🤖 ᴀʙᴏᴜᴛ ᴛʜɪs ʙᴏᴛ\n\n"
-        "<b>ᴘʀᴏꜰᴇssɪᴏɴᴀʟ ᴠɪᴅᴇᴏ ᴄᴏᴠᴇʀ ᴛᴏᴏʟ</b>\n\n"
-        "<b>ᴅᴇsᴄʀɪᴘᴛɪᴏɴ:</b>\n"
-        "ᴀᴘᴘʟʏ ᴄᴜsᴛᴏᴍ ᴛʜᴜᴍʙɴᴀɪʟs ᴛᴏ ʏᴏᴜʀ ᴠɪᴅᴇᴏs ɪɴsᴛᴀɴᴛʟʏ\n\n"
-        "<b>ᴘʀᴇᴍɪᴜᴍ ꜰᴇᴀᴛᴜʀᴇs:</b>\n"
-        "✅ ʟɪɢʜᴛɴɪɴɢ-ꜰᴀsᴛ ᴘʀᴏᴄᴇssɪɴɢ\n"
-        "✅ ʜɪɢʜ-qᴜᴀʟɪᴛʏ ᴛʜᴜᴍʙɴᴀɪʟ sᴛᴏʀᴀɢᴇ\n"
-        "✅ ᴘʀᴏꜰᴇssɪᴏɴᴀʟ ᴠɪᴅᴇᴏ ᴄᴏᴠᴇʀs\n"
-        "✅ sɪᴍᴘʟᴇ ɪɴᴛᴇʀꜰᴀᴄᴇ\n"
-        "✅ ɪɴsᴛᴀɴᴛ ʀᴇsᴜʟᴛs\n\n"
-        "<b>ᴛᴇᴄʜɴᴏʟᴏɢʏ sᴛᴀᴄᴋ:</b>\n"
-        "⚙️ ᴀᴅᴠᴀɴᴄᴇᴅ ᴘʏᴛʜᴏɴ ᴀᴘɪ\n"
-        "<b>sᴜᴘᴘᴏʀᴛ & ᴄᴏɴᴛᴀᴄᴛ:</b>\n"
-        f"👨‍💻 ᴅᴇᴠᴇʟᴏᴘᴇʀ: @{OWNER_USERNAME or 'sᴜᴘᴘᴏʀᴛ'}\n"
-        "📧 ꜰᴏʀ ʜᴇʟᴘ: /about → ᴅᴇᴠᴇʟᴏᴘᴇʀ\n\n"
-        "ᴛʜᴀɴᴋ ʏᴏᴜ ꜰᴏʀ ᴜsɪɴɢ ᴛʜɪs ʙᴏᴛ! 🎬"
-    )
-    banner = HOME_MENU_BANNER_URL
+    banner = current_profile().home_menu_banner_url
     if banner:
         try:
-            if isinstance(banner, str) and os.path.isfile(banner):
-                await update.message.reply_photo(photo=InputFile(banner), caption=text, parse_mode="HTML")
-            else:
-                await update.message.reply_photo(photo=banner, caption=text, parse_mode="HTML")
+            await screens.reply(update.message, screens["about"], photo=banner_photo(banner))
             return
         except Exception:
             pass
-    await update.message.reply_text(text, parse_mode="HTML")
+    await screens.reply(update.message, screens["about"])
 async def settings(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not await check_force_sub(update, context):
         return
@@ -1172,21 +1186,14 @@ async def settings(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "<b>ᴍᴀɴᴀɢᴇᴍᴇɴᴛ ᴏᴘᴛɪᴏɴs:</b>\n"
         "🖼️ ᴠɪᴇᴡ ᴀɴᴅ ᴍᴀɴᴀɢᴇ ʏᴏᴜʀ ᴛʜᴜᴍʙɴᴀɪʟs"
     )
-    settings_kb = InlineKeyboardMarkup([
-        [InlineKeyboardButton("🖼 ᴛʜᴜᴍʙɴᴀɪʟs", callback_data="submenu_thumbnails")],
-        [InlineKeyboardButton("⬅️ ʙᴀᴄᴋ", callback_data="menu_back")]
-    ])
-    banner = HOME_MENU_BANNER_URL
+    banner = current_profile().home_menu_banner_url
     if banner:
         try:
-            if isinstance(banner, str) and os.path.isfile(banner):
-                await update.message.reply_photo(photo=InputFile(banner), caption=text, reply_markup=settings_kb, parse_mode="HTML")
-            else:
-                await update.message.reply_photo(photo=banner, caption=text, reply_markup=settings_kb, parse_mode="HTML")
+            await update.message.reply_photo(photo=banner_photo(banner), caption=text, reply_markup=SETTINGS_KB, parse_mode="HTML")
             return
         except Exception:
             pass
-    await update.message.reply_text(text, reply_markup=settings_kb, parse_mode="HTML")
+    await update.message.reply_text(text, reply_markup=SETTINGS_KB, parse_mode="HTML")
 
 
 
@@ -1210,13 +1217,14 @@ async def photo_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     user_id = update.message.from_user.id
     username = update.message.from_user.username or "Unknown"
-    photo_id = update.message.photo[-1].file_id
+    photo = update.message.photo[-1]
+    photo_id = photo.file_id
     
     # Check if replacing
     old_thumbnail = get_thumbnail(user_id)
     is_replace = old_thumbnail is not None
     
-    save_thumbnail(user_id, photo_id)
+    save_thumbnail(user_id, photo_id, photo.file_unique_id)
     logger.info(f"✅ Thumbnail saved to MongoDB for user {user_id}")
     
     # Log thumbnail action
@@ -1227,54 +1235,568 @@ async def photo_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     action_text = "ᴜᴘᴅᴀᴛᴇᴅ" if is_replace else "sᴀᴠᴇᴅ"
     await update.message.reply_text("✅ ᴛʜᴜᴍʙɴᴀɪʟ " + action_text + "\n\nʀᴇᴀᴅʏ! sᴇɴᴅ ᴀɴʏ ᴠɪᴅᴇᴏ ᴛᴏ ᴀᴘᴘʟʏ ᴄᴏᴠᴇʀ", reply_to_message_id=update.message.message_id, parse_mode="HTML")
 
+"""--------------------COVER PIPELINE--------------------"""
+
+async def apply_cover(bot, chat_id, video, cover, caption: str = "", reply_to_message_id=None, mode: str = None,
+                      priority: str = "interactive", placeholder_id: int = None, on_placeholder=None):
+    """
+    Send `video` to `chat_id` with `cover` applied. Returns (message, mode_used).
+    "direct" sends the covered video in one call; "edit" posts a placeholder and
+    swaps its media. Direct mode falls back to edit when Telegram rejects the cover.
+    A retry passes the `placeholder_id` of its earlier attempt so it is reused;
+    `on_placeholder(message_id)` is called when a new placeholder is sent.
+    """
+    mode = (mode or COVER_SEND_MODE).lower()
+    caption_entities = bold_entities(caption)
+    rate_limit_args = {"priority": priority}
+
+    if mode == "direct":
+        started = time.monotonic()
+        try:
+            with tracing.span("send_video"):
+                sent = await bot.send_video(
+                    chat_id=chat_id,
+                    video=video,
+                    caption=caption,
+                    caption_entities=caption_entities,
+                    supports_streaming=True,
+                    cover=cover,
+                    reply_to_message_id=reply_to_message_id,
+                    rate_limit_args=rate_limit_args,
+                )
+            metrics.observe("cover_send.direct", time.monotonic() - started)
+            return sent, "direct"
+        except BadRequest as e:
+            # Only a rejected cover is worth the edit path; errors about the video or chat would repeat there
+            if not is_cover_rejection(e):
+                raise
+            logger.warning(f"⚠️ Direct cover send rejected, falling back to edit: {e}")
+
+    started = time.monotonic()
+    media = InputMediaVideo(media=video, caption=caption, caption_entities=caption_entities, supports_streaming=True, cover=cover)
+    if placeholder_id:
+        try:
+            with tracing.span("edit_message_media", reused_placeholder=True):
+                sent = await bot.edit_message_media(chat_id=chat_id, message_id=placeholder_id, media=media, rate_limit_args=rate_limit_args)
+            metrics.observe("cover_send.edit", time.monotonic() - started)
+            return sent, "edit"
+        except BadRequest as e:
+            if "not found" not in str(e).lower():
+                raise
+            # The user deleted the earlier placeholder; post a new one
+            logger.info(f"ℹ️ Placeholder {placeholder_id} is gone, sending a new one: {e}")
+
+    with tracing.span("placeholder"):
+        placeholder = await bot.send_message(
+            chat_id=chat_id,
+            text="⏳ ᴘʀᴏᴄᴇssɪɴɢ ᴠɪᴅᴇᴏ\n\nᴘʟᴇᴀsᴇ ᴡᴀɪᴛ ᴀ ꜰᴇᴡ sᴇᴄᴏɴᴅs",
+            reply_to_message_id=reply_to_message_id,
+            parse_mode="HTML",
+            rate_limit_args=rate_limit_args,
+        )
+    if on_placeholder:
+        on_placeholder(placeholder.message_id)
+    with tracing.span("edit_message_media"):
+        sent = await bot.edit_message_media(chat_id=chat_id, message_id=placeholder.message_id, media=media, rate_limit_args=rate_limit_args)
+    metrics.observe("cover_send.edit", time.monotonic() - started)
+    return sent, "edit"
+
+
+async def log_covered_video(bot, user_id: int, username: str, caption: str, timestamp, video, cover) -> bool:
+    """Forward a processed video to the log channel, with the full-size cover the user got"""
+    if not current_profile().log_channel_id:
+        return False
+
+    try:
+        log_caption = (
+            f"🎥 <b>ᴠɪᴅᴇᴏ ᴘʀᴏᴄᴇssɪɴɢ ᴄᴏᴍᴘʟᴇᴛᴇᴅ</b>\n\n"
+            f"👤 ᴜsᴇʀ ɪᴅ: <code>{user_id}</code>\n"
+            f"📌 ᴜsᴇʀɴᴀᴍᴇ: @{username}\n"
+            f"📝 ᴄᴀᴘᴛɪᴏɴ: {caption or 'ɴᴏ ᴄᴀᴘᴛɪᴏɴ'}\n"
+            f"⏰ ᴛɪᴍᴇsᴛᴀᴍᴘ: {timestamp}"
+        )
+        with tracing.span("log_send"):
+            await bot.send_video(
+                chat_id=current_profile().log_channel_id,
+                video=video,
+                caption=log_caption,
+                supports_streaming=True,
+                cover=cover,
+                parse_mode="HTML",
+                **BACKGROUND
+            )
+        logger.debug(f"✅ Video logged to channel for user {user_id}")
+        return True
+    except Exception as e:
+        logger.error(f"❌ Error forwarding video to log channel: {e}")
+        return False
+
+
+# Videos per log channel album (Telegram's media group limit)
+LOG_ALBUM_SIZE = 10
+
+
+async def log_bulk_videos(bot, session, entries: list) -> int:
+    """Log a finished bulk run: one header message, then the videos as albums of up to 10"""
+    log_channel_id = current_profile().log_channel_id
+    if not log_channel_id:
+        return 0
+    username = session.template.get("username", "")
+    logged = 0
+    try:
+        await bot.send_message(
+            chat_id=log_channel_id,
+            text=(
+                f"📦 <b>ʙᴜʟᴋ ʀᴜɴ ᴄᴏᴍᴘʟᴇᴛᴇᴅ</b>\n\n"
+                f"👤 ᴜsᴇʀ ɪᴅ: <code>{session.user_id}</code>\n"
+                f"📌 ᴜsᴇʀɴᴀᴍᴇ: @{username}\n"
+                f"✅ ᴅᴏɴᴇ: {session.done} | ❌ ꜰᴀɪʟᴇᴅ: {session.failed} | ⏭ sᴋɪᴘᴘᴇᴅ: {session.skipped}"
+            ),
+            parse_mode="HTML",
+            **BACKGROUND
+        )
+        for offset in range(0, len(entries), LOG_ALBUM_SIZE):
+            album = [
+                InputMediaVideo(media=entry["video"], caption=(entry["caption"] or None), supports_streaming=True, cover=entry["cover"])
+                for entry in entries[offset:offset + LOG_ALBUM_SIZE]
+            ]
+            await bot.send_media_group(chat_id=log_channel_id, media=album, **BACKGROUND)
+            logged += len(album)
+    except Exception as e:
+        logger.error(f"❌ Error logging bulk run of user {session.user_id}: {e}")
+    return logged
+
+
+def cover_fields(record: dict | None, auto_mode: str | None) -> dict:
+    """Payload fields describing the user's cover (shared by every video of a bulk run)"""
+    record = record or {}
+    return {
+        "cover": record.get("photo_id"),
+        "thumb_key": record.get("photo_unique_id"),
+        "overlay": record.get("overlay"),
+        # No saved thumbnail: a frame of the video becomes the cover
+        "auto_cover": auto_mode,
+    }
+
+
+def video_fields(message, source) -> dict:
+    """Payload fields describing one incoming video"""
+    # file_id reference only - documents/animations are re-sent as streaming video, never downloaded
+    return {
+        "video": source.file_id,
+        "video_unique_id": source.file_unique_id,
+        "file_size": getattr(source, "file_size", None) or 0,
+        # Get original caption and preserve it
+        "caption": message.caption or "",
+        "reply_to": message.message_id,
+        "date": str(message.date),
+    }
+
+
+@tracing.trace("video")
 async def video_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not await check_force_sub(update, context):
-        return
     user_id = update.message.from_user.id
+
+    # Reject unsupported files from metadata alone (videos, animations and video
+    # documents), before any API call or database lookup
+    source = get_video_source(update.message)
+    reason = precheck_video(source)
+
+    # Bulk mode: force-sub and thumbnail were checked once at /bulk, just queue the video
+    session = bulk_sessions.get(user_id)
+    if session:
+        if reason or not session.add(video_fields(update.message, source)):
+            session.skip()
+        return
+    if reason:
+        return await update.message.reply_text("❌ ᴠɪᴅᴇᴏ ʀᴇᴊᴇᴄᴛᴇᴅ\n\n" + reason, reply_to_message_id=update.message.message_id, parse_mode="HTML")
+    tracing.annotate(user_id=user_id)
+
+    # The force-sub check (Bot API) and the thumbnail lookup (MongoDB) don't depend on each other
+    subscribed, record = await fan_out(
+        tracing.traced("check_force_sub", check_force_sub(update, context)),
+        tracing.traced("get_thumbnail", asyncio.to_thread(get_thumbnail_record, user_id)),
+        label="video checks",
+    )
+    if subscribed is not True:
+        return
     username = update.message.from_user.username or "No Username"
-    cover = get_thumbnail(user_id)
-    if not cover:
-        return await update.message.reply_text("❌ ɴᴏ ᴛʜᴜᴍʙɴᴀɪʟ ꜰᴏᴜɴᴅ\n\nꜱᴇɴᴅ ᴀ ᴘʜᴏᴛᴏ ꜰɪʀsᴛ ᴛᴏ sᴀᴠᴇ ᴛʜᴜᴍʙɴᴀɪʟ", reply_to_message_id=update.message.message_id, parse_mode="HTML")
-    msg = await update.message.reply_text("⏳ ᴘʀᴏᴄᴇssɪɴɢ ᴠɪᴅᴇᴏ\n\nᴘʟᴇᴀsᴇ ᴡᴀɪᴛ ᴀ ꜰᴇᴡ sᴇᴄᴏɴᴅs", reply_to_message_id=update.message.message_id, parse_mode="HTML")
-    
-    video = update.message.video.file_id
-    
-    # Get original caption and preserve it
-    original_caption = update.message.caption or ""
-    new_caption = original_caption
-    caption_entities = bold_entities(original_caption)
-    
-    media = InputMediaVideo(media=video, caption=new_caption,caption_entities=caption_entities, supports_streaming=True, cover=cover)
-    
+
+    if isinstance(record, Exception):
+        record = None
+    auto_mode = None if record else await asyncio.to_thread(get_auto_cover, user_id)
+    if not record and not auto_mode:
+        return await update.message.reply_text("❌ ɴᴏ ᴛʜᴜᴍʙɴᴀɪʟ ꜰᴏᴜɴᴅ\n\nꜱᴇɴᴅ ᴀ ᴘʜᴏᴛᴏ ꜰɪʀsᴛ ᴛᴏ sᴀᴠᴇ ᴛʜᴜᴍʙɴᴀɪʟ\nᴏʀ ᴇɴᴀʙʟᴇ /autocover", reply_to_message_id=update.message.message_id, parse_mode="HTML")
+
+    payload = {
+        "chat_id": update.effective_chat.id,
+        "user_id": user_id,
+        "username": username,
+        **cover_fields(record, auto_mode),
+        **video_fields(update.message, source),
+        # Lets the queue worker continue this update's trace
+        "trace": tracing.current_context(),
+    }
+
+    # Persist the job so transient failures are retried and restarts don't lose it
+    with tracing.span("enqueue"):
+        queued = await cover_queue.enqueue(payload)
+    if queued:
+        return
+
+    # Queue storage unavailable - process inline as a last resort
     try:
-        # Edit message with video and cover
-        await context.bot.edit_message_media(chat_id=update.effective_chat.id, message_id=msg.message_id, media=media)
-        
-        # Forward video to log channel
-        if LOG_CHANNEL_ID:
-            try:
-                log_caption = (
-                    f"🎥 <b>ᴠɪᴅᴇᴏ ᴘʀᴏᴄᴇssɪɴɢ ᴄᴏᴍᴘʟᴇᴛᴇᴅ</b>\n\n"
-                    f"👤 ᴜsᴇʀ ɪᴅ: <code>{user_id}</code>\n"
-                    f"📌 ᴜsᴇʀɴᴀᴍᴇ: @{username}\n"
-                    f"📝 ᴄᴀᴘᴛɪᴏɴ: {original_caption or 'ɴᴏ ᴄᴀᴘᴛɪᴏɴ'}\n"
-                    f"⏰ ᴛɪᴍᴇsᴛᴀᴍᴘ: {update.message.date}"
-                )
-                await context.bot.send_video(
-                    chat_id=LOG_CHANNEL_ID,
-                    video=video,
-                    caption=log_caption,
-                    supports_streaming=True,
-                    thumbnail=cover,
-                    parse_mode="HTML"
-                )
-                logger.debug(f"✅ Video logged to channel for user {user_id}")
-            except Exception as e:
-                logger.error(f"❌ Error forwarding video to log channel: {e}")
+        await process_cover_job(context.bot, payload)
     except Exception as e:
         await update.message.reply_text("❌ ᴘʀᴏᴄᴇssɪɴɢ ꜰᴀɪʟᴇᴅ\n\nᴇʀʀᴏʀ: " + str(e)[:50], parse_mode="HTML")
 
 
+async def process_cover_job(bot, payload: dict) -> dict | None:
+    """
+    Queue worker entry point: apply the cover, then forward to the log channel.
+    Bulk videos are not logged one by one: their log entry is returned for the
+    session to log in batches.
+    """
+    cover = payload["cover"]
+    if not cover and payload.get("auto_cover"):
+        with tracing.span("auto_cover"):
+            cover, frame_id, frame_unique_id = await auto_cover(
+                bot, payload["video"], payload["video_unique_id"], payload.get("file_size", 0)
+            )
+        payload["cover"] = frame_id
+        if payload["auto_cover"] == "save" and frame_id:
+            # With its file_unique_id the frame joins the shared thumbnail store like a sent photo
+            await asyncio.to_thread(save_thumbnail, payload["user_id"], frame_id, frame_unique_id)
+
+    log_cover, thumb_key = payload["cover"], payload.get("thumb_key")
+    if payload.get("overlay") and thumb_key:
+        try:
+            with tracing.span("render_cover"):
+                rendered, render_id = await render_cover(bot, payload["cover"], thumb_key, payload["overlay"], payload["caption"])
+        except Exception as e:
+            # A broken template must not block the video; fall back to the plain cover
+            logger.warning(f"⚠️ Overlay render failed for user {payload['user_id']}: {e}")
+            rendered = render_id = None
+        if rendered:
+            cover = rendered
+            log_cover = render_id or log_cover
+
+    async def send(video):
+        return await apply_cover(
+            bot,
+            chat_id=payload["chat_id"],
+            video=video,
+            cover=cover,
+            caption=payload["caption"],
+            reply_to_message_id=payload.get("reply_to"),
+            mode=payload.get("mode"),
+            priority="cover",
+            # Retries edit the placeholder of the first attempt instead of posting another
+            placeholder_id=payload.get("placeholder_id"),
+            on_placeholder=lambda message_id: payload.update(placeholder_id=message_id),
+        )
+
+    try:
+        sent, _ = await send(payload["video"])
+    except BadRequest as e:
+        if not is_file_type_rejection(e):
+            raise
+        # A document/animation file_id Telegram won't take as a video: upload the file itself
+        logger.info(f"ℹ️ Re-uploading file of user {payload['user_id']} as a video: {e}")
+        with tracing.span("reupload_video"):
+            data = await upload_video_source(bot, payload)
+            sent, _ = await send(InputFile(data, filename=f"{payload.get('video_unique_id') or 'video'}.mp4"))
+        # Later steps (log, inline results, retries) use the new video's file_id
+        if getattr(sent, "video", None):
+            payload["video"] = sent.video.file_id
+    # Offer the covered video in inline mode; its file_id can be re-shared at no cost
+    if getattr(sent, "video", None):
+        spawn(asyncio.to_thread(
+            add_recent_result, payload["user_id"], sent.video.file_id,
+            payload.get("video_unique_id") or sent.video.file_unique_id, payload["caption"], log_cover
+        ))
+    if payload.get("bulk"):
+        return {"video": payload["video"], "cover": log_cover, "caption": payload["caption"]}
+    # Log forwarding must not hold a cover worker
+    spawn(log_covered_video(
+        bot, payload["user_id"], payload["username"], payload["caption"], payload["date"],
+        payload["video"], log_cover
+    ))
+
+
+async def notify_dead_job(bot, job: dict) -> None:
+    """Tell the user their video could not be processed after all retries"""
+    payload = job["payload"]
+    if payload.get("placeholder_id"):
+        try:
+            await bot.delete_message(chat_id=payload["chat_id"], message_id=payload["placeholder_id"], **BACKGROUND)
+        except Exception as e:
+            logger.debug(f"Could not delete placeholder of dead job: {e}")
+    await bot.send_message(
+        chat_id=payload["chat_id"],
+        text="❌ ᴘʀᴏᴄᴇssɪɴɢ ꜰᴀɪʟᴇᴅ\n\nᴇʀʀᴏʀ: " + str(job.get("last_error", ""))[:50],
+        reply_to_message_id=payload.get("reply_to"),
+        parse_mode="HTML",
+    )
+
+
+"""--------------------INLINE MODE--------------------"""
+
+INLINE_PAGE_SIZE = 20
+
+
+async def inline_query_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Serve the user's recently covered videos straight from cache (no processing)"""
+    query = update.inline_query
+    offset = int(query.offset) if query.offset.isdigit() else 0
+
+    results = await asyncio.to_thread(
+        get_recent_results, query.from_user.id, offset, INLINE_PAGE_SIZE, query.query.strip()
+    )
+    answers = [
+        InlineQueryResultCachedVideo(
+            id=str(item["_id"]),
+            video_file_id=item["video_id"],
+            title=(item.get("caption") or "ᴄᴏᴠᴇʀᴇᴅ ᴠɪᴅᴇᴏ").split("\n")[0][:64],
+            description=item["created_at"].strftime("%Y-%m-%d %H:%M") if item.get("created_at") else None,
+            caption=item.get("caption") or None,
+            caption_entities=bold_entities(item.get("caption")),
+        )
+        for item in results
+    ]
+    next_offset = str(offset + INLINE_PAGE_SIZE) if len(results) == INLINE_PAGE_SIZE else ""
+    await query.answer(answers, cache_time=10, is_personal=True, next_offset=next_offset)
+
+
+"""--------------------CHANNEL AUTO-COVER--------------------"""
+
+async def channel_post_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Queue videos posted in a linked channel for covering, in posting order"""
+    message = update.channel_post
+    settings = await channel_configs.get(message.chat_id)
+    if not settings:
+        return
+
+    source = get_video_source(message)
+    reason = precheck_video(source)
+    if reason:
+        logger.info(f"⏭ Channel {message.chat_id} post {message.message_id} skipped: {reason}")
+        return
+
+    channel_queue.submit(context.bot, message.chat_id, {
+        "chat_id": message.chat_id,
+        "message_id": message.message_id,
+        "video": source.file_id,
+        "cover": settings["photo_id"],
+        "mode": settings.get("mode", "edit"),
+        "caption": message.caption or "",
+        "caption_entities": message.caption_entities,
+    })
+
+
+async def process_channel_post(bot, job: dict) -> None:
+    """Apply the channel cover: edit the post in place, or re-post it and delete the original"""
+    started = time.monotonic()
+    if job["mode"] == "repost":
+        await bot.send_video(
+            chat_id=job["chat_id"],
+            video=job["video"],
+            caption=job["caption"],
+            caption_entities=job["caption_entities"],
+            supports_streaming=True,
+            cover=job["cover"],
+            **COVER
+        )
+        await bot.delete_message(chat_id=job["chat_id"], message_id=job["message_id"], **COVER)
+    else:
+        media = InputMediaVideo(
+            media=job["video"],
+            caption=job["caption"],
+            caption_entities=job["caption_entities"],
+            supports_streaming=True,
+            cover=job["cover"],
+        )
+        await bot.edit_message_media(chat_id=job["chat_id"], message_id=job["message_id"], media=media, **COVER)
+    metrics.observe(f"channel_post.{job['mode']}", time.monotonic() - started)
+
+
+async def channel_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Link a channel - usage: /channel <id|@username> [edit|repost|off]"""
+    if not await check_force_sub(update, context):
+        return
+    user_id = update.message.from_user.id
+    args = update.message.text.split()[1:]
+
+    if not args:
+        linked = get_user_channels(user_id)
+        lines = [f"• {html.escape(ch.get('title') or str(ch['_id']))} (<code>{ch['_id']}</code>) – {ch.get('mode', 'edit')}" for ch in linked]
+        return await update.message.reply_text(
+            "📢 ᴄʜᴀɴɴᴇʟ ᴀᴜᴛᴏ-ᴄᴏᴠᴇʀ\n\n"
+            "ᴀᴅᴅ ᴛʜᴇ ʙᴏᴛ ᴀs ᴀᴅᴍɪɴ ᴀɴᴅ ᴇᴠᴇʀʏ ᴠɪᴅᴇᴏ ᴘᴏsᴛᴇᴅ ɢᴇᴛs ʏᴏᴜʀ ᴄᴏᴠᴇʀ\n\n"
+            + ("\n".join(lines) + "\n\n" if lines else "")
+            + "/channel @channel – ʟɪɴᴋ (ᴇᴅɪᴛ ᴘᴏsᴛs)\n"
+            "/channel @channel repost – ʀᴇ-ᴘᴏsᴛ & ᴅᴇʟᴇᴛᴇ ᴏʀɪɢɪɴᴀʟ\n"
+            "/channel @channel off – ᴜɴʟɪɴᴋ",
+            parse_mode="HTML"
+        )
+
+    target = args[0]
+    mode = args[1].lower() if len(args) > 1 else "edit"
+    if mode not in ("edit", "repost", "off"):
+        return await update.message.reply_text("❌ ᴍᴏᴅᴇ ᴍᴜsᴛ ʙᴇ edit, repost ᴏʀ off")
+
+    try:
+        chat = await context.bot.get_chat(int(target) if target.lstrip("-").isdigit() else target)
+    except Exception as e:
+        return await update.message.reply_text("❌ ᴄʜᴀɴɴᴇʟ ɴᴏᴛ ꜰᴏᴜɴᴅ\n\nᴇʀʀᴏʀ: " + str(e)[:50], parse_mode="HTML")
+
+    if mode == "off":
+        channel_configs.invalidate(chat.id)
+        if remove_channel(chat.id, user_id):
+            return await update.message.reply_text("✅ ᴄʜᴀɴɴᴇʟ ᴜɴʟɪɴᴋᴇᴅ", parse_mode="HTML")
+        return await update.message.reply_text("⚠️ ᴄʜᴀɴɴᴇʟ ɪs ɴᴏᴛ ʟɪɴᴋᴇᴅ ʙʏ ʏᴏᴜ", parse_mode="HTML")
+
+    try:
+        member = await context.bot.get_chat_member(chat.id, user_id)
+        me = await context.bot.get_chat_member(chat.id, context.bot.id)
+    except Exception as e:
+        return await update.message.reply_text("❌ ᴄᴀɴɴᴏᴛ ᴄʜᴇᴄᴋ ᴄʜᴀɴɴᴇʟ ᴀᴅᴍɪɴs\n\nᴇʀʀᴏʀ: " + str(e)[:50], parse_mode="HTML")
+
+    if member.status not in (ChatMemberStatus.ADMINISTRATOR, ChatMemberStatus.OWNER):
+        return await update.message.reply_text("❌ ʏᴏᴜ ᴍᴜsᴛ ʙᴇ ᴀɴ ᴀᴅᴍɪɴ ᴏꜰ ᴛʜᴀᴛ ᴄʜᴀɴɴᴇʟ", parse_mode="HTML")
+    needed = ("can_post_messages", "can_delete_messages") if mode == "repost" else ("can_edit_messages",)
+    if me.status != ChatMemberStatus.ADMINISTRATOR or not all(getattr(me, right, False) for right in needed):
+        return await update.message.reply_text(
+            "❌ ʙᴏᴛ ɪs ɴᴏᴛ ᴀɴ ᴀᴅᴍɪɴ ᴛʜᴇʀᴇ\n\nɢʀᴀɴᴛ: " + ", ".join(needed),
+            parse_mode="HTML"
+        )
+
+    record = get_thumbnail_record(user_id)
+    if not record:
+        return await update.message.reply_text("❌ ɴᴏ ᴛʜᴜᴍʙɴᴀɪʟ ꜰᴏᴜɴᴅ\n\nꜱᴇɴᴅ ᴀ ᴘʜᴏᴛᴏ ꜰɪʀsᴛ - ɪᴛ ʙᴇᴄᴏᴍᴇs ᴛʜᴇ ᴄʜᴀɴɴᴇʟ ᴄᴏᴠᴇʀ", parse_mode="HTML")
+
+    if set_channel(chat.id, user_id, chat.title or "", record["photo_id"], mode):
+        channel_configs.invalidate(chat.id)
+        await update.message.reply_text(f"✅ ᴄʜᴀɴɴᴇʟ ʟɪɴᴋᴇᴅ ({mode})\n\nɴᴇᴡ ᴠɪᴅᴇᴏs ᴘᴏsᴛᴇᴅ ᴛʜᴇʀᴇ ɢᴇᴛ ʏᴏᴜʀ ᴄᴏᴠᴇʀ", parse_mode="HTML")
+    else:
+        await update.message.reply_text("❌ ꜰᴀɪʟᴇᴅ ᴛᴏ ᴜᴘᴅᴀᴛᴇ sᴇᴛᴛɪɴɢ")
+
+
+# Per-bot instances (see profiles.ProfileLocal); Telegram rate limits apply per token
+cover_queue = ProfileLocal(lambda: CoverJobQueue(handler=process_cover_job, on_dead=notify_dead_job))
+channel_queue = ProfileLocal(lambda: ChannelQueue(process=process_channel_post))
+channel_configs = ProfileLocal(ChannelConfigCache)
+# Shard workers share one token, so each gets an equal part of its budget
+rate_limiter = ProfileLocal(
+    lambda: PriorityRateLimiter(rate=shard_rate(current_profile().rate_limit_per_second or RATE_LIMIT_PER_SECOND))
+)
+update_processor = ProfileLocal(UserOrderedUpdateProcessor)
+
+
+async def autocover_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Toggle auto-cover - usage: /autocover on|save|off"""
+    if not await check_force_sub(update, context):
+        return
+    user_id = update.message.from_user.id
+
+    args = update.message.text.split()
+    if len(args) < 2 or args[1].lower() not in ("on", "save", "off"):
+        current = get_auto_cover(user_id) or "off"
+        return await update.message.reply_text(
+            "🎞 ᴀᴜᴛᴏ-ᴄᴏᴠᴇʀ\n\n"
+            "ᴜsᴇ ᴀ ꜰʀᴀᴍᴇ ꜰʀᴏᴍ ᴛʜᴇ ᴠɪᴅᴇᴏ ᴡʜᴇɴ ɴᴏ ᴛʜᴜᴍʙɴᴀɪʟ ɪs sᴀᴠᴇᴅ\n\n"
+            f"📌 ᴄᴜʀʀᴇɴᴛ: {current}\n\n"
+            "/autocover on – ᴇɴᴀʙʟᴇ\n"
+            "/autocover save – ᴇɴᴀʙʟᴇ & sᴀᴠᴇ ꜰʀᴀᴍᴇ ᴀs ᴛʜᴜᴍʙɴᴀɪʟ\n"
+            "/autocover off – ᴅɪsᴀʙʟᴇ",
+            parse_mode="HTML"
+        )
+
+    mode = args[1].lower()
+    if set_auto_cover(user_id, None if mode == "off" else mode):
+        await update.message.reply_text(f"✅ ᴀᴜᴛᴏ-ᴄᴏᴠᴇʀ: {mode}", parse_mode="HTML")
+    else:
+        await update.message.reply_text("❌ ꜰᴀɪʟᴇᴅ ᴛᴏ ᴜᴘᴅᴀᴛᴇ sᴇᴛᴛɪɴɢ")
+
+
+async def bulk_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Start a bulk session: forwarded videos are queued and processed without per-video replies"""
+    if not await check_force_sub(update, context):
+        return
+    user_id = update.message.from_user.id
+
+    if bulk_sessions.get(user_id):
+        return await update.message.reply_text("⚠️ ʙᴜʟᴋ ᴍᴏᴅᴇ ɪs ᴀʟʀᴇᴀᴅʏ ᴀᴄᴛɪᴠᴇ\n\nsᴇɴᴅ /done ᴛᴏ ꜰɪɴɪsʜ", parse_mode="HTML")
+
+    record = await asyncio.to_thread(get_thumbnail_record, user_id)
+    auto_mode = None if record else await asyncio.to_thread(get_auto_cover, user_id)
+    if not record and not auto_mode:
+        return await update.message.reply_text("❌ ɴᴏ ᴛʜᴜᴍʙɴᴀɪʟ ꜰᴏᴜɴᴅ\n\nꜱᴇɴᴅ ᴀ ᴘʜᴏᴛᴏ ꜰɪʀsᴛ ᴛᴏ sᴀᴠᴇ ᴛʜᴜᴍʙɴᴀɪʟ\nᴏʀ ᴇɴᴀʙʟᴇ /autocover", parse_mode="HTML")
+
+    template = {
+        "chat_id": update.effective_chat.id,
+        "user_id": user_id,
+        "username": update.message.from_user.username or "No Username",
+        **cover_fields(record, auto_mode),
+        # One send_video per video (no placeholder), logged in batches when the session ends
+        "mode": "direct",
+        "bulk": True,
+    }
+    session = bulk_sessions.open(
+        context.bot, user_id, update.effective_chat.id, template, process_cover_job, log_batch=log_bulk_videos
+    )
+    msg = await update.message.reply_text(session.progress_text(), parse_mode="HTML")
+    session.start(msg.message_id)
+
+
+async def done_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Finish the bulk session once queued videos are processed"""
+    session = bulk_sessions.get(update.message.from_user.id)
+    if not session:
+        return await update.message.reply_text("⚠️ ɴᴏ ᴀᴄᴛɪᴠᴇ ʙᴜʟᴋ sᴇssɪᴏɴ\n\nsᴛᴀʀᴛ ᴏɴᴇ ᴡɪᴛʜ /bulk", parse_mode="HTML")
+
+    # The session posts its summary when queued videos are done; don't hold this user's update slot
+    spawn(session.finish())
+
+
+async def overlay_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Set the cover overlay template - usage: /overlay [top|center|bottom] <text> or /overlay off"""
+    if not await check_force_sub(update, context):
+        return
+    user_id = update.message.from_user.id
+
+    args = update.message.text.split(maxsplit=1)
+    if len(args) < 2:
+        overlay = get_overlay(user_id)
+        current = html.escape(f"{overlay['text']} ({overlay.get('position', 'bottom')})") if overlay else "off"
+        return await update.message.reply_text(
+            "🏷 ᴄᴏᴠᴇʀ ᴏᴠᴇʀʟᴀʏ\n\n"
+            "sᴛᴀᴍᴘ ᴛᴇxᴛ ᴏɴ ʏᴏᴜʀ ᴄᴏᴠᴇʀ ꜰᴏʀ ᴇᴀᴄʜ ᴠɪᴅᴇᴏ\n\n"
+            f"📌 ᴄᴜʀʀᴇɴᴛ: {current}\n\n"
+            "/overlay Episode {episode}\n"
+            "/overlay top {caption}\n"
+            "/overlay off – ᴅɪsᴀʙʟᴇ\n\n"
+            "<code>{episode}</code> – ᴇᴘɪsᴏᴅᴇ ɴᴜᴍʙᴇʀ ꜰʀᴏᴍ ᴄᴀᴘᴛɪᴏɴ\n"
+            "<code>{caption}</code> – ꜰɪʀsᴛ ʟɪɴᴇ ᴏꜰ ᴄᴀᴘᴛɪᴏɴ",
+            parse_mode="HTML"
+        )
+
+    text = args[1].strip()
+    if text.lower() == "off":
+        set_overlay(user_id, None)
+        return await update.message.reply_text("✅ ᴏᴠᴇʀʟᴀʏ ᴅɪsᴀʙʟᴇᴅ", parse_mode="HTML")
+
+    position = "bottom"
+    first, _, rest = text.partition(" ")
+    if first.lower() in OVERLAY_POSITIONS and rest.strip():
+        position, text = first.lower(), rest.strip()
+
+    if set_overlay(user_id, text, position):
+        await update.message.reply_text(f"✅ ᴏᴠᴇʀʟᴀʏ sᴀᴠᴇᴅ ({position})", parse_mode="HTML")
+    else:
+        await update.message.reply_text("❌ ꜰᴀɪʟᴇᴅ ᴛᴏ ᴜᴘᴅᴀᴛᴇ sᴇᴛᴛɪɴɢ")
+
+
 async def restart(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
 
@@ -1283,8 +1805,15 @@ async def restart(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     msg = await update.message.reply_text("🔄 Checking for updates from upstream...")
 
+    # Stream each finished step to the admin; the event loop keeps serving users meanwhile
+    steps = []
+
+    async def report_progress(line: str) -> None:
+        steps.append(line)
+        await msg.edit_text("🔄 <b>ᴜᴘᴅᴀᴛɪɴɢ ꜰʀᴏᴍ ᴜᴘsᴛʀᴇᴀᴍ</b>\n\n" + "\n".join(steps), parse_mode="HTML")
+
     try:
-        success = update_from_upstream()
+        success = await update_from_upstream(progress=report_progress)
 
         if not success:
             await msg.edit_text(
@@ -1293,7 +1822,9 @@ async def restart(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 "ᴘʟᴇᴀsᴇ ᴄʜᴇᴄᴋ:\n"
                 "• ᴜᴘsᴛʀᴇᴀᴍ_ʀᴇᴘᴏ ɪs ᴄᴏʀʀᴇᴄᴛ\n"
                 "• ᴜᴘsᴛʀᴇᴀᴍ_ʙʀᴀɴᴄʜ ɪs ᴄᴏʀʀᴇᴄᴛ\n"
-                "• ɪɴᴛᴇʀɴᴇᴛ ᴄᴏɴɴᴇᴄᴛɪᴏɴ ɪs ᴀᴄᴛɪᴠᴇ\n\n"
+                "• ɪɴᴛᴇʀɴᴇᴛ ᴄᴏɴɴᴇᴄᴛɪᴏɴ ɪs ᴀᴄᴛɪᴠᴇ\n"
+                "• ɴᴇᴡ ᴄᴏᴅᴇ ᴄᴏᴍᴘɪʟᴇs ᴀɴᴅ ɪᴍᴘᴏʀᴛs (ʀᴏʟʟᴇᴅ ʙᴀᴄᴋ ɪꜰ ɴᴏᴛ)\n\n"
+                + "\n".join(steps) + "\n\n"
                 "ᴄʜᴇᴄᴋ ʟᴏɢs ꜰᴏʀ ᴅᴇᴛᴀɪʟs.",
                 parse_mode="HTML"
             )
@@ -1304,16 +1835,18 @@ async def restart(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await msg.edit_text(
             "✅ <b>ᴜᴘᴅᴀᴛᴇ sᴜᴄᴄᴇssꜰᴜʟ!</b>\n\n"
             "🔄 ʀᴇsᴛᴀʀᴛɪɴɢ ʙᴏᴛ ᴡɪᴛʜ ɴᴇᴡ ᴄʜᴀɴɢᴇs...\n"
-            "<i>ᴘʟᴇᴀsᴇ ᴡᴀɪᴛ...</i>",
+            "<i>ᴅʀᴀɪɴɪɴɢ ɪɴ-ꜰʟɪɢʜᴛ ᴡᴏʀᴋ, ᴘʟᴇᴀsᴇ ᴡᴀɪᴛ...</i>",
             parse_mode="HTML"
         )
         
-        logger.info("✅ Update completed successfully. Restarting bot...")
-        # Give time for message to be sent
-        await asyncio.sleep(1)
+        logger.info("✅ Update completed successfully. Draining before restart...")
+        # Stop intake, finish in-flight handlers/jobs/logs, flush state, then re-exec
+        report = await coordinator.drain(context.application)
+        if not all(report.values()):
+            logger.warning(f"⚠️ Restarting with incomplete drain: {report}")
         
         # Restart the bot
-        os.execv(sys.executable, [sys.executable] + sys.argv)
+        coordinator.reexec()
         
     except Exception as e:
         logger.error(f"❌ ᴇʀʀᴏʀ ᴅᴜʀɪɴɢ ʀᴇsᴛᴀʀᴛ/ᴜᴘᴅᴀᴛᴇ: {e}")
@@ -1333,52 +1866,17 @@ async def admin_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not await check_admin(update):
         return
     
-    text = (
-        "🛡️ ᴀᴅᴍɪɴ ᴄᴏɴᴛʀᴏʟ ᴘᴀɴᴇʟ\n\n"
-        "👑 <b>ᴡᴇʟᴄᴏᴍᴇ ᴀᴅᴍɪɴ</b>\n\n"
-        "<b>ᴍᴀɴᴀɢᴇᴍᴇɴᴛ ᴛᴏᴏʟs ᴀᴠᴀɪʟᴀʙʟᴇ:</b>\n\n"
-        "📊 <b>sᴛᴀᴛɪsᴛɪᴄs</b> – ᴜsᴇʀ ᴀɴᴀʟʏᴛɪᴄs\n"
-        "⏱️ <b>sᴛᴀᴛᴜs</b> – ʙᴏᴛ ᴘᴇʀꜰᴏʀᴍᴀɴᴄᴇ\n"
-        "👥 <b>ᴜsᴇʀs</b> – ᴛᴏᴛᴀʟ ᴜsᴇʀs ᴄᴏᴜɴᴛ\n"
-        "🚫 <b>ʙᴀɴ ᴜsᴇʀ</b> – ʙʟᴏᴄᴋ ᴜsᴇʀs\n"
-        "✅ <b>ᴜɴʙᴀɴ ᴜsᴇʀ</b> – ʀᴇsᴛᴏʀᴇ ᴀᴄᴄᴇss\n"
-        "📢 <b>ʙʀᴏᴀᴅᴄᴀsᴛ</b> – sᴇɴᴅ ᴀɴɴᴏᴜɴᴄᴇᴍᴇɴᴛs\n\n"
-        "sᴇʟᴇᴄᴛ ᴀɴ ᴏᴘᴛɪᴏɴ:"
-    )
-    admin_kb = InlineKeyboardMarkup([
-        [InlineKeyboardButton("📊 sᴛᴀᴛɪsᴛɪᴄs", callback_data="admin_stats"),
-         InlineKeyboardButton("⏱️ sᴛᴀᴛᴜs", callback_data="admin_status")],
-        [InlineKeyboardButton("👥 ᴜsᴇʀs", callback_data="admin_users"),
-         InlineKeyboardButton("🚫 ʙᴀɴ ᴜsᴇʀ", callback_data="admin_ban")],
-        [InlineKeyboardButton("✅ ᴜɴʙᴀɴ ᴜsᴇʀ", callback_data="admin_unban"),
-         InlineKeyboardButton("📢 ʙʀᴏᴀᴅᴄᴀsᴛ", callback_data="admin_broadcast")],
-        [InlineKeyboardButton("⬅️ ʙᴀᴄᴋ", callback_data="menu_back")],
-    ])
-    
     # Get home menu banner
-    banner = HOME_MENU_BANNER_URL
+    banner = current_profile().home_menu_banner_url
     
     if banner:
         try:
-            if isinstance(banner, str) and os.path.isfile(banner):
-                await update.message.reply_photo(
-                    photo=InputFile(banner),
-                    caption=text,
-                    reply_markup=admin_kb,
-                    parse_mode="HTML"
-                )
-            else:
-                await update.message.reply_photo(
-                    photo=banner,
-                    caption=text,
-                    reply_markup=admin_kb,
-                    parse_mode="HTML"
-                )
+            await screens.reply(update.message, screens["admin_menu"], photo=banner_photo(banner))
             return
         except Exception as e:
             logger.warning(f"Could not send admin menu banner: {e}")
     
-    await update.message.reply_text(text, reply_markup=admin_kb, parse_mode="HTML")
+    await screens.reply(update.message, screens["admin_menu"])
 
 
 async def ban_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -1450,12 +1948,16 @@ async def stats_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not await check_admin(update):
         return
     
-    stats = get_stats()
+    # In cluster mode the leader refreshes the counters; nodes read its snapshot instead of counting
+    stats = CLUSTER_MODE and get_cluster_state("stats", max_age=cluster.CLUSTER_STATS_INTERVAL * 3)
+    if not stats:
+        stats = get_stats()
     text = (
         "📊 ʙᴏᴛ sᴛᴀᴛɪsᴛɪᴄs\n\n"
         f"👥 ᴛᴏᴛᴀʟ ᴜsᴇʀs: {stats['total_users']}\n"
         f"🚫 ʙᴀɴɴᴇᴅ ᴜsᴇʀs: {stats['banned_users']}\n"
-        f"🖼 ᴜsᴇʀs ᴡɪᴛʜ ᴛʜᴜᴍʙɴᴀɪʟ: {stats['users_with_thumbnail']}"
+        f"🖼 ᴜsᴇʀs ᴡɪᴛʜ ᴛʜᴜᴍʙɴᴀɪʟ: {stats['users_with_thumbnail']}\n"
+        f"🧬 ᴜɴɪǫᴜᴇ ɪᴍᴀɢᴇs: {stats['unique_thumbnails']} (ᴅᴇᴅᴜᴘ {stats['thumbnail_dedup_ratio']:.2f}x)"
     )
     await update.message.reply_text(text, parse_mode="HTML")
 
@@ -1487,6 +1989,10 @@ async def status_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
             f"🔴 ᴄᴘᴜ: {cpu_percent}%\\n"
             f"🟡 ʀᴀᴍ: {ram_percent}% ({ram.used // (1024**2)} ᴍʙ / {ram.total // (1024**2)} ᴍʙ)"
         )
+        text += format_cover_latency()
+        text += format_http_pools()
+        if CLUSTER_MODE:
+            text += await format_cluster_status()
         await update.message.reply_text(text, parse_mode="HTML")
     except ImportError:
         text = (
@@ -1500,6 +2006,177 @@ async def status_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ ᴇʀʀᴏʀ: " + str(e))
 
 
+async def format_cluster_status() -> str:
+    """Cluster membership lines for the status screen"""
+    status = await cluster_node.status()
+    duties = ", ".join(f"{name} {runs}" for name, (runs, _) in status["duties"].items() if runs)
+    text = (
+        f"\n\n🛰 ɴᴏᴅᴇ: {status['node']}{' 👑' if cluster_node.is_leader else ''}\n"
+        f"👑 ʟᴇᴀᴅᴇʀ: {status['leader'] or '-'}\n"
+        f"🖥 ɴᴏᴅᴇs: {len(status['nodes'])}"
+    )
+    if duties:
+        text += f"\n🔁 ᴅᴜᴛɪᴇs: {duties}"
+    return text
+
+
+def format_http_pools() -> str:
+    """Connection pool utilization lines for the status screen"""
+    lines = []
+    for name, pool in transport.stats().items():
+        if not pool["requests"]:
+            continue
+        lines.append(
+            f"🔌 {name}: {pool['in_use']}/{pool['size']} (ᴘᴇᴀᴋ {pool['peak']}) | "
+            f"ᴡᴀɪᴛ ᴘ95 {pool['p95_wait']:.0f}ᴍs | ᴘ95 {pool['p95_latency']:.0f}ᴍs | ᴛɪᴍᴇᴏᴜᴛs {pool['timeouts']}"
+        )
+    if not lines:
+        return ""
+    return f"\n\n🌐 ʜᴛᴛᴘ ᴘᴏᴏʟs (ʜᴛᴛᴘ/{transport.http_version()}):\n" + "\n".join(lines)
+
+
+def format_cover_latency() -> str:
+    """Per-mode cover send latency lines for the status screen"""
+    lines = []
+    for mode in ("direct", "edit"):
+        stat = metrics.summary(f"cover_send.{mode}")
+        if stat["count"]:
+            lines.append(f"🎬 {mode}: {stat['count']} | ᴀᴠɢ {stat['avg']:.0f}ᴍs | ᴘ95 {stat['p95']:.0f}ᴍs")
+    for name, label in (("imaging.frame_extract", "ꜰʀᴀᴍᴇ ᴇxᴛʀᴀᴄᴛ"),
+                        ("imaging.render", "ᴏᴠᴇʀʟᴀʏ ʀᴇɴᴅᴇʀ")):
+        stat = metrics.summary(name)
+        if stat["count"]:
+            lines.append(f"🖼 {label}: {stat['count']} | ᴀᴠɢ {stat['avg']:.0f}ᴍs | ᴘ95 {stat['p95']:.0f}ᴍs")
+    frame_hits = metrics.hit_ratio("cache.frames")
+    if frame_hits is not None:
+        lines.append(f"🎞 ꜰʀᴀᴍᴇ ᴄᴀᴄʜᴇ ʜɪᴛ: {frame_hits * 100:.0f}%")
+    render_hits = metrics.hit_ratio("cache.renders")
+    if render_hits is not None:
+        lines.append(f"🏷 ʀᴇɴᴅᴇʀ ᴄᴀᴄʜᴇ ʜɪᴛ: {render_hits * 100:.0f}%")
+    if not lines:
+        return ""
+    return "\n\n🎥 ᴄᴏᴠᴇʀ sᴇɴᴅ ʟᴀᴛᴇɴᴄʏ (ᴍᴏᴅᴇ: " + COVER_SEND_MODE + "):\n" + "\n".join(lines)
+
+
+async def queue_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Show cover queue depth and throughput"""
+    if not await check_admin(update):
+        return
+
+    stats = await cover_queue.stats()
+    text = (
+        "📦 ᴄᴏᴠᴇʀ ǫᴜᴇᴜᴇ\n\n"
+        f"⏳ ᴘᴇɴᴅɪɴɢ: {stats['pending']}\n"
+        f"⚙️ ᴘʀᴏᴄᴇssɪɴɢ: {stats['processing']} ({stats['in_flight']}/{stats['workers']} ᴡᴏʀᴋᴇʀs)\n"
+        f"💀 ᴅᴇᴀᴅ: {stats['dead']}\n\n"
+        f"✅ ᴘʀᴏᴄᴇssᴇᴅ: {stats['processed']}\n"
+        f"🔁 ʀᴇᴛʀɪᴇs: {stats['retried']}\n"
+        f"📈 ᴛʜʀᴏᴜɢʜᴘᴜᴛ: {stats['per_minute']}/ᴍɪɴ\n\n"
+        "🚦 ᴏᴜᴛʙᴏᴜɴᴅ sᴄʜᴇᴅᴜʟᴇʀ:\n"
+    )
+    drain = f"{catch_up.drain_seconds:.1f}s" if catch_up.drain_seconds is not None else "ᴅʀᴀɪɴɪɴɢ"
+    updates_text = (
+        "\n📥 ᴜᴘᴅᴀᴛᴇs:\n"
+        f"• sᴛᴀʀᴛᴜᴘ ʙᴀᴄᴋʟᴏɢ: {catch_up.backlog} ({drain})\n"
+        f"• ɪɴ ꜰʟɪɢʜᴛ: {update_processor.in_flight}\n"
+        f"• ᴅᴜᴘʟɪᴄᴀᴛᴇs sᴋɪᴘᴘᴇᴅ: {deduplicator.duplicates}\n"
+        f"• sᴛᴀʟᴇ ᴅʀᴏᴘᴘᴇᴅ: {deduplicator.stale}"
+    )
+    flood = flood_control.stats()
+    dropped = flood["dropped"]
+    updates_text += (
+        f"\n\n🚧 ꜰʟᴏᴏᴅ ᴄᴏɴᴛʀᴏʟ{' (ᴏᴠᴇʀʟᴏᴀᴅ)' if flood['overloaded'] else ''}:\n"
+        f"• ᴡᴀɪᴛɪɴɢ ᴜᴘᴅᴀᴛᴇs: {update_processor.backlog()}\n"
+        f"• ᴅʀᴏᴘᴘᴇᴅ: {dropped['command']} ᴄᴍᴅ | {dropped['callback']} ʙᴛɴ | {dropped['video']} ᴠɪᴅᴇᴏ | {dropped['inline']} ɪɴʟɪɴᴇ\n"
+        f"• ɴᴏᴛɪᴄᴇs: {flood['notices']} | ᴛʀᴀᴄᴋᴇᴅ: {flood['tracked']}"
+    )
+    channels = channel_queue.stats()
+    updates_text += (
+        f"\n\n📢 ᴄʜᴀɴɴᴇʟs: {channels['channels']} ᴀᴄᴛɪᴠᴇ | {channels['pending']} ǫᴜᴇᴜᴇᴅ | "
+        f"{channels['processed']} ᴅᴏɴᴇ | {channels['failed']} ꜰᴀɪʟᴇᴅ"
+    )
+    bulk = bulk_sessions.stats()
+    if bulk["sessions"]:
+        updates_text += f"\n\n📦 ʙᴜʟᴋ: {bulk['sessions']} sᴇssɪᴏɴ(s) | {bulk['pending']} ᴘᴇɴᴅɪɴɢ"
+    for name, cls in rate_limiter.stats().items():
+        text += f"• {name}: {cls['waiting']} ᴡᴀɪᴛɪɴɢ | ᴀᴠɢ {cls['avg_wait']:.0f}ᴍs | ᴘ95 {cls['p95_wait']:.0f}ᴍs\n"
+    text += updates_text
+    await update.message.reply_text(text, parse_mode="HTML")
+
+
+async def deadjobs_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """List dead-lettered cover jobs"""
+    if not await check_admin(update):
+        return
+
+    jobs = await cover_queue.dead_jobs()
+    if not jobs:
+        return await update.message.reply_text("✅ ɴᴏ ᴅᴇᴀᴅ ᴊᴏʙs")
+
+    lines = ["💀 ᴅᴇᴀᴅ ᴊᴏʙs\n"]
+    for job in jobs:
+        payload = job.get("payload", {})
+        error = html.escape(str(job.get("last_error") or "")[:60])
+        lines.append(f"<code>{job['_id']}</code> | ᴜsᴇʀ {payload.get('user_id')} | {job.get('attempts', 0)}x\n   {error}")
+    lines.append("\n/replay &lt;ᴊᴏʙ_ɪᴅ&gt; ᴏʀ /replay ᴀʟʟ")
+    await update.message.reply_text("\n".join(lines), parse_mode="HTML")
+
+
+async def replay_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Replay dead-lettered jobs - usage: /replay <job_id|all>"""
+    if not await check_admin(update):
+        return
+
+    args = update.message.text.split()
+    if len(args) < 2:
+        return await update.message.reply_text("❌ ᴜsᴀɢᴇ: /ʀᴇᴘʟᴀʏ <ᴊᴏʙ_ɪᴅ|ᴀʟʟ>")
+
+    job_id = None if args[1].lower() == "all" else args[1]
+    replayed = await cover_queue.replay(job_id)
+    await update.message.reply_text(f"🔁 ʀᴇᴘʟᴀʏᴇᴅ {replayed} ᴊᴏʙ(s)")
+
+
+# Spans listed per trace in /traces (keeps the reply under Telegram's length limit)
+TRACE_SPANS_SHOWN = 15
+
+
+async def traces_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Slowest recent traces with their span breakdown - usage: /traces [count]"""
+    if not await check_admin(update):
+        return
+
+    stats = tracing.tracer.stats()
+    if not tracing.tracer.enabled:
+        return await update.message.reply_text("🔍 ᴛʀᴀᴄɪɴɢ ɪs ᴏꜰꜰ\n\nsᴇᴛ TRACE_SAMPLE_RATE (ᴇ.ɢ. 0.05) ᴛᴏ sᴀᴍᴘʟᴇ ᴠɪᴅᴇᴏs")
+
+    args = update.message.text.split()
+    limit = min(int(args[1]), 10) if len(args) > 1 and args[1].isdigit() else 3
+    traces = tracing.tracer.slowest(max(limit, 1))
+    if not traces:
+        return await update.message.reply_text(f"🔍 ɴᴏ ᴛʀᴀᴄᴇs ʏᴇᴛ (sᴀᴍᴘʟɪɴɢ {stats['sample_rate']:.1%})")
+
+    text = (
+        f"🔍 sʟᴏᴡᴇsᴛ ᴛʀᴀᴄᴇs\n\n"
+        f"sᴀᴍᴘʟɪɴɢ {stats['sample_rate']:.1%} | {stats['kept']} ᴋᴇᴘᴛ | "
+        f"{stats['exported']} sᴘᴀɴs ᴇxᴘᴏʀᴛᴇᴅ | {stats['dropped']} ᴅʀᴏᴘᴘᴇᴅ | {stats['export_errors']} ᴇʀʀᴏʀs\n"
+    )
+    now = time.time()
+    for number, trace in enumerate(traces, 1):
+        user = trace.attr("user_id", "?")
+        age = int(now - trace.started)
+        text += (
+            f"\n<b>{number}. {html.escape(trace.name)}</b> • {trace.duration * 1000:.0f}ᴍs • "
+            f"ᴜsᴇʀ <code>{user}</code> • {age}s ᴀɢᴏ\n<code>{trace.trace_id}</code>\n"
+        )
+        lines = []
+        for depth, span in trace.tree()[:TRACE_SPANS_SHOWN]:
+            offset = (span.start - trace.started) * 1000
+            mark = " ❌" if span.error else ""
+            lines.append(f"{'  ' * depth}{span.name} +{offset:.0f} {span.duration * 1000:.0f}ms{mark}")
+        text += "<pre>" + html.escape("\n".join(lines)) + "</pre>"
+    await update.message.reply_text(text, parse_mode="HTML")
+
+
 async def broadcast_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Broadcast message to all users - usage: /broadcast <message>"""
     if not await check_admin(update):
@@ -1529,38 +2206,82 @@ async def broadcast_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
     msg = await update.message.reply_text(confirm_text, parse_mode="HTML")
     
+    broadcast = {
+        "_id": uuid.uuid4().hex,
+        "text": message_text,
+        "admin_label": update.message.from_user.username or update.message.from_user.id,
+        "chat_id": msg.chat_id,
+        "message_id": msg.message_id,
+        "sent": 0,
+        "failed": 0,
+        "last_user_id": None,
+    }
     try:
-        # Get all user IDs from database
-        from database import db
-        users_collection = db.get_collection("users")
-        all_users = users_collection.find({}, {"user_id": 1})
+        if CLUSTER_MODE:
+            # Delivered by the cluster leader (picked up within CLUSTER_BROADCAST_POLL seconds)
+            if not await asyncio.to_thread(create_broadcast, broadcast):
+                raise RuntimeError("could not queue broadcast")
+        else:
+            # Send in the background at low priority so interactive traffic isn't starved
+            spawn(run_broadcast(context.bot, broadcast))
         
-        user_ids = [user["user_id"] for user in all_users if "user_id" in user]
+    except Exception as e:
+        await msg.edit_text(
+            f"❌ ʙʀᴏᴀᴅᴄᴀsᴛ ꜰᴀɪʟᴇᴅ\\n\\n"
+            f"ᴇʀʀᴏʀ: {str(e)[:100]}\\n\\n"
+            "ᴄʜᴇᴄᴋ ʟᴏɢs ꜰᴏʀ ᴅᴇᴛᴀɪʟs.",
+            parse_mode="HTML"
+        )
+        logger.error(f"Broadcast error: {e}", exc_info=True)
+
+
+async def run_broadcast(bot, broadcast: dict, persist: bool = False) -> None:
+    """
+    Deliver a broadcast to all users and report the result. Users are paged in id order and,
+    with `persist`, progress is saved after every page so a new leader resumes where this one stopped.
+    """
+    sent = broadcast.get("sent", 0)
+    failed = broadcast.get("failed", 0)
+    last_user_id = broadcast.get("last_user_id")
+    message_text = broadcast["text"]
+    
+    try:
+        while True:
+            user_ids = await asyncio.to_thread(get_user_ids, last_user_id, BROADCAST_PAGE_SIZE)
+            if not user_ids:
+                break
+            for user_id in user_ids:
+                try:
+                    await bot.send_message(
+                        chat_id=user_id,
+                        text=f"📢 <b>Announcement from Admin</b>\n\n{message_text}",
+                        parse_mode="HTML",
+                        **BACKGROUND
+                    )
+                    sent += 1
+                except Exception as e:
+                    logger.warning(f"Could not send broadcast to user {user_id}: {e}")
+                    failed += 1
+                last_user_id = user_id
+            if persist:
+                await asyncio.to_thread(
+                    update_broadcast, broadcast["_id"],
+                    {"sent": sent, "failed": failed, "last_user_id": last_user_id}
+                )
         
-        if not user_ids:
-            await msg.edit_text(
-                "❌ ɴᴏ ᴜsᴇʀs ꜰᴏᴜɴᴅ\n\n"
-                "💭 ᴅᴀᴛᴀʙᴀsᴇ ɪs ᴇᴍᴘᴛʏ",
+        if persist:
+            await asyncio.to_thread(update_broadcast, broadcast["_id"], {"status": "done"})
+        
+        if not sent + failed:
+            await bot.edit_message_text(
+                chat_id=broadcast["chat_id"],
+                message_id=broadcast["message_id"],
+                text="❌ ɴᴏ ᴜsᴇʀs ꜰᴏᴜɴᴅ\n\n"
+                     "💭 ᴅᴀᴛᴀʙᴀsᴇ ɪs ᴇᴍᴘᴛʏ",
                 parse_mode="HTML"
             )
             return
         
-        # Send message to all users
-        sent = 0
-        failed = 0
-        
-        for user_id in user_ids:
-            try:
-                await context.bot.send_message(
-                    chat_id=user_id,
-                    text=f"📢 <b>Announcement from Admin</b>\n\n{message_text}",
-                    parse_mode="HTML"
-                )
-                sent += 1
-            except Exception as e:
-                logger.warning(f"Could not send broadcast to user {user_id}: {e}")
-                failed += 1
-        
         # Show final status
         result_text = (
             "✅ ʙʀᴏᴀᴅᴄᴀsᴛ ᴄᴏᴍᴘʟᴇᴛᴇᴅ\n\n"
@@ -1570,26 +2291,24 @@ async def broadcast_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
             f"📊 sᴜᴄᴄᴇss: {(sent/(sent+failed)*100):.1f}%"
         )
         
-        await msg.edit_text(result_text, parse_mode="HTML")
+        await bot.edit_message_text(
+            chat_id=broadcast["chat_id"],
+            message_id=broadcast["message_id"],
+            text=result_text,
+            parse_mode="HTML"
+        )
         
         # Log broadcast
-        if LOG_CHANNEL_ID:
+        if current_profile().log_channel_id:
             log_text = (
                 f"📢 <b>Broadcast Sent</b>\n\n"
-                f"👤 Admin: @{update.message.from_user.username or update.message.from_user.id}\n"
+                f"👤 Admin: @{broadcast['admin_label']}\n"
                 f"📤 Messages Sent: {sent}\n"
                 f"❌ Failed: {failed}\n"
                 f"📝 Message:\n{message_text}"
             )
-            await send_log(context, log_text)
-        
+            spawn(deliver_log(bot, log_text))
     except Exception as e:
-        await msg.edit_text(
-            f"❌ ʙʀᴏᴀᴅᴄᴀsᴛ ꜰᴀɪʟᴇᴅ\\n\\n"
-            f"ᴇʀʀᴏʀ: {str(e)[:100]}\\n\\n"
-            "ᴄʜᴇᴄᴋ ʟᴏɢs ꜰᴏʀ ᴅᴇᴛᴀɪʟs.",
-            parse_mode="HTML"
-        )
         logger.error(f"Broadcast error: {e}", exc_info=True)
 
 
@@ -1605,8 +2324,93 @@ async def text_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 """-----------CALLBAck Hnadlers--------"""
 
 
-def main() -> None:
-    app = Application.builder().token(TOKEN).build()
+ALLOWED_UPDATES = ["message", "callback_query", "channel_post", "inline_query"]
+
+
+"""═════════════════ CLUSTER DUTIES ═════════════════"""
+def register_cluster_duties(app: Application, jobs: CoverJobQueue):
+    """Singleton duties run by the leader node only. Returns this node's heartbeat counters"""
+    bot = app.bot
+    channels = channel_queue.current()
+
+    def node_counters() -> dict:
+        return {
+            "covers": jobs.processed,
+            "dead_jobs": jobs.dead,
+            "channel_posts": channels.processed,
+            "new_users": metrics.count("users.new"),
+        }
+
+    async def broadcasts() -> None:
+        while broadcast := await asyncio.to_thread(claim_broadcast, cluster_node.node_id):
+            logger.info(f"📢 Running broadcast {broadcast['_id']} as cluster leader")
+            await run_broadcast(bot, broadcast, persist=True)
+
+    async def refresh_stats() -> None:
+        stats = await asyncio.to_thread(get_stats)
+        await asyncio.to_thread(save_cluster_state, "stats", stats)
+
+    async def reconcile() -> None:
+        await asyncio.to_thread(reconcile_thumbnail_refs)
+        # Jobs claimed by nodes that stopped heartbeating would otherwise stay "processing" forever
+        live = [node["_id"] for node in await asyncio.to_thread(get_live_nodes, cluster.CLUSTER_LEASE_TTL)]
+        if cluster_node.node_id not in live:
+            return
+        recovered = await asyncio.to_thread(requeue_stale_jobs, None, live)
+        if recovered:
+            logger.info(f"♻️ Requeued {recovered} cover job(s) of departed nodes")
+
+    async def digest() -> None:
+        nodes = await asyncio.to_thread(get_live_nodes, cluster.CLUSTER_LEASE_TTL)
+        baseline = await asyncio.to_thread(get_cluster_state, "digest")
+        await asyncio.to_thread(save_cluster_state, "digest", {
+            "at": time.time(),
+            "nodes": [{"node": node["_id"], "counters": node.get("counters", {})} for node in nodes],
+        })
+        if not baseline or not current_profile().log_channel_id:
+            return
+
+        previous = {entry["node"]: entry["counters"] for entry in baseline["nodes"]}
+        totals = {}
+        for node in nodes:
+            before = previous.get(node["_id"], {})
+            for name, value in node.get("counters", {}).items():
+                delta = value - before.get(name, 0)
+                # A restarted node counts from zero again
+                totals[name] = totals.get(name, 0) + (delta if delta >= 0 else value)
+        minutes = (time.time() - baseline["at"]) / 60
+        log_text = (
+            f"🗞 <b>Cluster Digest</b>\n\n"
+            f"⏱ Period: {minutes:.0f} min\n"
+            f"🖥 Nodes: {len(nodes)} (leader: {cluster_node.node_id})\n"
+            f"👤 New users: {totals.get('new_users', 0)}\n"
+            f"🎬 Covers: {totals.get('covers', 0)}\n"
+            f"📺 Channel posts: {totals.get('channel_posts', 0)}\n"
+            f"💀 Dead jobs: {totals.get('dead_jobs', 0)}"
+        )
+        await deliver_log(bot, log_text)
+
+    cluster_node.duty("broadcasts", cluster.CLUSTER_BROADCAST_POLL, broadcasts)
+    cluster_node.duty("stats", cluster.CLUSTER_STATS_INTERVAL, refresh_stats)
+    cluster_node.duty("reconcile", cluster.CLUSTER_RECONCILE_INTERVAL, reconcile)
+    cluster_node.duty("digest", cluster.CLUSTER_DIGEST_INTERVAL, digest)
+    return node_counters
+
+
+def build_application(profile, polling: bool = True) -> Application:
+    """
+    Build one bot's Application; `profile` becomes current for the calling task.
+    With `polling=False` updates are fed in by a receiver process (sharded mode).
+    """
+    activate(profile)
+    app = (
+        transport.configure(botapi.configure(Application.builder()))
+        .token(profile.token)
+        .rate_limiter(rate_limiter.current())
+        .concurrent_updates(update_processor.current())
+        .build()
+    )
+    logger.info(f"🌐 Bot API endpoint: {botapi.describe()} ({profile.name})")
 
     # Global error handler
     async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -1626,12 +2430,21 @@ def main() -> None:
             BotCommand("about", "🤖 About bot"),
             BotCommand("settings", "⚙️ Bot settings"),
             BotCommand("remove", "🗑️ Remove thumbnail"),
+            BotCommand("autocover", "🎞 Cover from video frame"),
+            BotCommand("overlay", "🏷 Text overlay on cover"),
+            BotCommand("bulk", "📦 Bulk mode for many videos"),
+            BotCommand("done", "✅ Finish bulk mode"),
+            BotCommand("channel", "📢 Auto-cover a channel"),
             BotCommand("admin", "🛡️ Admin panel"),
             BotCommand("ban", "🚫 Ban user"),
             BotCommand("unban", "✅ Unban user"),
             BotCommand("stats", "📊 Bot statistics"),
             BotCommand("status", "⏱️ Bot status"),
             BotCommand("broadcast", "📢 Broadcast message"),
+            BotCommand("queue", "📦 Cover queue status"),
+            BotCommand("deadjobs", "💀 Failed cover jobs"),
+            BotCommand("replay", "🔁 Replay failed jobs"),
+            BotCommand("traces", "🔍 Slowest recent traces"),
         ]
         
         try:
@@ -1640,8 +2453,72 @@ def main() -> None:
         except Exception as e:
             logger.error(f"❌ Error setting bot commands: {e}")
     
-    # Register post_init callback to setup commands
-    app.post_init = setup_commands
+    # This bot's instances, bound now: drain steps may run from another bot's /restart
+    jobs = cover_queue.current()
+    dedup = deduplicator.current()
+    processor = update_processor.current()
+    counters = register_cluster_duties(app, jobs) if CLUSTER_MODE else None
+
+    async def post_init(app: Application) -> None:
+        """Configure commands and start background workers"""
+        await setup_commands(app)
+        await asyncio.to_thread(migrate_thumbnail_refs)
+        await dedup.load()
+        await catch_up.start(app.bot)
+        await jobs.start(app.bot)
+        if CLUSTER_MODE:
+            await cluster_node.start(counters)
+        await metrics_server.start()
+        await tracing.tracer.start()
+
+    async def post_shutdown(app: Application) -> None:
+        """Stop background workers; pending jobs stay persisted"""
+        if CLUSTER_MODE:
+            await cluster_node.stop()
+        await metrics_server.stop()
+        await tracing.tracer.stop()
+        await jobs.stop()
+        await dedup.stop()
+        shutdown_pool()
+
+    # Register lifecycle callbacks
+    app.post_init = post_init
+    app.post_shutdown = post_shutdown
+
+    # Graceful drain steps run by /restart before re-exec (in this order)
+    async def drain_updates(timeout: float) -> bool:
+        # The /restart handler itself is still in flight (on one of the bots)
+        return await processor.wait_idle(app.update_queue, timeout, allowed=1)
+
+    async def flush_dedup(timeout: float) -> bool:
+        await dedup.stop()
+        return True
+
+    async def confirm_offset(timeout: float) -> bool:
+        # Acknowledge everything handled so the next process doesn't re-fetch it
+        if dedup.last_update_id:
+            await app.bot.get_updates(offset=dedup.last_update_id + 1, timeout=0, limit=1)
+        return True
+
+    prefix = f"{profile.name}: " if len(PROFILES) > 1 else ""
+    coordinator.add_application(app)
+    coordinator.register(prefix + "updates", drain_updates)
+    coordinator.register(prefix + "bulk sessions", bulk_sessions.current().drain)
+    coordinator.register(prefix + "cover jobs", jobs.drain)
+    coordinator.register(prefix + "channel posts", channel_queue.current().drain)
+    coordinator.register(prefix + "background sends", drain_background_tasks)
+    if CLUSTER_MODE:
+        # Hand the leader lease over instead of letting it expire
+        coordinator.register(prefix + "cluster lease", cluster_node.drain)
+    coordinator.register(prefix + "dedup flush", flush_dedup)
+    if polling:
+        coordinator.register(prefix + "polling offset", confirm_offset)
+
+    # Per-user flood control runs in the update processor, before an update
+    # waits for its user's turn or a processing slot
+    processor.admission = flood_gate(flood_exempt)
+    # Dedup / stale-update guard runs before every other handler
+    app.add_handler(TypeHandler(Update, guard_update), group=-100)
 
     # Command handlers (MUST be registered FIRST before text handler)
     app.add_handler(CommandHandler("start", start, filters=filters.ChatType.PRIVATE))
@@ -1649,6 +2526,11 @@ def main() -> None:
     app.add_handler(CommandHandler("about", about, filters=filters.ChatType.PRIVATE))
     app.add_handler(CommandHandler("settings", settings, filters=filters.ChatType.PRIVATE))
     app.add_handler(CommandHandler("remove", remover, filters=filters.ChatType.PRIVATE))
+    app.add_handler(CommandHandler("autocover", autocover_cmd, filters=filters.ChatType.PRIVATE))
+    app.add_handler(CommandHandler("overlay", overlay_cmd, filters=filters.ChatType.PRIVATE))
+    app.add_handler(CommandHandler("bulk", bulk_cmd, filters=filters.ChatType.PRIVATE))
+    app.add_handler(CommandHandler("done", done_cmd, filters=filters.ChatType.PRIVATE))
+    app.add_handler(CommandHandler("channel", channel_cmd, filters=filters.ChatType.PRIVATE))
     app.add_handler(CommandHandler("restart", restart, filters=filters.ChatType.PRIVATE))
     
     # Admin commands
@@ -1658,26 +2540,117 @@ def main() -> None:
     app.add_handler(CommandHandler("stats", stats_cmd, filters=filters.ChatType.PRIVATE))
     app.add_handler(CommandHandler("status", status_cmd, filters=filters.ChatType.PRIVATE))
     app.add_handler(CommandHandler("broadcast", broadcast_cmd, filters=filters.ChatType.PRIVATE))
+    app.add_handler(CommandHandler("queue", queue_cmd, filters=filters.ChatType.PRIVATE))
+    app.add_handler(CommandHandler("deadjobs", deadjobs_cmd, filters=filters.ChatType.PRIVATE))
+    app.add_handler(CommandHandler("replay", replay_cmd, filters=filters.ChatType.PRIVATE))
+    app.add_handler(CommandHandler("traces", traces_cmd, filters=filters.ChatType.PRIVATE))
 
     # Photo and video handlers (private chats only via filters)
     app.add_handler(MessageHandler(filters.PHOTO & filters.ChatType.PRIVATE, photo_handler))
-    app.add_handler(MessageHandler(filters.VIDEO & filters.ChatType.PRIVATE, video_handler))
+    app.add_handler(MessageHandler(
+        (filters.VIDEO | filters.ANIMATION | filters.Document.VIDEO) & filters.ChatType.PRIVATE,
+        video_handler
+    ))
     
     # Text handler for dump channel ID capture (MUST be LAST - only non-command text)
     # Add filter to exclude commands (messages starting with /)
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND & filters.ChatType.PRIVATE, text_handler))
     
+    # Inline mode: share recently covered videos in any chat
+    app.add_handler(InlineQueryHandler(inline_query_handler))
+
+    # Videos posted in linked channels
+    app.add_handler(MessageHandler(
+        filters.UpdateType.CHANNEL_POST & (filters.VIDEO | filters.ANIMATION | filters.Document.VIDEO),
+        channel_post_handler
+    ))
+
     # Register callback handler (handles all callbacks)
-    app.add_handler(CallbackQueryHandler(callback_handler))
+    app.add_handler(CallbackQueryHandler(callbacks.dispatch))
+
+    # Time every handler as handler.<callback> (guards stopping an update is not an error)
+    for handlers in app.handlers.values():
+        for handler in handlers:
+            name = getattr(handler.callback, "__name__", type(handler).__name__)
+            handler.callback = metrics.instrument(f"handler.{name}", handler.callback, ignore=(ApplicationHandlerStop,))
+
+    # Levels read by the metrics endpoint on every scrape
+    gauge_prefix = f"{profile.name}." if len(PROFILES) > 1 else ""
+    flood = flood_control.current()
+    metrics.gauge(gauge_prefix + "updates.queued", app.update_queue.qsize)
+    metrics.gauge(gauge_prefix + "updates.waiting", processor.backlog)
+    metrics.gauge(gauge_prefix + "updates.in_flight", lambda: processor.in_flight)
+    metrics.gauge(gauge_prefix + "cover_jobs.in_flight", lambda: jobs.in_flight)
+    metrics.gauge(gauge_prefix + "flood.overloaded", lambda: flood.overloaded)
+    for pool_name, pool in transport.pools.current().items():
+        metrics.gauge(f"{gauge_prefix}http.{pool_name}.in_use", lambda pool=pool: pool.in_use)
+    metrics.gauge("background_tasks", pending_background_tasks)
 
     logger.info("✅ All handlers registered")
+    return app
+
+
+async def run_profile(profile, stop: asyncio.Event) -> None:
+    """Run one bot until `stop` is set (multi-token mode)"""
+    app = build_application(profile)
+    async with app:
+        await app.post_init(app)
+        await app.updater.start_polling(allowed_updates=ALLOWED_UPDATES, drop_pending_updates=DROP_PENDING_UPDATES)
+        await app.start()
+        logger.info(f"Bot {profile.name} started (polling)")
+        await stop.wait()
+        if app.updater.running:
+            await app.updater.stop()
+        await app.stop()
+    await app.post_shutdown(app)
+
+
+async def run_profiles() -> None:
+    """Run every profile in this process: one event loop, one MongoClient, one image pool"""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    # gather() runs each bot in its own task, so each keeps its own current profile
+    await asyncio.gather(*(run_profile(profile, stop) for profile in PROFILES))
+
+
+def main() -> None:
+    if len(PROFILES) > 1:
+        if SHARD_WORKERS > 1 or CLUSTER_MODE:
+            logger.error("❌ SHARD_WORKERS and CLUSTER_MODE are only supported with a single bot profile - ignoring")
+        asyncio.run(run_profiles())
+        return
+
+    if CLUSTER_MODE:
+        if not cluster.WEBHOOK_URL:
+            logger.error("❌ CLUSTER_MODE needs WEBHOOK_URL (polling from several nodes conflicts)")
+            sys.exit(1)
+        app = build_application(PROFILES[0], polling=False)
+        logger.info(f"Bot starting (cluster node {cluster_node.node_id}, webhook on :{cluster.WEBHOOK_PORT})")
+        # Every node sets the same webhook; pending updates are never dropped, another node may own them
+        app.run_webhook(
+            listen=cluster.WEBHOOK_LISTEN,
+            port=cluster.WEBHOOK_PORT,
+            url_path=cluster.WEBHOOK_PATH,
+            webhook_url=cluster.webhook_url(),
+            secret_token=cluster.WEBHOOK_SECRET,
+            allowed_updates=ALLOWED_UPDATES,
+            close_loop=False,
+        )
+        return
+
+    if SHARD_WORKERS > 1:
+        logger.info(f"Bot starting (receiver + {SHARD_WORKERS} shard workers)")
+        run_sharded(build_application, PROFILES[0], SHARD_WORKERS, ALLOWED_UPDATES, drop_pending=DROP_PENDING_UPDATES)
+        return
+
+    app = build_application(PROFILES[0])
     logger.info("Bot starting (polling)")
     app.run_polling(
-        allowed_updates=[
-            "message",
-            "callback_query",
-        ],
+        allowed_updates=ALLOWED_UPDATES,
         close_loop=False,
+        drop_pending_updates=DROP_PENDING_UPDATES,
     )
 
 
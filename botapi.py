@@ -0,0 +1,77 @@
+"""
+Bot API Endpoint Configuration for Video Cover Bot
+Points the bot at api.telegram.org or a self-hosted Bot API server. In local
+mode files are read straight from the server's disk instead of downloaded.
+"""
+
+import os
+import sys
+import asyncio
+import logging
+
+from config import config
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# e.g. http://localhost:8081/bot and http://localhost:8081/file/bot (token is appended)
+BOT_API_BASE_URL = os.environ.get("BOT_API_BASE_URL", "").strip()
+BOT_API_BASE_FILE_URL = os.environ.get("BOT_API_BASE_FILE_URL", "").strip()
+# The server runs with --local and shares its --dir with this process
+BOT_API_LOCAL_MODE = os.environ.get("BOT_API_LOCAL_MODE", "false").lower() in ("1", "true", "yes")
+# Where the server's --dir is mounted here, if the path differs (e.g. separate containers)
+BOT_API_SERVER_DIR = os.environ.get("BOT_API_SERVER_DIR", "").rstrip("/")
+BOT_API_LOCAL_DIR = os.environ.get("BOT_API_LOCAL_DIR", "").rstrip("/")
+
+# The cloud Bot API caps downloads at 20MB; a local server removes the limit (up to 2000MB)
+DOWNLOAD_LIMIT_MB = 2000 if BOT_API_LOCAL_MODE else 20
+
+
+def configure(builder):
+    """Apply the configured endpoint to an ApplicationBuilder"""
+    if BOT_API_BASE_URL:
+        builder = builder.base_url(BOT_API_BASE_URL)
+    if BOT_API_BASE_FILE_URL:
+        builder = builder.base_file_url(BOT_API_BASE_FILE_URL)
+    if BOT_API_LOCAL_MODE:
+        builder = builder.local_mode(True)
+    return builder
+
+
+def describe() -> str:
+    return f"{BOT_API_BASE_URL or 'api.telegram.org'}{' (local mode)' if BOT_API_LOCAL_MODE else ''}"
+
+
+def local_path(tg_file) -> str | None:
+    """Path of a file on the local server's disk, or None if it has to be downloaded"""
+    if not BOT_API_LOCAL_MODE or not tg_file.file_path:
+        return None
+    path = tg_file.file_path
+    if BOT_API_SERVER_DIR and BOT_API_LOCAL_DIR and path.startswith(BOT_API_SERVER_DIR + "/"):
+        path = BOT_API_LOCAL_DIR + path[len(BOT_API_SERVER_DIR):]
+    return path if os.path.isfile(path) else None
+
+
+async def check_endpoint(token: str) -> bool:
+    """Call getMe on the configured endpoint to confirm it speaks the Bot API"""
+    from telegram.ext import ApplicationBuilder
+
+    app = configure(ApplicationBuilder().token(token)).build()
+    try:
+        async with app:
+            me = await app.bot.get_me()
+        logger.info(f"✅ {describe()} answered getMe as @{me.username}")
+        return True
+    except Exception as e:
+        logger.error(f"❌ {describe()} is not usable: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    # python botapi.py --check  (uses BOT_TOKEN and the BOT_API_* settings)
+    if "--check" in sys.argv:
+        logging.basicConfig(level=logging.INFO, format="%(message)s")
+        token = getattr(config, "BOT_TOKEN", None) or os.environ.get("BOT_TOKEN")
+        if not token:
+            sys.exit("BOT_TOKEN is not set")
+        sys.exit(0 if asyncio.run(check_endpoint(token)) else 1)
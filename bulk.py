@@ -0,0 +1,211 @@
+"""
+Bulk Mode for Video Cover Bot
+Collects forwarded videos into a per-user session and processes them with
+bounded concurrency, reporting through one live-updating progress message.
+Videos are sent in one call each (no placeholder) and logged in batches.
+"""
+
+import os
+import time
+import asyncio
+import logging
+
+import metrics
+from profiles import ProfileLocal
+from scheduler import COVER, spawn
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Videos processed at once per session (the rate limiter still applies)
+BULK_CONCURRENCY = int(os.environ.get("BULK_CONCURRENCY", "8"))
+# Seconds between progress message edits
+BULK_PROGRESS_INTERVAL = float(os.environ.get("BULK_PROGRESS_INTERVAL", "3"))
+# Sessions with no new videos for this many seconds are closed automatically
+BULK_IDLE_TIMEOUT = float(os.environ.get("BULK_IDLE_TIMEOUT", "900"))
+BULK_MAX_VIDEOS = int(os.environ.get("BULK_MAX_VIDEOS", "1000"))
+
+
+class BulkSession:
+    """
+    One user's bulk run. `process` is `async def process(bot, payload)`; `template`
+    holds the payload fields shared by every video (cover, overlay, ...). Whatever
+    `process` returns is collected and handed to `log_batch(bot, session, entries)`
+    once the session finishes, instead of logging every video on its own.
+    """
+
+    def __init__(self, bot, user_id: int, chat_id: int, template: dict, process, on_close=None,
+                 log_batch=None, concurrency: int = BULK_CONCURRENCY):
+        self.bot = bot
+        self.user_id = user_id
+        self.chat_id = chat_id
+        self.template = template
+        self.process = process
+        self.on_close = on_close
+        self.log_batch = log_batch
+        self.log_entries = []
+        self.concurrency = max(1, concurrency)
+        self.queue = asyncio.Queue()
+        self.total = 0
+        self.done = 0
+        self.failed = 0
+        self.skipped = 0
+        self.errors = []
+        self.started = time.monotonic()
+        self.last_activity = self.started
+        self.closed = False
+        self.progress_message_id = None
+        self._last_text = None
+        self._workers = []
+        self._reporter = None
+        self._finishing = None
+
+    def skip(self) -> None:
+        """Count a video rejected before queueing (unsupported or too large)"""
+        self.skipped += 1
+        self.last_activity = time.monotonic()
+
+    def start(self, progress_message_id: int) -> None:
+        self.progress_message_id = progress_message_id
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        self._reporter = asyncio.create_task(self._report_loop())
+
+    def add(self, payload: dict) -> bool:
+        """Queue a video; returns False when the session is closed or full"""
+        if self.closed or self.total >= BULK_MAX_VIDEOS:
+            return False
+        self.queue.put_nowait({**self.template, **payload})
+        self.total += 1
+        self.last_activity = time.monotonic()
+        return True
+
+    @property
+    def pending(self) -> int:
+        return self.total - self.done - self.failed
+
+    async def _worker(self) -> None:
+        while True:
+            payload = await self.queue.get()
+            started = time.monotonic()
+            try:
+                entry = await self.process(self.bot, payload)
+                if entry is not None:
+                    self.log_entries.append(entry)
+                self.done += 1
+                metrics.observe("bulk.video", time.monotonic() - started)
+            except Exception as e:
+                self.failed += 1
+                self.errors.append(str(e)[:80])
+                logger.warning(f"⚠️ Bulk video failed for user {self.user_id}: {e}")
+            finally:
+                self.last_activity = time.monotonic()
+                self.queue.task_done()
+
+    def progress_text(self, final: bool = False) -> str:
+        elapsed = max(time.monotonic() - self.started, 0.001)
+        rate = (self.done + self.failed) / elapsed * 60
+        header = "✅ ʙᴜʟᴋ ꜰɪɴɪsʜᴇᴅ" if final else "📦 ʙᴜʟᴋ ᴍᴏᴅᴇ"
+        text = (
+            f"{header}\n\n"
+            f"📥 ʀᴇᴄᴇɪᴠᴇᴅ: {self.total}\n"
+            f"✅ ᴅᴏɴᴇ: {self.done}\n"
+            f"❌ ꜰᴀɪʟᴇᴅ: {self.failed}\n"
+            f"⏭ sᴋɪᴘᴘᴇᴅ: {self.skipped}\n"
+            f"⏳ ᴘᴇɴᴅɪɴɢ: {self.pending}\n"
+            f"⚡ {rate:.0f} ᴠɪᴅᴇᴏs/ᴍɪɴ | ⏱ {elapsed:.0f}s"
+        )
+        if final and self.errors:
+            text += "\n\nʟᴀsᴛ ᴇʀʀᴏʀ: " + self.errors[-1][:50]
+        if not final:
+            text += "\n\nꜰᴏʀᴡᴀʀᴅ ᴠɪᴅᴇᴏs, ᴛʜᴇɴ /done"
+        return text
+
+    async def _edit_progress(self, final: bool = False) -> None:
+        text = self.progress_text(final)
+        if text == self._last_text or not self.progress_message_id:
+            return
+        try:
+            await self.bot.edit_message_text(
+                chat_id=self.chat_id,
+                message_id=self.progress_message_id,
+                text=text,
+                parse_mode="HTML",
+                **COVER
+            )
+            self._last_text = text
+        except Exception as e:
+            logger.debug(f"Bulk progress edit failed: {e}")
+
+    async def _report_loop(self) -> None:
+        while True:
+            await asyncio.sleep(BULK_PROGRESS_INTERVAL)
+            await self._edit_progress()
+            idle = time.monotonic() - self.last_activity
+            if not self.pending and idle > BULK_IDLE_TIMEOUT:
+                logger.info(f"⌛ Bulk session of user {self.user_id} idle - closing")
+                spawn(self.finish())
+                return
+
+    async def finish(self) -> str:
+        """
+        Stop accepting videos, wait for queued ones and post the final summary.
+        Every way a session ends (/done, idle timeout, restart drain) goes through here.
+        """
+        if self._finishing is None:
+            self._finishing = asyncio.create_task(self._finish())
+        return await asyncio.shield(self._finishing)
+
+    async def _finish(self) -> str:
+        self.closed = True
+        await self.queue.join()
+        for task in self._workers + [self._reporter]:
+            if task and task is not asyncio.current_task():
+                task.cancel()
+        await self._edit_progress(final=True)
+        if self.on_close:
+            self.on_close(self)
+        summary = self.progress_text(final=True)
+        try:
+            await self.bot.send_message(chat_id=self.chat_id, text=summary, parse_mode="HTML", **COVER)
+        except Exception as e:
+            logger.warning(f"⚠️ Bulk summary for user {self.user_id} not sent: {e}")
+        if self.log_batch and self.log_entries:
+            spawn(self.log_batch(self.bot, self, self.log_entries))
+        logger.info(f"✅ Bulk session of user {self.user_id}: {self.done} done, {self.failed} failed")
+        return summary
+
+
+class BulkManager:
+    """Active bulk sessions by user id"""
+
+    def __init__(self):
+        self.sessions = {}
+
+    def get(self, user_id: int) -> BulkSession | None:
+        return self.sessions.get(user_id)
+
+    def open(self, bot, user_id: int, chat_id: int, template: dict, process, log_batch=None) -> BulkSession:
+        session = BulkSession(bot, user_id, chat_id, template, process, on_close=self._closed, log_batch=log_batch)
+        self.sessions[user_id] = session
+        return session
+
+    def _closed(self, session: BulkSession) -> None:
+        if self.sessions.get(session.user_id) is session:
+            del self.sessions[session.user_id]
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self.sessions),
+            "pending": sum(session.pending for session in self.sessions.values()),
+        }
+
+    async def drain(self, timeout: float) -> bool:
+        """Finish every session (shutdown drain step). Returns True if all finished in time"""
+        if not self.sessions:
+            return True
+        tasks = [asyncio.create_task(session.finish()) for session in list(self.sessions.values())]
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+        return not pending
+
+
+bulk_sessions = ProfileLocal(BulkManager)
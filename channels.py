@@ -0,0 +1,116 @@
+"""
+Channel Auto-Cover for Video Cover Bot
+Videos posted in linked channels are covered in posting order through a
+per-channel queue, paced to Telegram's per-chat posting limits.
+"""
+
+import os
+import time
+import asyncio
+import logging
+
+import database
+import metrics
+from scheduler import TokenBucket
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Telegram allows roughly 20 messages per minute in one group/channel
+CHANNEL_POSTS_PER_MINUTE = float(os.environ.get("CHANNEL_POSTS_PER_MINUTE", "20"))
+CHANNEL_BURST = int(os.environ.get("CHANNEL_BURST", "3"))
+# Seconds a channel's settings are cached in memory
+CHANNEL_CONFIG_TTL = float(os.environ.get("CHANNEL_CONFIG_TTL", "60"))
+# A channel's worker exits after this many idle seconds
+CHANNEL_WORKER_IDLE = float(os.environ.get("CHANNEL_WORKER_IDLE", "300"))
+
+
+class ChannelConfigCache:
+    """Short-lived cache of channel settings so busy channels don't hit MongoDB per post"""
+
+    def __init__(self, ttl: float = CHANNEL_CONFIG_TTL):
+        self.ttl = ttl
+        self._entries = {}
+
+    async def get(self, chat_id: int) -> dict | None:
+        entry = self._entries.get(chat_id)
+        if entry and time.monotonic() - entry[0] < self.ttl:
+            metrics.incr("cache.channel_config.hit")
+            return entry[1]
+        metrics.incr("cache.channel_config.miss")
+        config = await asyncio.to_thread(database.get_channel, chat_id)
+        self._entries[chat_id] = (time.monotonic(), config)
+        return config
+
+    def invalidate(self, chat_id: int) -> None:
+        self._entries.pop(chat_id, None)
+
+
+class ChannelQueue:
+    """
+    One FIFO and one worker per channel: posts are processed strictly in order,
+    each channel paced by its own token bucket. `process` is `async def process(bot, job)`.
+    """
+
+    def __init__(self, process, per_minute: float = CHANNEL_POSTS_PER_MINUTE, burst: int = CHANNEL_BURST):
+        self.process = process
+        self.rate = per_minute / 60
+        self.burst = max(1, burst)
+        self._queues = {}
+        self._workers = {}
+        self._buckets = {}
+        self.processed = 0
+        self.failed = 0
+
+    def submit(self, bot, chat_id: int, job: dict) -> None:
+        queue = self._queues.setdefault(chat_id, asyncio.Queue())
+        queue.put_nowait(job)
+        worker = self._workers.get(chat_id)
+        if worker is None or worker.done():
+            self._workers[chat_id] = asyncio.create_task(self._worker(bot, chat_id, queue))
+
+    async def _wait_turn(self, chat_id: int) -> None:
+        bucket = self._buckets.setdefault(chat_id, TokenBucket(self.rate, capacity=self.burst))
+        while not bucket.available():
+            await asyncio.sleep(max(0.05, (1 - bucket.tokens) / bucket.rate))
+        bucket.take()
+
+    async def _worker(self, bot, chat_id: int, queue: asyncio.Queue) -> None:
+        while True:
+            try:
+                job = await asyncio.wait_for(queue.get(), timeout=CHANNEL_WORKER_IDLE)
+            except asyncio.TimeoutError:
+                if queue.empty():
+                    self._queues.pop(chat_id, None)
+                    self._workers.pop(chat_id, None)
+                    return
+                continue
+            try:
+                await self._wait_turn(chat_id)
+                await self.process(bot, job)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"❌ Channel post {chat_id}/{job.get('message_id')} failed: {e}")
+            finally:
+                queue.task_done()
+
+    def stats(self) -> dict:
+        return {
+            "channels": len(self._queues),
+            "pending": sum(queue.qsize() for queue in self._queues.values()),
+            "processed": self.processed,
+            "failed": self.failed,
+        }
+
+    async def drain(self, timeout: float) -> bool:
+        """Wait for queued channel posts (shutdown drain step). Returns True if all were handled"""
+        queues = [queue for queue in self._queues.values() if queue.unfinished_tasks]
+        if not queues:
+            return True
+        try:
+            await asyncio.wait_for(asyncio.gather(*(queue.join() for queue in queues)), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ {self.stats()['pending']} channel post(s) still queued after {timeout:.0f}s")
+            return False
@@ -0,0 +1,260 @@
+"""
+Cluster Mode for Video Cover Bot
+Several nodes serve one bot behind a load balancer: every node receives
+webhook updates and shares state through MongoDB, while singleton duties
+(broadcasts, reconciliation, stats, log digests) run only on the node
+holding the leader lease.
+
+    python cluster.py --simulate [nodes] [seconds]   (needs MONGODB_URI)
+"""
+
+import os
+import sys
+import time
+import socket
+import asyncio
+import logging
+
+import database
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+CLUSTER_MODE = os.environ.get("CLUSTER_MODE", "false").lower() in ("1", "true", "yes")
+# Unique per node; hostname-pid survives /restart (re-exec keeps the pid)
+NODE_ID = os.environ.get("CLUSTER_NODE_ID") or f"{socket.gethostname()}-{os.getpid()}"
+# A leader that stops renewing is replaced after this many seconds
+CLUSTER_LEASE_TTL = float(os.environ.get("CLUSTER_LEASE_TTL", "30"))
+CLUSTER_RENEW_INTERVAL = float(os.environ.get("CLUSTER_RENEW_INTERVAL", "10"))
+# Singleton duty intervals (seconds)
+CLUSTER_BROADCAST_POLL = float(os.environ.get("CLUSTER_BROADCAST_POLL", "5"))
+CLUSTER_STATS_INTERVAL = float(os.environ.get("CLUSTER_STATS_INTERVAL", "60"))
+CLUSTER_RECONCILE_INTERVAL = float(os.environ.get("CLUSTER_RECONCILE_INTERVAL", "3600"))
+CLUSTER_DIGEST_INTERVAL = float(os.environ.get("CLUSTER_DIGEST_INTERVAL", "3600"))
+
+# Webhook ingress (every node listens; the load balancer terminates TLS)
+WEBHOOK_URL = os.environ.get("WEBHOOK_URL", "").rstrip("/")
+WEBHOOK_LISTEN = os.environ.get("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.environ.get("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.environ.get("WEBHOOK_PATH", "telegram").strip("/")
+WEBHOOK_SECRET = os.environ.get("WEBHOOK_SECRET") or None
+
+LEADER_LEASE = "leader"
+
+
+class ClusterNode:
+    """
+    Heartbeats this node and competes for the leader lease. Registered duties
+    (`async def duty()`) run on the leader only, each at its own interval; they
+    are cancelled as soon as leadership is lost.
+    """
+
+    def __init__(self, node_id: str = NODE_ID, lease_ttl: float = CLUSTER_LEASE_TTL,
+                 renew_interval: float = CLUSTER_RENEW_INTERVAL):
+        self.node_id = node_id
+        self.lease_ttl = lease_ttl
+        self.renew_interval = min(renew_interval, lease_ttl / 3)
+        self.is_leader = False
+        self.leader_since = None
+        self.counters = None
+        self._duties = {}
+        self._running = {}
+        self._task = None
+
+    def duty(self, name: str, interval: float, func) -> None:
+        """Register a singleton duty"""
+        self._duties[name] = {"interval": interval, "func": func, "runs": 0, "failures": 0}
+
+    async def start(self, counters=None) -> None:
+        """`counters()` returns this node's cumulative counters, published with every heartbeat"""
+        self.counters = counters
+        await self._tick()
+        self._task = asyncio.create_task(self._loop())
+        logger.info(f"🛰 Cluster node {self.node_id} started ({'leader' if self.is_leader else 'follower'})")
+
+    async def stop(self) -> None:
+        """Leave the cluster: cancel duties and hand the lease over immediately"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self._stop_duties()
+        if self.is_leader:
+            await asyncio.to_thread(database.release_lease, LEADER_LEASE, self.node_id)
+            self.is_leader = False
+        await asyncio.to_thread(database.remove_node, self.node_id)
+        logger.info(f"👋 Cluster node {self.node_id} left")
+
+    async def drain(self, timeout: float) -> bool:
+        """Shutdown drain step"""
+        await self.stop()
+        return True
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.renew_interval)
+            try:
+                await self._tick()
+            except Exception as e:
+                logger.error(f"❌ Cluster tick failed: {e}")
+                # Duties no longer wait for the tick, so a leader that cannot renew its lease stops them
+                if self.is_leader:
+                    self.is_leader = False
+                    await self._stop_duties()
+
+    async def _tick(self) -> None:
+        counters = self.counters() if self.counters else {}
+        await asyncio.to_thread(database.heartbeat_node, self.node_id, counters)
+        leader = await asyncio.to_thread(database.acquire_lease, LEADER_LEASE, self.node_id, self.lease_ttl)
+        if leader and not self.is_leader:
+            self.leader_since = time.time()
+            logger.info(f"👑 Node {self.node_id} is now the cluster leader")
+        elif self.is_leader and not leader:
+            logger.warning(f"⚠️ Node {self.node_id} lost the leader lease - stopping singleton duties")
+            await self._stop_duties()
+        self.is_leader = leader
+        if leader:
+            self._start_duties()
+
+    def _start_duties(self) -> None:
+        """Each duty runs in its own task on its own interval, independent of the lease renewals"""
+        for name, duty in self._duties.items():
+            task = self._running.get(name)
+            if task is None or task.done():
+                self._running[name] = asyncio.create_task(self._duty_loop(name, duty))
+
+    async def _duty_loop(self, name: str, duty: dict) -> None:
+        while True:
+            try:
+                await duty["func"]()
+                duty["runs"] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                duty["failures"] += 1
+                logger.error(f"❌ Cluster duty '{name}' failed: {e}")
+            await asyncio.sleep(duty["interval"])
+
+    async def _stop_duties(self) -> None:
+        tasks = [task for task in self._running.values() if not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._running = {}
+
+    async def status(self) -> dict:
+        lease = await asyncio.to_thread(database.get_lease, LEADER_LEASE)
+        nodes = await asyncio.to_thread(database.get_live_nodes, self.lease_ttl)
+        return {
+            "node": self.node_id,
+            "leader": lease["holder"] if lease else None,
+            "nodes": [node["_id"] for node in nodes],
+            "duties": {name: (duty["runs"], duty["failures"]) for name, duty in self._duties.items()},
+        }
+
+
+class VerifiedSet:
+    """Users who passed the force-sub check, kept in this process"""
+
+    def __init__(self):
+        self._local = set()
+
+    async def has(self, user_id) -> bool:
+        return user_id in self._local
+
+    async def add(self, user_id) -> None:
+        self._local.add(user_id)
+
+    async def discard(self, user_id) -> None:
+        self._local.discard(user_id)
+
+    def __iter__(self):
+        return iter(self._local)
+
+    def __len__(self) -> int:
+        return len(self._local)
+
+
+class SharedVerifiedSet(VerifiedSet):
+    """
+    Force-sub verifications shared through MongoDB, so a user verified on one
+    node is not asked again on another. The local set answers repeat lookups;
+    database calls run in a thread so they never block the event loop.
+    """
+
+    async def has(self, user_id) -> bool:
+        if user_id in self._local:
+            return True
+        if await asyncio.to_thread(database.is_user_verified, user_id):
+            self._local.add(user_id)
+            return True
+        return False
+
+    async def add(self, user_id) -> None:
+        self._local.add(user_id)
+        await asyncio.to_thread(database.mark_user_verified, user_id)
+
+    async def discard(self, user_id) -> None:
+        self._local.discard(user_id)
+        await asyncio.to_thread(database.unmark_user_verified, user_id)
+
+
+def webhook_url() -> str:
+    return f"{WEBHOOK_URL}/{WEBHOOK_PATH}"
+
+
+cluster_node = ClusterNode()
+
+
+"""═══════════════════ LOCAL SIMULATION ═══════════════════"""
+
+
+def _simulated_node(index: int, seconds: float) -> None:
+    """One node process: heartbeat, lease and a dummy duty, logging every leadership change"""
+    logging.basicConfig(level=logging.INFO, format=f"%(asctime)s [node-{index}] %(message)s")
+    node = ClusterNode(node_id=f"sim-{index}-{os.getpid()}", lease_ttl=6, renew_interval=2)
+
+    async def tick() -> None:
+        logger.info(f"🔁 Singleton duty ran on {node.node_id}")
+
+    async def run() -> None:
+        node.duty("tick", 2, tick)
+        await node.start()
+        await asyncio.sleep(seconds)
+        await node.stop()
+
+    asyncio.run(run())
+
+
+def simulate(nodes: int = 3, seconds: float = 30) -> None:
+    """
+    Start `nodes` processes against MONGODB_URI and kill the leader halfway:
+    exactly one node runs the duty at a time and another takes over within the lease TTL.
+    """
+    import multiprocessing
+
+    if not database.DB_AVAILABLE:
+        sys.exit("MongoDB is not available (set MONGODB_URI)")
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=_simulated_node, args=(i, seconds)) for i in range(nodes)]
+    for process in processes:
+        process.start()
+    time.sleep(seconds / 2)
+    lease = database.get_lease(LEADER_LEASE)
+    if lease:
+        leader_pid = int(lease["holder"].rsplit("-", 1)[1])
+        print(f"--- killing leader {lease['holder']} ---", flush=True)
+        for process in processes:
+            if process.pid == leader_pid:
+                process.kill()
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    if "--simulate" in sys.argv:
+        args = [float(a) for a in sys.argv[sys.argv.index("--simulate") + 1:]]
+        simulate(
+            nodes=int(args[0]) if len(args) > 0 else 3,
+            seconds=args[1] if len(args) > 1 else 30,
+        )
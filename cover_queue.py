@@ -0,0 +1,349 @@
+"""
+Persistent Cover Job Queue for Video Cover Bot
+Jobs are stored in MongoDB (or a local JSON file when the database is down)
+and processed by a pool of async workers with retry and dead-lettering.
+"""
+
+import os
+import json
+import time
+import uuid
+import random
+import asyncio
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+
+from telegram.error import BadRequest, Forbidden, RetryAfter
+
+import cluster
+import database
+import tracing
+from profiles import PROFILES, current_profile
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+COVER_WORKERS = int(os.environ.get("COVER_WORKERS", "4"))
+COVER_JOB_MAX_ATTEMPTS = int(os.environ.get("COVER_JOB_MAX_ATTEMPTS", "5"))
+COVER_JOB_BACKOFF_BASE = float(os.environ.get("COVER_JOB_BACKOFF_BASE", "2"))
+COVER_JOB_BACKOFF_MAX = float(os.environ.get("COVER_JOB_BACKOFF_MAX", "300"))
+JOB_QUEUE_FILE = os.environ.get("JOB_QUEUE_FILE", "cover_jobs.json")
+
+# Polling interval used when no enqueue wake-up arrives
+POLL_INTERVAL = 1.0
+# Longest pause of a worker after repeated store errors (seconds)
+WORKER_ERROR_BACKOFF_MAX = 30.0
+
+
+class FileJobStore:
+    """JSON-file job store with the same interface as the database job functions"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.jobs = {}
+        # Store calls run in worker threads
+        self.lock = threading.RLock()
+        try:
+            if os.path.isfile(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    self.jobs = json.load(f)
+        except Exception as e:
+            logger.error(f"❌ Could not load job file {path}: {e}")
+            self.jobs = {}
+
+    def _flush(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.jobs, f, default=str)
+        os.replace(tmp_path, self.path)
+
+    def enqueue_job(self, job: dict) -> bool:
+        with self.lock:
+            self.jobs[job["_id"]] = dict(job)
+            self._flush()
+            return True
+
+    def claim_next_job(self, now: float, node: str = None) -> dict | None:
+        with self.lock:
+            due = [j for j in self.jobs.values() if j["status"] == "pending" and j["next_run_at"] <= now]
+            if not due:
+                return None
+            job = min(due, key=lambda j: j["next_run_at"])
+            job["status"] = "processing"
+            self._flush()
+            return dict(job)
+
+    def update_job(self, job_id: str, fields: dict) -> bool:
+        with self.lock:
+            if job_id not in self.jobs:
+                return False
+            self.jobs[job_id].update(fields, updated_at=datetime.now().isoformat())
+            self._flush()
+            return True
+
+    def delete_job(self, job_id: str) -> bool:
+        with self.lock:
+            if self.jobs.pop(job_id, None) is None:
+                return False
+            self._flush()
+            return True
+
+    def requeue_stale_jobs(self, node: str = None, live_nodes: list = None) -> int:
+        with self.lock:
+            stale = [j for j in self.jobs.values() if j["status"] == "processing"]
+            for job in stale:
+                job["status"] = "pending"
+            if stale:
+                self._flush()
+            return len(stale)
+
+    def get_dead_jobs(self, limit: int = 20) -> list:
+        with self.lock:
+            dead = [j for j in self.jobs.values() if j["status"] == "dead"]
+            dead.sort(key=lambda j: str(j.get("updated_at", "")), reverse=True)
+            return dead[:limit]
+
+    def replay_dead_jobs(self, job_id: str = None) -> int:
+        with self.lock:
+            replayed = 0
+            for job in self.jobs.values():
+                if job["status"] == "dead" and (job_id is None or job["_id"] == job_id):
+                    job.update(status="pending", attempts=0, next_run_at=0)
+                    replayed += 1
+            if replayed:
+                self._flush()
+            return replayed
+
+    def count_jobs_by_status(self) -> dict:
+        with self.lock:
+            counts = {}
+            for job in self.jobs.values():
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+            return counts
+
+
+def is_retryable(error: Exception) -> bool:
+    """Transient errors (timeouts, network, flood control) are retried; API rejections and invalid input are not"""
+    return not isinstance(error, (BadRequest, Forbidden, ValueError))
+
+
+def backoff_delay(attempts: int, error: Exception = None) -> float:
+    """Exponential backoff with full jitter; honours Telegram's retry_after"""
+    if isinstance(error, RetryAfter):
+        retry_after = error.retry_after
+        return float(getattr(retry_after, "total_seconds", lambda: retry_after)())
+    cap = min(COVER_JOB_BACKOFF_MAX, COVER_JOB_BACKOFF_BASE * (2 ** attempts))
+    return random.uniform(COVER_JOB_BACKOFF_BASE / 2, max(cap, COVER_JOB_BACKOFF_BASE / 2))
+
+
+def job_queue_file() -> str:
+    """Fallback job file of the current bot; bots after the first get their own file"""
+    profile = current_profile()
+    if not PROFILES or profile is PROFILES[0]:
+        return JOB_QUEUE_FILE
+    root, ext = os.path.splitext(JOB_QUEUE_FILE)
+    return f"{root}_{profile.name}{ext}"
+
+
+class CoverJobQueue:
+    """
+    Durable queue of cover jobs. `handler(bot, payload)` performs the work;
+    `on_dead(bot, job)` is called once when a job is dead-lettered.
+    """
+
+    def __init__(self, handler, on_dead=None, workers: int = COVER_WORKERS):
+        self.handler = handler
+        self.on_dead = on_dead
+        self.workers = max(1, workers)
+        self.store = database if database.DB_AVAILABLE else FileJobStore(job_queue_file())
+        # Cluster nodes share the MongoDB queue: claims are tagged so a restart only recovers its own
+        self.node = cluster.NODE_ID if cluster.CLUSTER_MODE else None
+        self.bot = None
+        self._tasks = []
+        self._wakeup = asyncio.Event()
+        self._running = False
+        self.in_flight = 0
+        self.processed = 0
+        self.retried = 0
+        self.dead = 0
+        self._completions = deque(maxlen=1000)
+        # Job outcomes the store could not record yet: job id -> fields (None = delete)
+        self._unsaved = {}
+
+    async def _call(self, func, *args):
+        """Run blocking store calls off the event loop"""
+        return await asyncio.to_thread(func, *args)
+
+    async def start(self, bot) -> None:
+        """Recover interrupted jobs and start the worker pool"""
+        self.bot = bot
+        self._running = True
+        recovered = await self._call(self.store.requeue_stale_jobs, self.node)
+        if recovered:
+            logger.info(f"♻️ Requeued {recovered} interrupted cover job(s)")
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        backend = "MongoDB" if self.store is database else self.store.path
+        logger.info(f"✅ Cover queue started with {self.workers} worker(s) on {backend}")
+
+    async def stop(self) -> None:
+        """Stop workers; jobs still pending stay persisted for the next run"""
+        self._running = False
+        self._wakeup.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def drain(self, timeout: float) -> bool:
+        """Stop claiming new jobs and let in-flight jobs finish. Pending jobs stay persisted"""
+        self._running = False
+        self._wakeup.set()
+        if not self._tasks:
+            return True
+        done, pending = await asyncio.wait(self._tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks = []
+        if pending:
+            logger.warning(f"⚠️ {len(pending)} cover worker(s) cancelled mid-job; jobs will be requeued")
+        try:
+            await self._flush_unsaved()
+        except Exception as e:
+            logger.warning(f"⚠️ {len(self._unsaved)} cover job outcome(s) not recorded; jobs will be requeued: {e}")
+        return not pending
+
+    async def enqueue(self, payload: dict) -> str | None:
+        """Persist a job and wake a worker. Returns the job id, or None if it could not be stored"""
+        job = {
+            "_id": uuid.uuid4().hex,
+            "status": "pending",
+            "attempts": 0,
+            "next_run_at": 0,
+            "created_at": datetime.now(),
+            "updated_at": datetime.now(),
+            "last_error": None,
+            "payload": payload,
+        }
+        if not await self._call(self.store.enqueue_job, job):
+            return None
+        self._wakeup.set()
+        return job["_id"]
+
+    async def _worker(self, index: int) -> None:
+        errors = 0
+        while self._running:
+            try:
+                await self._flush_unsaved()
+                job = await self._call(self.store.claim_next_job, time.time(), self.node)
+                if job is None:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=POLL_INTERVAL)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                await self._run_job(job)
+                errors = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # A store error (MongoDB down, job file unwritable) must not end the worker
+                errors += 1
+                delay = min(WORKER_ERROR_BACKOFF_MAX, POLL_INTERVAL * (2 ** errors))
+                logger.error(f"❌ Cover worker {index} store error, retrying in {delay:.0f}s: {e}")
+                await asyncio.sleep(delay)
+
+    async def _record(self, job_id: str, fields: dict | None) -> None:
+        """Store a job outcome (fields, or None to delete the finished job)"""
+        if fields is None:
+            await self._call(self.store.delete_job, job_id)
+        else:
+            await self._call(self.store.update_job, job_id, fields)
+
+    async def _save_outcome(self, job_id: str, fields: dict | None) -> None:
+        """Record a job outcome; if the store is down, keep it for the workers to write later.
+        A job left in processing state would otherwise wait for the next restart"""
+        try:
+            await self._record(job_id, fields)
+        except Exception as e:
+            logger.error(f"❌ Could not record outcome of cover job {job_id}, will retry: {e}")
+            self._unsaved[job_id] = fields
+
+    async def _flush_unsaved(self) -> None:
+        for job_id, fields in list(self._unsaved.items()):
+            await self._record(job_id, fields)
+            self._unsaved.pop(job_id, None)
+
+    async def _run_job(self, job: dict) -> None:
+        self.in_flight += 1
+        try:
+            # Continues the trace of the update that queued the job, if it was sampled
+            with tracing.resume_trace("cover_job", job["payload"].get("trace"), attempt=job.get("attempts", 0) + 1):
+                await self.handler(self.bot, job["payload"])
+        except asyncio.CancelledError:
+            # Leave the job in processing state; it is requeued on next start
+            raise
+        except Exception as e:
+            attempts = job.get("attempts", 0) + 1
+            if is_retryable(e) and attempts < COVER_JOB_MAX_ATTEMPTS:
+                delay = backoff_delay(attempts, e)
+                self.retried += 1
+                logger.warning(f"🔁 Cover job {job['_id']} failed (attempt {attempts}), retrying in {delay:.1f}s: {e}")
+                await self._save_outcome(job["_id"], {
+                    "status": "pending",
+                    "attempts": attempts,
+                    "next_run_at": time.time() + delay,
+                    "last_error": str(e)[:200],
+                    # The handler may have recorded progress (e.g. the placeholder it sent)
+                    "payload": job["payload"],
+                })
+            else:
+                self.dead += 1
+                logger.error(f"💀 Cover job {job['_id']} dead-lettered after {attempts} attempt(s): {e}")
+                await self._save_outcome(job["_id"], {
+                    "status": "dead",
+                    "attempts": attempts,
+                    "last_error": str(e)[:200],
+                })
+                if self.on_dead:
+                    try:
+                        await self.on_dead(self.bot, dict(job, last_error=str(e)))
+                    except Exception as notify_error:
+                        logger.error(f"❌ Dead-letter notification failed: {notify_error}")
+        else:
+            # A store error here must not count as a job failure: the video was already sent
+            await self._save_outcome(job["_id"], None)
+            self.processed += 1
+            self._completions.append(time.monotonic())
+        finally:
+            self.in_flight -= 1
+
+    async def dead_jobs(self, limit: int = 20) -> list:
+        return await self._call(self.store.get_dead_jobs, limit)
+
+    async def replay(self, job_id: str = None) -> int:
+        """Move dead-lettered jobs back to pending"""
+        replayed = await self._call(self.store.replay_dead_jobs, job_id)
+        if replayed:
+            self._wakeup.set()
+        return replayed
+
+    async def stats(self) -> dict:
+        """Queue depth by status plus throughput over the last minute"""
+        counts = await self._call(self.store.count_jobs_by_status)
+        now = time.monotonic()
+        last_minute = sum(1 for t in self._completions if now - t <= 60)
+        return {
+            "pending": counts.get("pending", 0),
+            "processing": counts.get("processing", 0),
+            "dead": counts.get("dead", 0),
+            "in_flight": self.in_flight,
+            "workers": self.workers,
+            "processed": self.processed,
+            "retried": self.retried,
+            "dead_lettered": self.dead,
+            "per_minute": last_minute,
+        }
@@ -4,54 +4,163 @@ Handles all database operations for user thumbnails
 """
 
 import os
+import re
+import inspect
 import logging
-from datetime import datetime
-from pymongo import MongoClient
+from datetime import datetime, timedelta, timezone
+from pymongo import MongoClient, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+import metrics
+from profiles import PROFILES, activate, current_profile
 
 # Setup logging
 logger = logging.getLogger(__name__)
 
 # MongoDB Connection Setup
 MONGODB_URI = os.environ.get("MONGODB_URI", "mongodb://localhost:27017")
-MONGODB_DATABASE = os.environ.get("MONGODB_DATABASE", "video_cover_bot")
+# Covered videos remembered per user for inline sharing
+RECENT_RESULTS_LIMIT = int(os.environ.get("RECENT_RESULTS_LIMIT", "50"))
+# How long processed update keys are remembered for deduplication
+DEDUP_TTL_SECONDS = int(os.environ.get("DEDUP_TTL_SECONDS", "86400"))
+# How long a force-sub verification is shared between cluster nodes
+VERIFIED_TTL_SECONDS = int(os.environ.get("VERIFIED_TTL_SECONDS", "604800"))
+
+class ScopedDatabase:
+    """The current bot profile's database on the shared MongoClient (one connection pool for all bots)"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def current(self):
+        return self.client[current_profile().database]
+
+    def __getitem__(self, name):
+        return ScopedCollection(self, name)
+
+    def __getattr__(self, attr):
+        return getattr(self.current(), attr)
+
+
+class ScopedCollection:
+    """Collection proxy resolved against the current profile's database on every call"""
+
+    def __init__(self, scoped_db: ScopedDatabase, name: str):
+        self.scoped_db = scoped_db
+        self.name = name
+
+    def __getattr__(self, attr):
+        return getattr(self.scoped_db.current()[self.name], attr)
+
+
+def ensure_indexes() -> None:
+    """Create indexes in the current profile's database"""
+    jobs_collection.create_index([("status", 1), ("next_run_at", 1)])
+    processed_updates_collection.create_index("at", expireAfterSeconds=DEDUP_TTL_SECONDS)
+    users_collection.create_index("thumbnail_ref")
+    channels_collection.create_index("owner_id")
+    recent_results_collection.create_index([("user_id", 1), ("created_at", -1)])
+    recent_results_collection.create_index([("user_id", 1), ("video_unique_id", 1)], unique=True)
+    users_collection.create_index("user_id")
+    # Lease documents of crashed leaders are removed once expired; acquisition never relies on it
+    leases_collection.create_index("expires_at", expireAfterSeconds=0)
+    nodes_collection.create_index("seen_at", expireAfterSeconds=3600)
+    verified_users_collection.create_index("at", expireAfterSeconds=VERIFIED_TTL_SECONDS)
+    broadcasts_collection.create_index([("status", 1), ("created_at", 1)])
+
 
 try:
     mongo_client = MongoClient(MONGODB_URI, serverSelectionTimeoutMS=5000)
-    db = mongo_client[MONGODB_DATABASE]
+    db = ScopedDatabase(mongo_client)
     users_collection = db["users"]
+    jobs_collection = db["cover_jobs"]
+    processed_updates_collection = db["processed_updates"]
+    frame_cache_collection = db["frame_cache"]
+    render_cache_collection = db["render_cache"]
+    # One entry per unique image (file_unique_id), shared by every user pointing at it
+    thumbnails_collection = db["thumbnails"]
+    channels_collection = db["channels"]
+    recent_results_collection = db["recent_results"]
+    # Cluster mode: leader lease, node heartbeats, shared snapshots, queued broadcasts, verified users
+    leases_collection = db["cluster_leases"]
+    nodes_collection = db["cluster_nodes"]
+    cluster_state_collection = db["cluster_state"]
+    broadcasts_collection = db["broadcasts"]
+    verified_users_collection = db["verified_users"]
     # Test connection
     mongo_client.server_info()
     logger.info("✅ MongoDB connected successfully")
     DB_AVAILABLE = True
+    for profile in PROFILES or [current_profile()]:
+        activate(profile)
+        ensure_indexes()
+    activate(None)
 except Exception as e:
+    metrics.record_error()
     logger.warning(f"⚠️ MongoDB not available: {e}")
     logger.warning("⚠️ Bot will work with limited functionality (thumbnails won't persist)")
     DB_AVAILABLE = False
     users_collection = None
+    jobs_collection = None
+    processed_updates_collection = None
+    frame_cache_collection = None
+    render_cache_collection = None
+    thumbnails_collection = None
+    channels_collection = None
+    recent_results_collection = None
+    leases_collection = None
+    nodes_collection = None
+    cluster_state_collection = None
+    broadcasts_collection = None
+    verified_users_collection = None
 
 
-def save_thumbnail(user_id: int, photo_id: str) -> bool:
+def save_thumbnail(user_id: int, photo_id: str, photo_unique_id: str = None) -> bool:
     """Save or update user's thumbnail to MongoDB"""
     if not DB_AVAILABLE:
         logger.debug(f"Database not available, skipping thumbnail save for user {user_id}")
         return False
     
+    acquired = False
     try:
-        users_collection.update_one(
-            {"user_id": user_id},
-            {
-                "$set": {
-                    "user_id": user_id,
-                    "photo_id": photo_id,
-                    "updated_at": datetime.now()
-                }
+        # Take the new reference first so the entry can't be collected before the user points at it
+        if photo_unique_id:
+            _acquire_thumbnail(photo_unique_id, photo_id)
+            acquired = True
+
+        update = {
+            "$set": {
+                "user_id": user_id,
+                "photo_id": photo_id,
+                "photo_unique_id": photo_unique_id,
+                "updated_at": datetime.now()
             },
-            upsert=True
-        )
+            # Normalized thumbnail file_id of older versions, no longer used
+            "$unset": {"thumb_id": ""}
+        }
+        if photo_unique_id:
+            update["$set"]["thumbnail_ref"] = photo_unique_id
+        else:
+            update["$unset"]["thumbnail_ref"] = ""
+        # One atomic swap: concurrent saves each get the reference they replaced, so each
+        # replaced reference is released exactly once
+        previous = users_collection.find_one_and_update(
+            {"user_id": user_id}, update, projection={"thumbnail_ref": 1},
+            upsert=True, return_document=ReturnDocument.BEFORE
+        ) or {}
+        acquired = False
+
+        # Release the reference replaced (for the same image, the extra one just taken)
+        previous_ref = previous.get("thumbnail_ref")
+        if previous_ref:
+            release_thumbnail(previous_ref)
         logger.info(f"✅ Thumbnail saved for user {user_id}")
         return True
     except Exception as e:
+        metrics.record_error()
         logger.error(f"❌ Error saving thumbnail: {e}")
+        if acquired:
+            release_thumbnail(photo_unique_id)
         return False
 
 
@@ -69,10 +178,159 @@ def get_thumbnail(user_id: int) -> str | None:
         logger.info(f"⚠️ No thumbnail found for user {user_id}")
         return None
     except Exception as e:
+        metrics.record_error()
         logger.error(f"❌ Error retrieving thumbnail: {e}")
         return None
 
 
+def get_thumbnail_record(user_id: int) -> dict | None:
+    """Retrieve user's thumbnail fields (photo_id, photo_unique_id, overlay)"""
+    if not DB_AVAILABLE:
+        return None
+
+    try:
+        user_record = users_collection.find_one(
+            {"user_id": user_id},
+            {"photo_id": 1, "photo_unique_id": 1, "overlay": 1}
+        )
+        if not user_record or "photo_id" not in user_record:
+            return None
+        return user_record
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error retrieving thumbnail record: {e}")
+        return None
+
+
+def set_auto_cover(user_id: int, mode: str | None) -> bool:
+    """Set auto-cover mode for a user: None (off), "on" or "save" (also keep the frame as thumbnail)"""
+    if not DB_AVAILABLE:
+        return False
+
+    try:
+        if mode:
+            update = {"$set": {"user_id": user_id, "auto_cover": mode}}
+        else:
+            update = {"$unset": {"auto_cover": ""}}
+        users_collection.update_one({"user_id": user_id}, update, upsert=bool(mode))
+        logger.info(f"✅ Auto-cover for user {user_id}: {mode or 'off'}")
+        return True
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error setting auto-cover: {e}")
+        return False
+
+
+def get_auto_cover(user_id: int) -> str | None:
+    """Return the user's auto-cover mode, or None if disabled"""
+    if not DB_AVAILABLE:
+        return None
+
+    try:
+        user_record = users_collection.find_one({"user_id": user_id}, {"auto_cover": 1})
+        return user_record.get("auto_cover") if user_record else None
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error reading auto-cover: {e}")
+        return None
+
+
+def get_cached_frame(video_unique_id: str) -> dict | None:
+    """Return the uploaded frame ({file_id, file_unique_id}) previously extracted from this video"""
+    if not DB_AVAILABLE:
+        return None
+
+    try:
+        return frame_cache_collection.find_one({"_id": video_unique_id}, {"file_id": 1, "file_unique_id": 1})
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error reading frame cache: {e}")
+        return None
+
+
+def save_cached_frame(video_unique_id: str, file_id: str, file_unique_id: str = None) -> bool:
+    """Remember the uploaded frame file_id for a video"""
+    if not DB_AVAILABLE:
+        return False
+
+    try:
+        frame_cache_collection.update_one(
+            {"_id": video_unique_id},
+            {"$set": {"file_id": file_id, "file_unique_id": file_unique_id, "created_at": datetime.now()}},
+            upsert=True
+        )
+        return True
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error saving frame cache: {e}")
+        return False
+
+
+def set_overlay(user_id: int, text: str | None, position: str = "bottom") -> bool:
+    """Set the user's cover overlay template, or remove it when text is None"""
+    if not DB_AVAILABLE:
+        return False
+
+    try:
+        if text:
+            update = {"$set": {"user_id": user_id, "overlay": {"text": text, "position": position}}}
+        else:
+            update = {"$unset": {"overlay": ""}}
+        users_collection.update_one({"user_id": user_id}, update, upsert=bool(text))
+        logger.info(f"✅ Overlay for user {user_id}: {'set' if text else 'removed'}")
+        return True
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error setting overlay: {e}")
+        return False
+
+
+def get_overlay(user_id: int) -> dict | None:
+    """Return the user's overlay template {text, position}, or None"""
+    if not DB_AVAILABLE:
+        return None
+
+    try:
+        user_record = users_collection.find_one({"user_id": user_id}, {"overlay": 1})
+        return user_record.get("overlay") if user_record else None
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error reading overlay: {e}")
+        return None
+
+
+def get_cached_render(render_key: str) -> str | None:
+    """Return the uploaded file_id of a previously rendered overlay cover"""
+    if not DB_AVAILABLE:
+        return None
+
+    try:
+        record = render_cache_collection.find_one({"_id": render_key})
+        return record["file_id"] if record else None
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error reading render cache: {e}")
+        return None
+
+
+def save_cached_render(render_key: str, file_id: str) -> bool:
+    """Remember the uploaded file_id of a rendered overlay cover"""
+    if not DB_AVAILABLE:
+        return False
+
+    try:
+        render_cache_collection.update_one(
+            {"_id": render_key},
+            {"$set": {"file_id": file_id, "created_at": datetime.now()}},
+            upsert=True
+        )
+        return True
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error saving render cache: {e}")
+        return False
+
+
 def delete_thumbnail(user_id: int) -> bool:
     """Delete user's thumbnail from MongoDB"""
     if not DB_AVAILABLE:
@@ -80,16 +338,20 @@ def delete_thumbnail(user_id: int) -> bool:
         return False
     
     try:
-        result = users_collection.update_one(
-            {"user_id": user_id},
-            {"$unset": {"photo_id": ""}}
+        user_record = users_collection.find_one_and_update(
+            {"user_id": user_id, "photo_id": {"$exists": True}},
+            {"$unset": {"photo_id": "", "photo_unique_id": "", "thumb_id": "", "thumbnail_ref": ""}},
+            projection={"thumbnail_ref": 1}
         )
-        if result.modified_count > 0:
+        if user_record:
+            if user_record.get("thumbnail_ref"):
+                release_thumbnail(user_record["thumbnail_ref"])
             logger.info(f"✅ Thumbnail deleted for user {user_id}")
             return True
         logger.info(f"⚠️ No thumbnail to delete for user {user_id}")
         return False
     except Exception as e:
+        metrics.record_error()
         logger.error(f"❌ Error deleting thumbnail: {e}")
         return False
 
@@ -105,10 +367,122 @@ def has_thumbnail(user_id: int) -> bool:
         logger.debug(f"Thumbnail check for user {user_id}: {has_thumb}")
         return has_thumb
     except Exception as e:
+        metrics.record_error()
         logger.error(f"❌ Error checking thumbnail: {e}")
         return False
 
 
+"""═══════════════════ SHARED THUMBNAILS ═══════════════════"""
+
+# Called with the file_unique_id of every entry whose refcount dropped to zero
+_collect_callbacks = []
+
+
+def on_thumbnail_collected(callback) -> None:
+    """Register `callback(photo_unique_id)` to clean up derived assets of collected thumbnails"""
+    _collect_callbacks.append(callback)
+
+
+def _acquire_thumbnail(photo_unique_id: str, photo_id: str) -> None:
+    thumbnails_collection.update_one(
+        {"_id": photo_unique_id},
+        {
+            "$inc": {"refcount": 1},
+            "$setOnInsert": {"photo_id": photo_id, "created_at": datetime.now()}
+        },
+        upsert=True
+    )
+
+
+def release_thumbnail(photo_unique_id: str) -> bool:
+    """Drop one reference; the entry and its cached renders are deleted at zero. Returns True if collected"""
+    if not DB_AVAILABLE:
+        return False
+
+    try:
+        entry = thumbnails_collection.find_one_and_update(
+            {"_id": photo_unique_id},
+            {"$inc": {"refcount": -1}},
+            return_document=ReturnDocument.AFTER
+        )
+        if not entry or entry.get("refcount", 0) > 0:
+            return False
+        # Only delete if nobody re-acquired it in the meantime
+        return _collect_thumbnail(photo_unique_id, {"$lte": 0})
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error releasing thumbnail: {e}")
+        return False
+
+
+def _collect_thumbnail(photo_unique_id: str, refcount) -> bool:
+    """Delete an entry whose refcount still matches `refcount`, with its cached renders and assets"""
+    result = thumbnails_collection.delete_one({"_id": photo_unique_id, "refcount": refcount})
+    if not result.deleted_count:
+        return False
+    render_cache_collection.delete_many({"_id": {"$regex": f"^{re.escape(photo_unique_id)}-"}})
+    for callback in _collect_callbacks:
+        try:
+            callback(photo_unique_id)
+        except Exception as e:
+            metrics.record_error()
+            logger.error(f"❌ Thumbnail collect callback failed: {e}")
+    logger.info(f"🗑 Thumbnail {photo_unique_id} no longer referenced - collected")
+    return True
+
+
+def migrate_thumbnail_refs() -> int:
+    """Move thumbnails saved before the shared collection existed onto it. Returns users migrated"""
+    if not DB_AVAILABLE:
+        return 0
+
+    migrated = 0
+    try:
+        legacy = users_collection.find(
+            {"photo_unique_id": {"$ne": None}, "thumbnail_ref": {"$exists": False}},
+            {"user_id": 1, "photo_id": 1, "photo_unique_id": 1}
+        )
+        for user_record in legacy:
+            unique_id = user_record["photo_unique_id"]
+            claimed = users_collection.update_one(
+                {"_id": user_record["_id"], "thumbnail_ref": {"$exists": False}},
+                {"$set": {"thumbnail_ref": unique_id}, "$unset": {"thumb_id": ""}}
+            )
+            if not claimed.modified_count:
+                continue
+            _acquire_thumbnail(unique_id, user_record["photo_id"])
+            migrated += 1
+        if migrated:
+            logger.info(f"♻️ Migrated {migrated} thumbnail(s) to the shared collection")
+        return migrated
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error migrating thumbnails: {e}")
+        return migrated
+
+
+def get_thumbnail_dedup_stats() -> dict:
+    """Unique images vs. user references: dedup ratio = references / unique images"""
+    if not DB_AVAILABLE:
+        return {"unique": 0, "references": 0, "ratio": 0.0}
+
+    try:
+        result = list(thumbnails_collection.aggregate([
+            {"$group": {"_id": None, "unique": {"$sum": 1}, "references": {"$sum": "$refcount"}}}
+        ]))
+        unique = result[0]["unique"] if result else 0
+        references = result[0]["references"] if result else 0
+        return {
+            "unique": unique,
+            "references": references,
+            "ratio": references / unique if unique else 0.0,
+        }
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error getting thumbnail dedup stats: {e}")
+        return {"unique": 0, "references": 0, "ratio": 0.0}
+
+
 """═══════════════════ ADMIN FUNCTIONS ═══════════════════"""
 
 
@@ -134,6 +508,7 @@ def ban_user(user_id: int, reason: str = "No reason") -> bool:
         logger.info(f"🚫 User {user_id} banned. Reason: {reason}")
         return True
     except Exception as e:
+        metrics.record_error()
         logger.error(f"❌ Error banning user {user_id}: {e}")
         return False
 
@@ -160,6 +535,7 @@ def unban_user(user_id: int) -> bool:
         logger.info(f"⚠️ User {user_id} not found")
         return False
     except Exception as e:
+        metrics.record_error()
         logger.error(f"❌ Error unbanning user {user_id}: {e}")
         return False
 
@@ -176,6 +552,7 @@ def is_user_banned(user_id: int) -> bool:
             return True
         return False
     except Exception as e:
+        metrics.record_error()
         logger.error(f"❌ Error checking ban status: {e}")
         return False
 
@@ -190,6 +567,7 @@ def get_total_users() -> int:
         logger.info(f"📊 Total users: {count}")
         return count
     except Exception as e:
+        metrics.record_error()
         logger.error(f"❌ Error counting users: {e}")
         return 0
 
@@ -204,6 +582,7 @@ def get_banned_users_count() -> int:
         logger.info(f"🚫 Total banned users: {count}")
         return count
     except Exception as e:
+        metrics.record_error()
         logger.error(f"❌ Error counting banned users: {e}")
         return 0
 
@@ -214,30 +593,606 @@ def get_stats() -> dict:
         return {
             "total_users": 0,
             "banned_users": 0,
-            "users_with_thumbnail": 0
+            "users_with_thumbnail": 0,
+            "unique_thumbnails": 0,
+            "thumbnail_dedup_ratio": 0.0
         }
     
     try:
         total = users_collection.count_documents({})
         banned = users_collection.count_documents({"is_banned": True})
         with_thumb = users_collection.count_documents({"photo_id": {"$exists": True}})
+        dedup = get_thumbnail_dedup_stats()
         
         stats = {
             "total_users": total,
             "banned_users": banned,
-            "users_with_thumbnail": with_thumb
+            "users_with_thumbnail": with_thumb,
+            "unique_thumbnails": dedup["unique"],
+            "thumbnail_dedup_ratio": dedup["ratio"]
         }
         logger.info(f"📊 Stats: {stats}")
         return stats
     except Exception as e:
+        metrics.record_error()
         logger.error(f"❌ Error getting stats: {e}")
         return {
             "total_users": 0,
             "banned_users": 0,
-            "users_with_thumbnail": 0
+            "users_with_thumbnail": 0,
+            "unique_thumbnails": 0,
+            "thumbnail_dedup_ratio": 0.0
         }
 
 
+"""═══════════════════ CHANNEL FUNCTIONS ═══════════════════"""
+
+
+def set_channel(chat_id: int, owner_id: int, title: str, photo_id: str, mode: str = "edit") -> bool:
+    """Link a channel to a cover: every video posted there gets `photo_id` as cover"""
+    if not DB_AVAILABLE:
+        return False
+
+    try:
+        channels_collection.update_one(
+            {"_id": chat_id},
+            {
+                "$set": {
+                    "owner_id": owner_id,
+                    "title": title,
+                    "photo_id": photo_id,
+                    "mode": mode,
+                    "updated_at": datetime.now()
+                },
+                "$setOnInsert": {"created_at": datetime.now()}
+            },
+            upsert=True
+        )
+        logger.info(f"✅ Channel {chat_id} linked by user {owner_id} ({mode})")
+        return True
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error linking channel: {e}")
+        return False
+
+
+def get_channel(chat_id: int) -> dict | None:
+    """Return a linked channel's settings, or None"""
+    if not DB_AVAILABLE:
+        return None
+
+    try:
+        return channels_collection.find_one({"_id": chat_id})
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error reading channel: {e}")
+        return None
+
+
+def get_user_channels(owner_id: int) -> list:
+    """Channels linked by a user"""
+    if not DB_AVAILABLE:
+        return []
+
+    try:
+        return list(channels_collection.find({"owner_id": owner_id}))
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error listing channels: {e}")
+        return []
+
+
+def remove_channel(chat_id: int, owner_id: int) -> bool:
+    """Unlink a channel (only by the user who linked it)"""
+    if not DB_AVAILABLE:
+        return False
+
+    try:
+        result = channels_collection.delete_one({"_id": chat_id, "owner_id": owner_id})
+        if result.deleted_count:
+            logger.info(f"✅ Channel {chat_id} unlinked")
+        return result.deleted_count > 0
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error unlinking channel: {e}")
+        return False
+
+
+"""═══════════════════ RECENT RESULTS (INLINE) ═══════════════════"""
+
+
+def add_recent_result(user_id: int, video_id: str, video_unique_id: str, caption: str, cover: str = None) -> bool:
+    """Remember a covered video for inline sharing; keeps the newest RECENT_RESULTS_LIMIT per user"""
+    if not DB_AVAILABLE:
+        return False
+
+    try:
+        recent_results_collection.update_one(
+            {"user_id": user_id, "video_unique_id": video_unique_id},
+            {"$set": {
+                "video_id": video_id,
+                "caption": caption,
+                "cover": cover,
+                "created_at": datetime.now()
+            }},
+            upsert=True
+        )
+        stale = recent_results_collection.find(
+            {"user_id": user_id}, {"_id": 1}
+        ).sort("created_at", -1).skip(RECENT_RESULTS_LIMIT)
+        stale_ids = [doc["_id"] for doc in stale]
+        if stale_ids:
+            recent_results_collection.delete_many({"_id": {"$in": stale_ids}})
+        return True
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error saving recent result: {e}")
+        return False
+
+
+def get_recent_results(user_id: int, offset: int = 0, limit: int = 20, search: str = "") -> list:
+    """A page of the user's covered videos, newest first, optionally filtered by caption"""
+    if not DB_AVAILABLE:
+        return []
+
+    try:
+        query = {"user_id": user_id}
+        if search:
+            query["caption"] = {"$regex": re.escape(search), "$options": "i"}
+        cursor = recent_results_collection.find(query).sort("created_at", -1).skip(offset).limit(limit)
+        return list(cursor)
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error reading recent results: {e}")
+        return []
+
+
+"""═══════════════════ JOB QUEUE FUNCTIONS ═══════════════════"""
+
+
+def enqueue_job(job: dict) -> bool:
+    """Persist a new cover job"""
+    if not DB_AVAILABLE:
+        return False
+
+    try:
+        jobs_collection.insert_one(dict(job))
+        return True
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error enqueuing job {job.get('_id')}: {e}")
+        return False
+
+
+def claim_next_job(now: float, node: str = None) -> dict | None:
+    """Atomically mark the oldest due pending job as processing (by `node`) and return it"""
+    if not DB_AVAILABLE:
+        return None
+
+    try:
+        return jobs_collection.find_one_and_update(
+            {"status": "pending", "next_run_at": {"$lte": now}},
+            {"$set": {"status": "processing", "node": node, "updated_at": datetime.now()}},
+            sort=[("next_run_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error claiming job: {e}")
+        return None
+
+
+def update_job(job_id: str, fields: dict) -> bool:
+    """Update fields of a job"""
+    if not DB_AVAILABLE:
+        return False
+
+    try:
+        fields = dict(fields, updated_at=datetime.now())
+        jobs_collection.update_one({"_id": job_id}, {"$set": fields})
+        return True
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error updating job {job_id}: {e}")
+        return False
+
+
+def delete_job(job_id: str) -> bool:
+    """Remove a finished job"""
+    if not DB_AVAILABLE:
+        return False
+
+    try:
+        jobs_collection.delete_one({"_id": job_id})
+        return True
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error deleting job {job_id}: {e}")
+        return False
+
+
+def requeue_stale_jobs(node: str = None, live_nodes: list = None) -> int:
+    """
+    Return jobs left in processing state (e.g. by a crash or restart) to the queue.
+    In cluster mode only `node`'s own jobs, or those of nodes not in `live_nodes`, are taken back.
+    """
+    if not DB_AVAILABLE:
+        return 0
+
+    try:
+        query = {"status": "processing"}
+        if live_nodes is not None:
+            query["node"] = {"$nin": live_nodes}
+        elif node:
+            query["node"] = node
+        result = jobs_collection.update_many(
+            query,
+            {"$set": {"status": "pending", "updated_at": datetime.now()}}
+        )
+        return result.modified_count
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error requeuing stale jobs: {e}")
+        return 0
+
+
+def get_dead_jobs(limit: int = 20) -> list:
+    """List dead-lettered jobs, newest first"""
+    if not DB_AVAILABLE:
+        return []
+
+    try:
+        return list(jobs_collection.find({"status": "dead"}).sort("updated_at", -1).limit(limit))
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error listing dead jobs: {e}")
+        return []
+
+
+def replay_dead_jobs(job_id: str = None) -> int:
+    """Move one (or all) dead-lettered jobs back to the queue"""
+    if not DB_AVAILABLE:
+        return 0
+
+    try:
+        query = {"status": "dead"}
+        if job_id:
+            query["_id"] = job_id
+        result = jobs_collection.update_many(
+            query,
+            {"$set": {"status": "pending", "attempts": 0, "next_run_at": 0, "updated_at": datetime.now()}}
+        )
+        return result.modified_count
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error replaying dead jobs: {e}")
+        return 0
+
+
+def count_jobs_by_status() -> dict:
+    """Return {status: count} for the job queue"""
+    if not DB_AVAILABLE:
+        return {}
+
+    try:
+        pipeline = [{"$group": {"_id": "$status", "count": {"$sum": 1}}}]
+        return {row["_id"]: row["count"] for row in jobs_collection.aggregate(pipeline)}
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error counting jobs: {e}")
+        return {}
+
+
+"""═══════════════════ UPDATE DEDUP FUNCTIONS ═══════════════════"""
+
+
+def mark_updates_processed(keys: list) -> bool:
+    """Persist a batch of processed update keys (expired by TTL index)"""
+    if not DB_AVAILABLE or not keys:
+        return False
+
+    try:
+        now = datetime.now()
+        operations = [UpdateOne({"_id": key}, {"$set": {"at": now}}, upsert=True) for key in keys]
+        processed_updates_collection.bulk_write(operations, ordered=False)
+        return True
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error saving processed updates: {e}")
+        return False
+
+
+def get_recent_update_keys(limit: int) -> list:
+    """Load the most recent processed update keys"""
+    if not DB_AVAILABLE:
+        return []
+
+    try:
+        cursor = processed_updates_collection.find({}, {"_id": 1}).sort("at", -1).limit(limit)
+        return [doc["_id"] for doc in cursor]
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error loading processed updates: {e}")
+        return []
+
+
+"""═══════════════════ CLUSTER FUNCTIONS ═══════════════════"""
+
+
+def acquire_lease(name: str, holder: str, ttl: float) -> bool:
+    """Take or renew lease `name` for `holder` if it is free, expired or already held. Returns True if held"""
+    if not DB_AVAILABLE:
+        return False
+
+    now = datetime.now(timezone.utc)
+    try:
+        lease = leases_collection.find_one_and_update(
+            {"_id": name, "$or": [{"holder": holder}, {"expires_at": {"$lte": now}}]},
+            {"$set": {"holder": holder, "expires_at": now + timedelta(seconds=ttl), "renewed_at": now}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return bool(lease) and lease.get("holder") == holder
+    except DuplicateKeyError:
+        # Held by another node and not expired: the filter missed and the upsert collided
+        return False
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error acquiring lease {name}: {e}")
+        return False
+
+
+def release_lease(name: str, holder: str) -> bool:
+    """Give up lease `name` if `holder` still has it, so another node can take over at once"""
+    if not DB_AVAILABLE:
+        return False
+
+    try:
+        result = leases_collection.delete_one({"_id": name, "holder": holder})
+        return bool(result.deleted_count)
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error releasing lease {name}: {e}")
+        return False
+
+
+def get_lease(name: str) -> dict | None:
+    if not DB_AVAILABLE:
+        return None
+
+    try:
+        return leases_collection.find_one({"_id": name, "expires_at": {"$gt": datetime.now(timezone.utc)}})
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error reading lease {name}: {e}")
+        return None
+
+
+def heartbeat_node(node: str, counters: dict) -> bool:
+    """Record that `node` is alive, with its cumulative counters (read by the leader's digest)"""
+    if not DB_AVAILABLE:
+        return False
+
+    try:
+        nodes_collection.update_one(
+            {"_id": node},
+            {
+                "$set": {"seen_at": datetime.now(timezone.utc), "counters": counters},
+                "$setOnInsert": {"started_at": datetime.now(timezone.utc)}
+            },
+            upsert=True
+        )
+        return True
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error saving heartbeat of node {node}: {e}")
+        return False
+
+
+def remove_node(node: str) -> bool:
+    if not DB_AVAILABLE:
+        return False
+
+    try:
+        nodes_collection.delete_one({"_id": node})
+        return True
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error removing node {node}: {e}")
+        return False
+
+
+def get_live_nodes(max_age: float) -> list:
+    """Nodes that sent a heartbeat within `max_age` seconds"""
+    if not DB_AVAILABLE:
+        return []
+
+    try:
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=max_age)
+        return list(nodes_collection.find({"seen_at": {"$gt": cutoff}}).sort("_id", 1))
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error listing cluster nodes: {e}")
+        return []
+
+
+def save_cluster_state(key: str, value: dict) -> bool:
+    """Store a shared snapshot (stats, digest baseline, ...) under `key`"""
+    if not DB_AVAILABLE:
+        return False
+
+    try:
+        cluster_state_collection.update_one(
+            {"_id": key},
+            {"$set": {"value": value, "at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+        return True
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error saving cluster state {key}: {e}")
+        return False
+
+
+def get_cluster_state(key: str, max_age: float = None) -> dict | None:
+    """Shared snapshot under `key`, or None if missing or older than `max_age` seconds"""
+    if not DB_AVAILABLE:
+        return None
+
+    try:
+        query = {"_id": key}
+        if max_age is not None:
+            query["at"] = {"$gt": datetime.now(timezone.utc) - timedelta(seconds=max_age)}
+        state = cluster_state_collection.find_one(query)
+        return state["value"] if state else None
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error reading cluster state {key}: {e}")
+        return None
+
+
+def reconcile_thumbnail_refs() -> int:
+    """Recount thumbnail references from user records and fix drifted refcounts. Returns entries fixed"""
+    if not DB_AVAILABLE:
+        return 0
+
+    fixed = 0
+    try:
+        stored = {entry["_id"]: entry.get("refcount", 0) for entry in thumbnails_collection.find({}, {"refcount": 1})}
+        actual = {
+            row["_id"]: row["count"]
+            for row in users_collection.aggregate([
+                {"$match": {"thumbnail_ref": {"$ne": None}}},
+                {"$group": {"_id": "$thumbnail_ref", "count": {"$sum": 1}}}
+            ])
+        }
+        for unique_id, refcount in stored.items():
+            count = actual.get(unique_id, 0)
+            if count == refcount:
+                continue
+            # Conditional on the value read, so a concurrent acquire/release wins over the repair
+            if count == 0:
+                fixed += _collect_thumbnail(unique_id, refcount)
+            else:
+                result = thumbnails_collection.update_one(
+                    {"_id": unique_id, "refcount": refcount}, {"$set": {"refcount": count}}
+                )
+                fixed += result.modified_count
+        if fixed:
+            logger.info(f"🧮 Reconciled {fixed} thumbnail refcount(s)")
+        return fixed
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error reconciling thumbnail refcounts: {e}")
+        return fixed
+
+
+def get_user_ids(after: int = None, limit: int = 500) -> list:
+    """User ids in ascending order, starting after `after` (for resumable broadcasts)"""
+    if not DB_AVAILABLE:
+        return []
+
+    try:
+        query = {"user_id": {"$gt": after} if after is not None else {"$exists": True}}
+        cursor = users_collection.find(query, {"user_id": 1}).sort("user_id", 1).limit(limit)
+        return [user["user_id"] for user in cursor]
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error listing user ids: {e}")
+        return []
+
+
+def create_broadcast(broadcast: dict) -> bool:
+    """Queue a broadcast for the cluster leader"""
+    if not DB_AVAILABLE:
+        return False
+
+    try:
+        broadcasts_collection.insert_one(dict(broadcast, status="pending", created_at=datetime.now()))
+        return True
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error queueing broadcast: {e}")
+        return False
+
+
+def claim_broadcast(node: str) -> dict | None:
+    """
+    Claim the oldest pending broadcast, or one left running by a previous leader.
+    Only the leader calls this, so a running broadcast owned by another node is orphaned.
+    """
+    if not DB_AVAILABLE:
+        return None
+
+    try:
+        return broadcasts_collection.find_one_and_update(
+            {"$or": [{"status": "pending"}, {"status": "running", "node": {"$ne": node}}]},
+            {"$set": {"status": "running", "node": node, "updated_at": datetime.now()}},
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error claiming broadcast: {e}")
+        return None
+
+
+def update_broadcast(broadcast_id: str, fields: dict) -> bool:
+    """Save broadcast progress (sent, failed, last_user_id, status)"""
+    if not DB_AVAILABLE:
+        return False
+
+    try:
+        fields = dict(fields, updated_at=datetime.now())
+        broadcasts_collection.update_one({"_id": broadcast_id}, {"$set": fields})
+        return True
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error updating broadcast {broadcast_id}: {e}")
+        return False
+
+
+def mark_user_verified(user_id: int) -> bool:
+    """Share a passed force-sub check with every node"""
+    if not DB_AVAILABLE:
+        return False
+
+    try:
+        verified_users_collection.update_one(
+            {"_id": user_id}, {"$set": {"at": datetime.now(timezone.utc)}}, upsert=True
+        )
+        return True
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error saving verified user {user_id}: {e}")
+        return False
+
+
+def is_user_verified(user_id: int) -> bool:
+    if not DB_AVAILABLE:
+        return False
+
+    try:
+        return verified_users_collection.count_documents({"_id": user_id}, limit=1) > 0
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error checking verified user {user_id}: {e}")
+        return False
+
+
+def unmark_user_verified(user_id: int) -> bool:
+    if not DB_AVAILABLE:
+        return False
+
+    try:
+        verified_users_collection.delete_one({"_id": user_id})
+        return True
+    except Exception as e:
+        metrics.record_error()
+        logger.error(f"❌ Error removing verified user {user_id}: {e}")
+        return False
+
+
 """═══════════════════ LOGGING FUNCTIONS ═══════════════════"""
 
 
@@ -311,3 +1266,12 @@ def log_thumbnail_removed(user_id: int, username: str) -> dict:
     logger.info(f"✅ {action} - {username} ({user_id})")
     return create_log_entry(user_id, username, action)
 
+
+"""═══════════════════ INSTRUMENTATION ═══════════════════"""
+
+# Every public function is timed as db.<name> (latency, errors, calls in flight).
+# Done last, so `from database import ...` elsewhere gets the timed versions.
+for _name, _function in list(globals().items()):
+    if inspect.isfunction(_function) and _function.__module__ == __name__ and not _name.startswith("_"):
+        globals()[_name] = metrics.instrument(f"db.{_name}", _function)
+del _name, _function
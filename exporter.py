@@ -0,0 +1,130 @@
+"""
+Metrics Endpoint for Video Cover Bot
+Serves the in-process metrics in Prometheus text format on a local HTTP
+port, using only asyncio (no extra packages):
+
+    curl http://127.0.0.1:9464/metrics
+"""
+
+import os
+import asyncio
+import logging
+
+import metrics
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# 0 = disabled. Sharded workers listen on METRICS_PORT + 1, + 2, ...
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+# Keep on localhost unless a scraper on another host needs it
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+METRICS_PREFIX = os.environ.get("METRICS_PREFIX", "coverbot")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value is not None else "NaN"
+
+
+def render() -> str:
+    """Current metrics in Prometheus exposition format"""
+    data = metrics.snapshot()
+    p = METRICS_PREFIX
+    lines = [
+        f"# HELP {p}_latency_seconds Latency of handlers (handler.*), callback routes (callback.*), "
+        "database functions (db.*), Bot API methods (api.*) and internal steps",
+        f"# TYPE {p}_latency_seconds histogram",
+    ]
+    bounds = [_number(bound) for bound in metrics.BUCKETS] + ["+Inf"]
+    for name, (counts, total) in sorted(data["histograms"].items()):
+        label = _label(name)
+        cumulative = 0
+        for bound, count in zip(bounds, counts):
+            cumulative += count
+            lines.append(f'{p}_latency_seconds_bucket{{name="{label}",le="{bound}"}} {cumulative}')
+        lines.append(f'{p}_latency_seconds_sum{{name="{label}"}} {_number(total)}')
+        lines.append(f'{p}_latency_seconds_count{{name="{label}"}} {cumulative}')
+
+    lines += [f"# HELP {p}_events_total Event counters", f"# TYPE {p}_events_total counter"]
+    for name, value in sorted(data["counters"].items()):
+        lines.append(f'{p}_events_total{{name="{_label(name)}"}} {value}')
+
+    lines += [f"# HELP {p}_in_flight Calls currently running", f"# TYPE {p}_in_flight gauge"]
+    for name, value in sorted(data["in_flight"].items()):
+        lines.append(f'{p}_in_flight{{name="{_label(name)}"}} {value}')
+
+    lines += [f"# HELP {p}_gauge Queue depths, pool occupancy and other levels", f"# TYPE {p}_gauge gauge"]
+    for name, value in sorted(data["gauges"].items()):
+        lines.append(f'{p}_gauge{{name="{_label(name)}"}} {_number(value)}')
+
+    lines += [f"# HELP {p}_cache_hit_ratio Hits / (hits + misses)", f"# TYPE {p}_cache_hit_ratio gauge"]
+    for name, ratio in sorted(data["cache_hit_ratio"].items()):
+        lines.append(f'{p}_cache_hit_ratio{{cache="{_label(name)}"}} {_number(ratio)}')
+    return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """Minimal HTTP/1.0 server: GET /metrics and GET /healthz"""
+
+    def __init__(self, host: str = METRICS_HOST, port: int = METRICS_PORT):
+        self.host = host
+        self.port = port
+        self.scrapes = 0
+        self._server = None
+
+    async def start(self) -> bool:
+        """Start listening (once per process; later calls are no-ops)"""
+        if not self.port or self._server:
+            return bool(self._server)
+        try:
+            self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        except OSError as e:
+            logger.warning(f"⚠️ Metrics endpoint not started on {self.host}:{self.port}: {e}")
+            return False
+        logger.info(f"📈 Metrics endpoint on http://{self.host}:{self.port}/metrics")
+        return True
+
+    async def stop(self) -> None:
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader, writer) -> None:
+        try:
+            request = await asyncio.wait_for(reader.readline(), timeout=5)
+            # Headers are not needed, but must be read before answering
+            while True:
+                line = await asyncio.wait_for(reader.readline(), timeout=5)
+                if line in (b"\r\n", b"\n", b""):
+                    break
+            parts = request.decode("latin-1").split()
+            method, path = (parts[0], parts[1].split("?", 1)[0]) if len(parts) >= 2 else ("", "")
+            if method != "GET":
+                status, body, content_type = "405 Method Not Allowed", b"method not allowed\n", "text/plain"
+            elif path == "/metrics":
+                self.scrapes += 1
+                status, body, content_type = "200 OK", render().encode(), CONTENT_TYPE
+            elif path == "/healthz":
+                status, body, content_type = "200 OK", b"ok\n", "text/plain"
+            else:
+                status, body, content_type = "404 Not Found", b"not found\n", "text/plain"
+            writer.write(
+                f"HTTP/1.0 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError) as e:
+            logger.debug(f"Metrics request failed: {e}")
+        finally:
+            writer.close()
+
+
+# One endpoint per process, shared by every bot in it
+metrics_server = MetricsServer()
@@ -0,0 +1,194 @@
+"""
+Flood Control for Video Cover Bot
+Per-user token buckets for each kind of action (commands, callbacks, videos),
+checked by the update processor so excess updates are dropped before they
+take a processing slot or wait for their user's turn, plus an overload mode
+that sheds low-priority updates while the update backlog is deep.
+"""
+
+import os
+import time
+import logging
+
+from telegram import Update
+
+import metrics
+from profiles import ProfileLocal
+from scheduler import TokenBucket
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+FLOOD_CONTROL = os.environ.get("FLOOD_CONTROL", "true").lower() in ("1", "true", "yes")
+# Sustained rate (per second) and burst of each action type, per user
+FLOOD_COMMAND_RATE = float(os.environ.get("FLOOD_COMMAND_RATE", "1"))
+FLOOD_COMMAND_BURST = float(os.environ.get("FLOOD_COMMAND_BURST", "5"))
+FLOOD_CALLBACK_RATE = float(os.environ.get("FLOOD_CALLBACK_RATE", "2"))
+FLOOD_CALLBACK_BURST = float(os.environ.get("FLOOD_CALLBACK_BURST", "8"))
+FLOOD_VIDEO_RATE = float(os.environ.get("FLOOD_VIDEO_RATE", "0.5"))
+FLOOD_VIDEO_BURST = float(os.environ.get("FLOOD_VIDEO_BURST", "10"))
+# At most one "slow down" notice per user in this many seconds
+FLOOD_NOTICE_INTERVAL = float(os.environ.get("FLOOD_NOTICE_INTERVAL", "30"))
+# Updates waiting for a processing slot that switch on overload mode (0 = never)
+OVERLOAD_QUEUE_DEPTH = int(os.environ.get("OVERLOAD_QUEUE_DEPTH", "200"))
+# Tokens each update costs while overloaded (2 = budgets are halved)
+OVERLOAD_COST = float(os.environ.get("OVERLOAD_COST", "2"))
+
+ACTION_COMMAND = "command"
+ACTION_CALLBACK = "callback"
+ACTION_VIDEO = "video"
+ACTION_INLINE = "inline"
+
+BUDGETS = {
+    ACTION_COMMAND: (FLOOD_COMMAND_RATE, FLOOD_COMMAND_BURST),
+    ACTION_CALLBACK: (FLOOD_CALLBACK_RATE, FLOOD_CALLBACK_BURST),
+    ACTION_VIDEO: (FLOOD_VIDEO_RATE, FLOOD_VIDEO_BURST),
+}
+# Dropped outright while overloaded
+SHED_WHEN_OVERLOADED = {ACTION_INLINE}
+
+# Seconds between sweeps of idle buckets
+PRUNE_INTERVAL = 60
+
+FLOOD_NOTICE = "⏳ sʟᴏᴡ ᴅᴏᴡɴ! ᴛᴏᴏ ᴍᴀɴʏ ʀᴇǫᴜᴇsᴛs, ᴛʀʏ ᴀɢᴀɪɴ ɪɴ ᴀ ꜰᴇᴡ sᴇᴄᴏɴᴅs."
+OVERLOAD_NOTICE = "⏳ ʙᴏᴛ ɪs ʙᴜsʏ ʀɪɢʜᴛ ɴᴏᴡ, ᴘʟᴇᴀsᴇ ᴛʀʏ ᴀɢᴀɪɴ sʜᴏʀᴛʟʏ."
+
+
+def classify(update) -> str | None:
+    """Action type of an update, or None for updates that are never throttled"""
+    if not isinstance(update, Update) or not update.effective_user:
+        return None
+    if update.callback_query:
+        return ACTION_CALLBACK
+    if update.inline_query:
+        return ACTION_INLINE
+    message = update.message
+    if not message:
+        return None
+    document = message.document
+    if message.video or message.animation or (document and (document.mime_type or "").startswith("video/")):
+        return ACTION_VIDEO
+    return ACTION_COMMAND
+
+
+class FloodControl:
+    """Token buckets by (user, action) and the overload switch of one bot"""
+
+    def __init__(self):
+        self._buckets = {}
+        self._notified = {}
+        self._pruned = time.monotonic()
+        self.overloaded = False
+        self.overload_since = None
+        self.dropped = {ACTION_COMMAND: 0, ACTION_CALLBACK: 0, ACTION_VIDEO: 0, ACTION_INLINE: 0}
+        self.shed = 0
+        self.notices = 0
+
+    def update_load(self, backlog: int) -> bool:
+        """Switch overload mode on at OVERLOAD_QUEUE_DEPTH and off again below half of it"""
+        if not OVERLOAD_QUEUE_DEPTH:
+            return False
+        if not self.overloaded and backlog >= OVERLOAD_QUEUE_DEPTH:
+            self.overloaded = True
+            self.overload_since = time.monotonic()
+            metrics.incr("flood.overload")
+            logger.warning(f"🚨 Overload mode on: {backlog} updates waiting - shedding low-priority work")
+        elif self.overloaded and backlog < OVERLOAD_QUEUE_DEPTH / 2:
+            self.overloaded = False
+            logger.info(f"✅ Overload mode off after {time.monotonic() - self.overload_since:.0f}s")
+        return self.overloaded
+
+    def admit(self, user_id: int, action: str) -> bool:
+        """Take a token from the user's bucket for `action`; False if the budget is spent"""
+        if action in SHED_WHEN_OVERLOADED:
+            if self.overloaded:
+                self.shed += 1
+                self.dropped[action] += 1
+                metrics.incr(f"flood.shed.{action}")
+                return False
+            return True
+        key = (user_id, action)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            rate, burst = BUDGETS[action]
+            bucket = self._buckets[key] = TokenBucket(rate, burst)
+        cost = OVERLOAD_COST if self.overloaded else 1
+        self._prune()
+        if not bucket.available(cost):
+            self.dropped[action] += 1
+            metrics.incr(f"flood.dropped.{action}")
+            return False
+        bucket.take(cost)
+        return True
+
+    def should_notify(self, user_id: int) -> bool:
+        """True at most once per FLOOD_NOTICE_INTERVAL for each user"""
+        now = time.monotonic()
+        if now - self._notified.get(user_id, -FLOOD_NOTICE_INTERVAL) < FLOOD_NOTICE_INTERVAL:
+            return False
+        self._notified[user_id] = now
+        self.notices += 1
+        return True
+
+    def _prune(self) -> None:
+        """Forget full buckets and old notices so idle users cost no memory"""
+        now = time.monotonic()
+        if now - self._pruned < PRUNE_INTERVAL:
+            return
+        self._pruned = now
+        for key, bucket in list(self._buckets.items()):
+            bucket.refill()
+            if bucket.tokens >= bucket.capacity:
+                del self._buckets[key]
+        for user_id, notified in list(self._notified.items()):
+            if now - notified >= FLOOD_NOTICE_INTERVAL:
+                del self._notified[user_id]
+
+    def stats(self) -> dict:
+        return {
+            "tracked": len(self._buckets),
+            "dropped": dict(self.dropped),
+            "shed": self.shed,
+            "notices": self.notices,
+            "overloaded": self.overloaded,
+        }
+
+
+# Each bot has its own users' budgets and its own backlog
+flood_control = ProfileLocal(FloodControl)
+
+
+async def _notify(update: Update, text: str) -> None:
+    try:
+        if update.callback_query:
+            await update.callback_query.answer(text, show_alert=False)
+        elif update.message:
+            await update.message.reply_text(text)
+    except Exception as e:
+        logger.debug(f"Flood notice failed: {e}")
+
+
+def flood_gate(exempt=None):
+    """
+    Admission check for UserOrderedUpdateProcessor, run before an update waits for
+    its user's turn or a slot. `exempt(user_id, action)` returns True for updates
+    that are never throttled (admins, videos of an open bulk session).
+    """
+    async def admit(update, backlog: int) -> bool:
+        if not FLOOD_CONTROL:
+            return True
+        action = classify(update)
+        if action is None:
+            return True
+        control = flood_control.current()
+        overloaded = control.update_load(backlog)
+        user_id = update.effective_user.id
+        if exempt and exempt(user_id, action):
+            return True
+        if control.admit(user_id, action):
+            return True
+        logger.debug(f"🚦 Dropped {action} update {update.update_id} from user {user_id}")
+        if action != ACTION_INLINE and control.should_notify(user_id):
+            await _notify(update, OVERLOAD_NOTICE if overloaded else FLOOD_NOTICE)
+        return False
+    return admit
@@ -0,0 +1,425 @@
+"""
+Image Processing for Video Cover Bot
+CPU-heavy work (overlay rendering, encoding) runs in a process pool; results are
+cached on disk and uploaded once so later sends reuse the file_id.
+"""
+
+import os
+import re
+import sys
+import time
+import shutil
+import hashlib
+import asyncio
+import logging
+import tempfile
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image, ImageDraw, ImageFont, ImageOps
+except ImportError:
+    Image = None
+    ImageDraw = None
+    ImageFont = None
+    ImageOps = None
+
+import metrics
+import database
+from botapi import DOWNLOAD_LIMIT_MB, local_path
+from profiles import current_profile
+from scheduler import BACKGROUND
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+PILLOW_AVAILABLE = Image is not None
+
+IMAGE_WORKERS = int(os.environ.get("IMAGE_WORKERS", "2"))
+CACHE_DIR = os.environ.get("MEDIA_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache"))
+
+# Auto-cover frame extraction (ffmpeg)
+FFMPEG_BINARY = os.environ.get("FFMPEG_BINARY", "ffmpeg")
+FRAME_WORKERS = int(os.environ.get("FRAME_WORKERS", "2"))
+AUTO_COVER_TIMEOUT = float(os.environ.get("AUTO_COVER_TIMEOUT", "30"))
+# Bot API downloads are capped at 20MB unless a local Bot API server is used
+AUTO_COVER_MAX_MB = int(os.environ.get("AUTO_COVER_MAX_MB", str(DOWNLOAD_LIMIT_MB)))
+# "keyframe" = first keyframe, "scene" = ffmpeg thumbnail filter pick
+AUTO_COVER_STRATEGY = os.environ.get("AUTO_COVER_STRATEGY", "keyframe").lower()
+
+# Cover overlay rendering: optional TrueType font (Pillow's built-in font otherwise)
+OVERLAY_FONT = os.environ.get("OVERLAY_FONT")
+OVERLAY_MAX_CHARS = 60
+OVERLAY_POSITIONS = ("top", "center", "bottom")
+# Bump when render_overlay_bytes output changes so old renders are not reused
+OVERLAY_RENDER_VERSION = 1
+
+_pool = None
+_frame_slots = None
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Lazily create the shared image process pool"""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=max(1, IMAGE_WORKERS))
+    return _pool
+
+
+async def run_in_pool(func, *args):
+    """Run a picklable function in the image process pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_pool(), func, *args)
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+"""═══════════════════ WORKER FUNCTIONS (run in pool) ═══════════════════"""
+
+
+def _overlay_font(size: int):
+    if OVERLAY_FONT:
+        try:
+            return ImageFont.truetype(OVERLAY_FONT, size)
+        except OSError:
+            pass
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        # Pillow < 10.1 has a single fixed-size bitmap font
+        return ImageFont.load_default()
+
+
+def render_overlay_bytes(data: bytes, text: str, position: str = "bottom") -> bytes:
+    """Stamp text on a shaded band across the image and re-encode as JPEG"""
+    image = Image.open(BytesIO(data))
+    image = ImageOps.exif_transpose(image).convert("RGB")
+    width, height = image.size
+
+    font = _overlay_font(max(14, height // 12))
+    draw = ImageDraw.Draw(image, "RGBA")
+    left, top, right, bottom = draw.textbbox((0, 0), text, font=font, stroke_width=2)
+    text_w, text_h = right - left, bottom - top
+    padding = max(6, text_h // 3)
+    band_h = text_h + padding * 2
+
+    if position == "top":
+        band_y = 0
+    elif position == "center":
+        band_y = (height - band_h) // 2
+    else:
+        band_y = height - band_h
+
+    draw.rectangle((0, band_y, width, band_y + band_h), fill=(0, 0, 0, 140))
+    draw.text(
+        ((width - text_w) // 2 - left, band_y + padding - top),
+        text,
+        font=font,
+        fill=(255, 255, 255),
+        stroke_width=2,
+        stroke_fill=(0, 0, 0),
+    )
+
+    out = BytesIO()
+    image.save(out, format="JPEG", quality=90, optimize=True)
+    return out.getvalue()
+
+
+"""═══════════════════ DISK CACHE ═══════════════════"""
+
+
+def cache_path(kind: str, key: str) -> str:
+    safe_key = "".join(c for c in str(key) if c.isalnum() or c in "-_")
+    return os.path.join(CACHE_DIR, kind, f"{safe_key}.jpg")
+
+
+def read_cached(kind: str, key: str) -> bytes | None:
+    path = cache_path(kind, key)
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        metrics.incr(f"cache.{kind}.hit")
+        return data
+    except FileNotFoundError:
+        metrics.incr(f"cache.{kind}.miss")
+        return None
+
+
+def write_cached(kind: str, key: str, data: bytes) -> None:
+    path = cache_path(kind, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def delete_cached(kind: str, key: str) -> None:
+    try:
+        os.remove(cache_path(kind, key))
+    except FileNotFoundError:
+        pass
+
+
+def purge_assets(unique_id: str) -> None:
+    """Remove every cached file derived from an image that is no longer referenced"""
+    delete_cached("originals", unique_id)
+    prefix = os.path.basename(cache_path("renders", unique_id))[:-len(".jpg")] + "-"
+    try:
+        names = os.listdir(os.path.join(CACHE_DIR, "renders"))
+    except FileNotFoundError:
+        return
+    for name in names:
+        if name.startswith(prefix):
+            try:
+                os.remove(os.path.join(CACHE_DIR, "renders", name))
+            except FileNotFoundError:
+                pass
+
+
+database.on_thumbnail_collected(purge_assets)
+
+
+"""═══════════════════ TELEGRAM I/O ═══════════════════"""
+
+
+async def download_file(bot, file_id: str) -> bytes:
+    """Fetch a file into memory - read from disk when a local Bot API server holds it"""
+    tg_file = await bot.get_file(file_id)
+    path = local_path(tg_file)
+    if path:
+        return await asyncio.to_thread(_read_file, path)
+    return bytes(await tg_file.download_as_bytearray())
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+async def upload_asset(bot, data: bytes, filename: str = "asset.jpg") -> tuple[str | None, str | None]:
+    """Upload derived image bytes once. Returns the photo's (file_id, file_unique_id)"""
+    # file_ids are per bot, so each bot uploads to its own asset chat
+    asset_channel_id = current_profile().asset_channel_id
+    if not asset_channel_id:
+        return None, None
+    try:
+        message = await bot.send_photo(
+            chat_id=asset_channel_id,
+            photo=data,
+            filename=filename,
+            disable_notification=True,
+            **BACKGROUND
+        )
+        photo = message.photo[-1]
+        return photo.file_id, photo.file_unique_id
+    except Exception as e:
+        logger.error(f"❌ Error uploading derived asset: {e}")
+        return None, None
+
+
+"""═══════════════════ AUTO-COVER FRAMES ═══════════════════"""
+
+
+def ffmpeg_available() -> bool:
+    return shutil.which(FFMPEG_BINARY) is not None
+
+
+def _frame_command(path: str, strategy: str) -> list:
+    if strategy == "scene":
+        # Let ffmpeg score frames in batches and keep the most representative one
+        return [FFMPEG_BINARY, "-hide_banner", "-loglevel", "error", "-i", path,
+                "-vf", "thumbnail=120", "-frames:v", "1", "-f", "image2", "-c:v", "mjpeg", "pipe:1"]
+    return [FFMPEG_BINARY, "-hide_banner", "-loglevel", "error", "-skip_frame", "nokey", "-i", path,
+            "-frames:v", "1", "-f", "image2", "-c:v", "mjpeg", "pipe:1"]
+
+
+async def extract_frame(path: str, strategy: str = AUTO_COVER_STRATEGY, timeout: float = AUTO_COVER_TIMEOUT) -> bytes:
+    """Extract one JPEG frame with ffmpeg; at most FRAME_WORKERS decoders run at once"""
+    global _frame_slots
+    if _frame_slots is None:
+        _frame_slots = asyncio.Semaphore(max(1, FRAME_WORKERS))
+
+    async with _frame_slots:
+        proc = await asyncio.create_subprocess_exec(
+            *_frame_command(path, strategy),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            output, errors = await asyncio.wait_for(proc.communicate(), timeout=timeout)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            raise TimeoutError(f"frame extraction timed out after {timeout:.0f}s")
+    if proc.returncode != 0 or not output:
+        raise ValueError(f"ffmpeg failed: {errors.decode(errors='replace')[-200:]}")
+    return output
+
+
+async def auto_cover(bot, video_id: str, video_unique_id: str, file_size: int = 0):
+    """
+    Return a cover for a video taken from one of its frames: a cached file_id when
+    this video was seen before, else freshly extracted JPEG bytes (uploaded once).
+    Returns (cover, file_id, file_unique_id) where cover is a file_id or bytes.
+    """
+    cached = await asyncio.to_thread(database.get_cached_frame, video_unique_id)
+    if cached:
+        metrics.incr("cache.frames.hit")
+        return cached["file_id"], cached["file_id"], cached.get("file_unique_id")
+
+    data = read_cached("frames", video_unique_id)
+    if data is None:
+        if not ffmpeg_available():
+            raise ValueError("ffmpeg is not installed")
+        if file_size and file_size > AUTO_COVER_MAX_MB * 1024 * 1024:
+            raise ValueError(f"video too large for frame extraction (max {AUTO_COVER_MAX_MB} MB)")
+
+        with metrics.timer("imaging.frame_extract"):
+            tg_file = await bot.get_file(video_id)
+            path = local_path(tg_file)
+            if path:
+                # Local Bot API server: ffmpeg reads the stored file in place
+                data = await extract_frame(path)
+            else:
+                with tempfile.TemporaryDirectory() as tmp_dir:
+                    path = os.path.join(tmp_dir, "video")
+                    await tg_file.download_to_drive(path)
+                    data = await extract_frame(path)
+        write_cached("frames", video_unique_id, data)
+
+    file_id, file_unique_id = await upload_asset(bot, data, filename=f"{video_unique_id}.jpg")
+    if file_id:
+        await asyncio.to_thread(database.save_cached_frame, video_unique_id, file_id, file_unique_id)
+        return file_id, file_id, file_unique_id
+    return data, None, None
+
+
+"""═══════════════════ COVER OVERLAYS ═══════════════════"""
+
+EPISODE_PATTERN = re.compile(r"(?:\bep(?:isode)?|\be|(?<=\d)e)\s*[.:#-]?\s*(\d{1,4})\b", re.IGNORECASE)
+NUMBER_PATTERN = re.compile(r"\b(\d{1,4})\b")
+
+
+def overlay_text(template: str, caption: str = "") -> str:
+    """
+    Fill an overlay template from the video caption.
+    {caption} = first caption line, {episode} = episode number ("Ep 12", "E12" or the first number).
+    Returns "" when a placeholder cannot be filled, so the plain cover is used instead.
+    """
+    caption = caption or ""
+    text = template
+    if "{episode}" in text:
+        match = EPISODE_PATTERN.search(caption) or NUMBER_PATTERN.search(caption)
+        if not match:
+            return ""
+        text = text.replace("{episode}", match.group(1).lstrip("0") or "0")
+    if "{caption}" in text:
+        first_line = caption.strip().split("\n")[0].strip()
+        if not first_line:
+            return ""
+        text = text.replace("{caption}", first_line)
+    return text.strip()[:OVERLAY_MAX_CHARS]
+
+
+def render_key(unique_id: str, text: str, position: str) -> str:
+    """Cache key of a rendered cover: (photo file_unique_id, template version, rendered text).
+    Content-addressed, so users sharing an image and a template share the render."""
+    digest = hashlib.sha1(f"{position}\n{text}".encode()).hexdigest()[:16]
+    return f"{unique_id}-v{OVERLAY_RENDER_VERSION}-{digest}"
+
+
+async def render_cover(bot, photo_id: str, unique_id: str, overlay: dict, caption: str = ""):
+    """
+    Apply the user's overlay template to their saved cover. Identical (photo, template
+    version, text) combinations reuse the uploaded file_id. Returns (cover, file_id),
+    where cover is a file_id or bytes, or (None, None) when no overlay applies.
+    """
+    if not PILLOW_AVAILABLE or not overlay:
+        return None, None
+    text = overlay_text(overlay.get("text", ""), caption)
+    if not text:
+        return None, None
+
+    position = overlay.get("position", "bottom")
+    key = render_key(unique_id, text, position)
+    cached_id = await asyncio.to_thread(database.get_cached_render, key)
+    if cached_id:
+        metrics.incr("cache.renders.hit")
+        return cached_id, cached_id
+
+    data = read_cached("renders", key)
+    if data is None:
+        original = read_cached("originals", unique_id)
+        if original is None:
+            original = await download_file(bot, photo_id)
+            write_cached("originals", unique_id, original)
+        with metrics.timer("imaging.render"):
+            data = await run_in_pool(render_overlay_bytes, original, text, position)
+        write_cached("renders", key, data)
+
+    file_id, _ = await upload_asset(bot, data, filename=f"{key}.jpg")
+    if file_id:
+        await asyncio.to_thread(database.save_cached_render, key, file_id)
+        return file_id, file_id
+    return data, None
+
+
+def benchmark_renders(count: int = 200, size: tuple = (1280, 720)) -> float:
+    """Render `count` distinct overlays on a synthetic cover in the pool. Returns renders/second"""
+    sample = BytesIO()
+    Image.new("RGB", size, (40, 90, 160)).save(sample, format="JPEG", quality=90)
+    original = sample.getvalue()
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max(1, IMAGE_WORKERS)) as pool:
+        list(pool.map(render_overlay_bytes, [original] * count, [f"Episode {i}" for i in range(count)]))
+    return count / (time.perf_counter() - started)
+
+
+async def benchmark_frames(path: str, count: int = 20, strategy: str = AUTO_COVER_STRATEGY) -> dict:
+    """Extract a frame from `path` `count` times through the bounded decoder pool: throughput and latency"""
+    latencies = []
+
+    async def one() -> None:
+        started = time.perf_counter()
+        await extract_frame(path, strategy)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(count)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "per_second": count / elapsed,
+        "p50_ms": latencies[len(latencies) // 2],
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+    }
+
+
+if __name__ == "__main__":
+    # python imaging.py --bench [renders]
+    # python imaging.py --bench-frames <video> [extractions]
+    if "--bench-frames" in sys.argv:
+        if not ffmpeg_available():
+            sys.exit("ffmpeg is not installed")
+        index = sys.argv.index("--bench-frames")
+        video = sys.argv[index + 1]
+        total = int(sys.argv[index + 2]) if len(sys.argv) > index + 2 else 20
+        result = asyncio.run(benchmark_frames(video, total))
+        print(
+            f"{total} {AUTO_COVER_STRATEGY} frame extractions with {FRAME_WORKERS} decoder(s): "
+            f"{result['per_second']:.1f} frames/s, p50 {result['p50_ms']:.0f}ms, p95 {result['p95_ms']:.0f}ms"
+        )
+    elif "--bench" in sys.argv:
+        if not PILLOW_AVAILABLE:
+            sys.exit("Pillow is not installed")
+        index = sys.argv.index("--bench")
+        total = int(sys.argv[index + 1]) if len(sys.argv) > index + 1 else 200
+        rate = benchmark_renders(total)
+        print(f"{total} overlay renders with {IMAGE_WORKERS} worker(s): {rate:.1f} renders/s")
@@ -0,0 +1,246 @@
+"""
+Update Ingestion for Video Cover Bot
+Deduplicates re-delivered updates, drops stale backlog and processes
+updates concurrently while keeping per-user ordering.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from contextlib import nullcontext
+from datetime import datetime, timezone
+
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop, BaseUpdateProcessor
+
+import database
+from profiles import ProfileLocal
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Number of processed update keys remembered in memory
+DEDUP_WINDOW = int(os.environ.get("DEDUP_WINDOW", "10000"))
+# Seconds between persisting buffered dedup keys
+DEDUP_FLUSH_INTERVAL = float(os.environ.get("DEDUP_FLUSH_INTERVAL", "5"))
+# Ignore messages older than this many minutes (0 = process everything)
+DROP_UPDATES_OLDER_THAN_MINUTES = int(os.environ.get("DROP_UPDATES_OLDER_THAN_MINUTES", "0"))
+# Updates processed concurrently (updates of the same user always run in order)
+UPDATE_CONCURRENCY = int(os.environ.get("UPDATE_CONCURRENCY", "16"))
+
+
+def update_keys(update: Update) -> list:
+    """Identity keys of an update: its update_id plus chat/message id when present"""
+    keys = [f"u:{update.update_id}"]
+    message = update.message or update.channel_post
+    if message:
+        keys.append(f"m:{message.chat_id}:{message.message_id}")
+    return keys
+
+
+class UpdateDeduplicator:
+    """Bounded window of processed update keys, persisted to MongoDB in batches"""
+
+    def __init__(self, window: int = DEDUP_WINDOW):
+        self.window = window
+        self._order = deque()
+        self._seen = set()
+        self._buffer = []
+        self._flush_task = None
+        self.duplicates = 0
+        self.stale = 0
+        self.last_update_id = 0
+
+    def _remember(self, key: str) -> None:
+        self._order.append(key)
+        self._seen.add(key)
+        while len(self._order) > self.window:
+            self._seen.discard(self._order.popleft())
+
+    async def load(self) -> None:
+        """Restore the recent window persisted by the previous process"""
+        keys = await asyncio.to_thread(database.get_recent_update_keys, self.window)
+        for key in reversed(keys):
+            self._remember(key)
+        if keys:
+            logger.info(f"♻️ Loaded {len(keys)} processed update keys")
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    def check_and_mark(self, update: Update) -> bool:
+        """Return True if the update is new (and mark it), False if already processed"""
+        keys = update_keys(update)
+        self.last_update_id = max(self.last_update_id, update.update_id)
+        if any(key in self._seen for key in keys):
+            self.duplicates += 1
+            return False
+        for key in keys:
+            self._remember(key)
+        self._buffer.extend(keys)
+        return True
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(DEDUP_FLUSH_INTERVAL)
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Write buffered keys to the database"""
+        if not self._buffer:
+            return
+        batch, self._buffer = self._buffer, []
+        await asyncio.to_thread(database.mark_updates_processed, batch)
+
+    async def stop(self) -> None:
+        if self._flush_task:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+
+
+class CatchUpTracker:
+    """Measures how long the startup backlog takes to drain"""
+
+    def __init__(self):
+        self.backlog = 0
+        self.processed = 0
+        self.started = None
+        self.drain_seconds = None
+
+    async def start(self, bot) -> None:
+        self.started = time.monotonic()
+        try:
+            info = await bot.get_webhook_info()
+            self.backlog = info.pending_update_count or 0
+        except Exception as e:
+            logger.warning(f"Could not read pending update count: {e}")
+            self.backlog = 0
+        if self.backlog:
+            logger.info(f"📥 Startup backlog: {self.backlog} pending update(s)")
+        else:
+            self.drain_seconds = 0.0
+
+    def seen(self) -> None:
+        if self.drain_seconds is not None:
+            return
+        self.processed += 1
+        if self.processed >= self.backlog:
+            self.drain_seconds = time.monotonic() - self.started
+            logger.info(f"✅ Backlog of {self.backlog} update(s) drained in {self.drain_seconds:.1f}s")
+
+
+# Update ids are per bot, so each bot has its own window and backlog tracker
+deduplicator = ProfileLocal(UpdateDeduplicator)
+catch_up = ProfileLocal(CatchUpTracker)
+
+
+def is_stale(update: Update) -> bool:
+    """True if the message is older than DROP_UPDATES_OLDER_THAN_MINUTES"""
+    if not DROP_UPDATES_OLDER_THAN_MINUTES:
+        return False
+    message = update.message or update.channel_post
+    if not message or not message.date:
+        return False
+    age = datetime.now(timezone.utc) - message.date
+    return age.total_seconds() > DROP_UPDATES_OLDER_THAN_MINUTES * 60
+
+
+async def guard_update(update: Update, context) -> None:
+    """Early handler group: stop duplicate and stale updates before any other handler"""
+    catch_up.seen()
+    if not deduplicator.check_and_mark(update):
+        logger.info(f"🔁 Duplicate update {update.update_id} skipped")
+        raise ApplicationHandlerStop
+    if is_stale(update):
+        deduplicator.stale += 1
+        logger.info(f"⌛ Stale update {update.update_id} dropped")
+        raise ApplicationHandlerStop
+
+
+class UserOrderedUpdateProcessor(BaseUpdateProcessor):
+    """
+    Processes updates concurrently, serialising updates that belong to the same user/chat.
+    An update waits for its user's turn before it takes one of the `max_concurrent`
+    processing slots, so a burst from one user never holds slots other users need.
+    """
+
+    # PTB takes its own semaphore before do_process_update; it is sized so it never
+    # blocks and slots are handed out here instead, after the per-user wait
+    UNBOUNDED = 2 ** 20
+
+    def __init__(self, max_concurrent: int = UPDATE_CONCURRENCY):
+        super().__init__(self.UNBOUNDED)
+        self.max_concurrent = max_concurrent
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._locks = {}
+        self._waiters = {}
+        # Updates running in a slot / waiting for their user's turn or a free slot
+        self.in_flight = 0
+        self.pending = 0
+        # `async def admission(update, backlog) -> bool`; False drops the update
+        # before it waits for anything (see flood.flood_gate)
+        self.admission = None
+        self.rejected = 0
+
+    @staticmethod
+    def ordering_key(update) -> int | None:
+        if not isinstance(update, Update):
+            return None
+        if update.effective_user:
+            return update.effective_user.id
+        if update.effective_chat:
+            return update.effective_chat.id
+        return None
+
+    def backlog(self) -> int:
+        """Updates handed to the processor that are not running yet"""
+        return self.pending
+
+    async def do_process_update(self, update, coroutine) -> None:
+        if self.admission is not None and not await self.admission(update, self.pending):
+            self.rejected += 1
+            # Never started; closing it avoids the "never awaited" warning
+            coroutine.close()
+            return
+        key = self.ordering_key(update)
+        self.pending += 1
+        running = False
+        lock = nullcontext()
+        if key is not None:
+            lock = self._locks.setdefault(key, asyncio.Lock())
+            self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            # asyncio.Lock is FIFO, so the user's updates keep their order
+            async with lock:
+                async with self._slots:
+                    self.pending -= 1
+                    running = True
+                    self.in_flight += 1
+                    try:
+                        await coroutine
+                    finally:
+                        self.in_flight -= 1
+        finally:
+            if not running:
+                self.pending -= 1
+            if key is not None:
+                self._waiters[key] -= 1
+                if not self._waiters[key]:
+                    del self._waiters[key]
+                    del self._locks[key]
+
+    async def wait_idle(self, update_queue, timeout: float, allowed: int = 0) -> bool:
+        """Wait until queued updates are handed out and at most `allowed` handlers run"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if update_queue.empty() and self.pending + self.in_flight <= allowed:
+                return True
+            await asyncio.sleep(0.2)
+        return False
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
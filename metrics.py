@@ -0,0 +1,178 @@
+"""
+Lightweight In-Process Metrics for Video Cover Bot
+Keeps bounded latency windows per metric name, plus cumulative histograms,
+in-flight counts and gauges for the metrics endpoint (exporter.py)
+"""
+
+import time
+import bisect
+import inspect
+import logging
+import threading
+import functools
+import contextvars
+from collections import defaultdict, deque
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Number of recent samples kept per metric
+WINDOW_SIZE = 500
+
+# Histogram bucket upper bounds (seconds)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_samples = defaultdict(lambda: deque(maxlen=WINDOW_SIZE))
+_counts = defaultdict(int)
+_counters = defaultdict(int)
+# name -> [per-bucket counts (last one is +Inf), sum of seconds]
+_histograms = {}
+_in_flight = defaultdict(int)
+_gauges = {}
+# Metrics are also recorded from asyncio.to_thread workers (e.g. database calls)
+_lock = threading.Lock()
+# Name of the innermost `tracked` block, for errors a tracked function handles itself
+_tracking = contextvars.ContextVar("metrics_tracking", default=None)
+
+
+def observe(name: str, seconds: float) -> None:
+    """Record a latency sample (in seconds) for `name`"""
+    with _lock:
+        _samples[name].append(seconds)
+        _counts[name] += 1
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = [[0] * (len(BUCKETS) + 1), 0.0]
+        histogram[0][bisect.bisect_left(BUCKETS, seconds)] += 1
+        histogram[1] += seconds
+
+
+def incr(name: str, amount: int = 1) -> None:
+    """Increment a plain counter"""
+    with _lock:
+        _counters[name] += amount
+
+
+def record_error() -> None:
+    """Count a failure of the current `tracked` call that was caught instead of raised"""
+    name = _tracking.get()
+    if name is not None:
+        incr(f"{name}.errors")
+
+
+def gauge(name: str, read) -> None:
+    """Register a gauge: `read()` is called whenever metrics are exported"""
+    _gauges[name] = read
+
+
+def count(name: str) -> int:
+    return _counters.get(name, 0)
+
+
+def hit_ratio(name: str) -> float | None:
+    """Hit ratio for counters `<name>.hit` / `<name>.miss`, or None without samples"""
+    hits, misses = count(f"{name}.hit"), count(f"{name}.miss")
+    total = hits + misses
+    return hits / total if total else None
+
+
+def summary(name: str) -> dict:
+    """Return count/avg/p50/p95/max (ms) over the recent window for `name`"""
+    window = sorted(_samples.get(name, ()))
+    if not window:
+        return {"count": _counts.get(name, 0), "avg": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+
+    def pct(p: float) -> float:
+        return window[min(len(window) - 1, int(p * len(window)))] * 1000
+
+    return {
+        "count": _counts[name],
+        "avg": sum(window) / len(window) * 1000,
+        "p50": pct(0.50),
+        "p95": pct(0.95),
+        "max": window[-1] * 1000,
+    }
+
+
+def names(prefix: str = "") -> list[str]:
+    """List recorded metric names, optionally filtered by prefix"""
+    return sorted(n for n in _samples if n.startswith(prefix))
+
+
+class timer:
+    """Context manager recording the elapsed time of a block: `with timer("name"): ...`"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = 0.0
+
+    def __enter__(self):
+        self.started = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe(self.name, time.monotonic() - self.started)
+        return False
+
+
+class tracked(timer):
+    """Like `timer`, also counting calls in flight and failures (`<name>.errors`)"""
+
+    def __init__(self, name: str, ignore: tuple = ()):
+        super().__init__(name)
+        self.ignore = ignore
+
+    def __enter__(self):
+        with _lock:
+            _in_flight[self.name] += 1
+        self._token = _tracking.set(self.name)
+        return super().__enter__()
+
+    def __exit__(self, exc_type, exc, tb):
+        _tracking.reset(self._token)
+        with _lock:
+            _in_flight[self.name] -= 1
+        if exc_type is not None and issubclass(exc_type, Exception) and not issubclass(exc_type, self.ignore):
+            incr(f"{self.name}.errors")
+        return super().__exit__(exc_type, exc, tb)
+
+
+def instrument(name: str, func, ignore: tuple = ()):
+    """Wrap a function (sync or async) so every call is `tracked` under `name`"""
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with tracked(name, ignore):
+                return await func(*args, **kwargs)
+    else:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracked(name, ignore):
+                return func(*args, **kwargs)
+    return wrapper
+
+
+def snapshot() -> dict:
+    """Everything the metrics endpoint exports, as plain values"""
+    gauges = {}
+    for name, read in list(_gauges.items()):
+        try:
+            gauges[name] = float(read())
+        except Exception as e:
+            logger.debug(f"Gauge {name} failed: {e}")
+    caches = {}
+    for name in list(_counters):
+        if name.endswith((".hit", ".miss")):
+            cache = name.rsplit(".", 1)[0]
+            caches[cache] = hit_ratio(cache)
+    with _lock:
+        histograms = {name: (list(counts), total) for name, (counts, total) in _histograms.items()}
+        counters = dict(_counters)
+        in_flight = dict(_in_flight)
+    return {
+        "histograms": histograms,
+        "counters": counters,
+        "in_flight": in_flight,
+        "gauges": gauges,
+        "cache_hit_ratio": caches,
+    }
@@ -0,0 +1,113 @@
+"""
+Bot Profiles for Video Cover Bot
+Runs several bot tokens in one process. Each profile carries its token and
+branding; per-bot state is resolved through the profile active in the
+current task, while the database client, caches and pools stay shared.
+"""
+
+import os
+import json
+import logging
+import contextvars
+
+from config import config
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# JSON list of profiles: [{"name": "main", "token": "...", "force_sub_channel_id": "...", ...}]
+BOT_PROFILES_FILE = os.environ.get("BOT_PROFILES_FILE")
+MONGODB_DATABASE = os.environ.get("MONGODB_DATABASE", "video_cover_bot")
+
+
+class BotProfile:
+    """Token, branding and database of one bot; unset fields fall back to the environment"""
+
+    def __init__(self, name: str, token: str, database: str = None, force_sub_channel_id: str = None,
+                 force_sub_banner_url: str = None, home_menu_banner_url: str = None,
+                 log_channel_id: str = None, asset_channel_id: str = None, rate_limit_per_second: float = None):
+        self.name = name
+        self.token = token
+        # file_ids are only valid for the bot that received them, so each bot keeps its own database
+        self.database = database or MONGODB_DATABASE
+        self.force_sub_channel_id = force_sub_channel_id or os.environ.get("FORCE_SUB_CHANNEL_ID")
+        self.force_sub_banner_url = force_sub_banner_url or os.environ.get("FORCE_SUB_BANNER_URL")
+        self.home_menu_banner_url = home_menu_banner_url or os.environ.get("HOME_MENU_BANNER_URL")
+        self.log_channel_id = log_channel_id or os.environ.get("LOG_CHANNEL_ID")
+        # Chat where derived assets are uploaded once to obtain a reusable file_id
+        self.asset_channel_id = asset_channel_id or os.environ.get("ASSET_CHANNEL_ID") or self.log_channel_id
+        self.rate_limit_per_second = rate_limit_per_second
+
+    def __repr__(self) -> str:
+        return f"BotProfile({self.name!r})"
+
+
+def load_profiles() -> list:
+    """Profiles from BOT_PROFILES_FILE, or a single profile built from BOT_TOKEN"""
+    if not BOT_PROFILES_FILE:
+        token = getattr(config, "BOT_TOKEN", None) or os.environ.get("BOT_TOKEN")
+        return [BotProfile("main", token)] if token else []
+
+    with open(BOT_PROFILES_FILE, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+
+    profiles = []
+    for index, entry in enumerate(entries):
+        name = entry.get("name") or f"bot{index + 1}"
+        # The first profile keeps the configured database so single-bot data carries over
+        entry.setdefault("database", MONGODB_DATABASE if index == 0 else f"{MONGODB_DATABASE}_{name}")
+        entry["name"] = name
+        profiles.append(BotProfile(**entry))
+    logger.info(f"🤖 Loaded {len(profiles)} bot profile(s): {', '.join(p.name for p in profiles)}")
+    return profiles
+
+
+PROFILES = load_profiles()
+
+_active = contextvars.ContextVar("bot_profile", default=None)
+
+
+def current_profile() -> BotProfile:
+    """Profile of the bot whose update/task is running (the first profile outside any bot)"""
+    return _active.get() or (PROFILES[0] if PROFILES else BotProfile("main", None))
+
+
+def activate(profile: BotProfile) -> None:
+    """Make `profile` current for this task and every task it creates"""
+    _active.set(profile)
+
+
+class ProfileLocal:
+    """
+    Attribute proxy to a per-bot object: `factory()` is called once per profile and
+    attribute access is forwarded to the instance of the current profile.
+    """
+
+    def __init__(self, factory):
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_instances", {})
+
+    def current(self):
+        name = current_profile().name
+        instances = object.__getattribute__(self, "_instances")
+        if name not in instances:
+            instances[name] = object.__getattribute__(self, "_factory")()
+        return instances[name]
+
+    def all(self) -> list:
+        return list(object.__getattribute__(self, "_instances").values())
+
+    def __getattr__(self, attr):
+        return getattr(self.current(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self.current(), attr, value)
+
+    def __contains__(self, item) -> bool:
+        return item in self.current()
+
+    def __iter__(self):
+        return iter(self.current())
+
+    def __len__(self) -> int:
+        return len(self.current())
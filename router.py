@@ -0,0 +1,91 @@
+"""
+Callback Router for Video Cover Bot
+Maps callback_data to handlers through a dict of exact routes and a
+longest-prefix table, so dispatch cost does not grow with the number of screens.
+"""
+
+import time
+import logging
+import functools
+
+import metrics
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+
+class CallbackRouter:
+    """
+    Register handlers with `@router.route("data")` (exact) or
+    `@router.route("prefix_", prefix=True)`. Handlers are `async def handler(update, context)`.
+    """
+
+    def __init__(self):
+        self._exact = {}
+        self._prefixes = {}
+        # Distinct prefix lengths, longest first: at most one dict lookup per length
+        self._prefix_lengths = []
+        self.dispatched = 0
+        self.unknown = 0
+
+    def route(self, data: str, prefix: bool = False):
+        def register(handler):
+            table = self._prefixes if prefix else self._exact
+            if data in table:
+                raise ValueError(f"Callback route {data!r} registered twice")
+            table[data] = handler
+            if prefix:
+                self._prefix_lengths = sorted({len(p) for p in self._prefixes}, reverse=True)
+            return handler
+        return register
+
+    def resolve(self, data: str):
+        """(handler, route) for callback data, or (None, None)"""
+        handler = self._exact.get(data)
+        if handler:
+            return handler, data
+        for length in self._prefix_lengths:
+            key = data[:length]
+            handler = self._prefixes.get(key)
+            if handler:
+                return handler, key + "*"
+        return None, None
+
+    async def dispatch(self, update, context) -> None:
+        """CallbackQueryHandler callback"""
+        query = update.callback_query
+        if not query or not query.data:
+            return
+
+        handler, route = self.resolve(query.data)
+        if handler is None:
+            self.unknown += 1
+            metrics.incr("callbacks.unknown")
+            logger.warning(f"⚠️ Unknown callback: {query.data}")
+            try:
+                await query.answer("Unknown action", show_alert=False)
+            except Exception:
+                pass
+            return
+
+        self.dispatched += 1
+        logger.debug(f"🔵 Callback {query.data} from {query.from_user.id}")
+        started = time.monotonic()
+        try:
+            await handler(update, context)
+        finally:
+            metrics.observe(f"callback.{route}", time.monotonic() - started)
+
+
+def require(check, denial: str):
+    """Decorator for callback handlers: answer with `denial` unless `check(user_id)` passes"""
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def guarded(update, context):
+            query = update.callback_query
+            if not check(query.from_user.id):
+                await query.answer(denial, show_alert=True)
+                return
+            return await handler(update, context)
+        return guarded
+    return decorator
@@ -0,0 +1,197 @@
+"""
+Priority-Aware Outbound Scheduler for Video Cover Bot
+Plugs into python-telegram-bot as a rate limiter so every Bot API call
+is admitted by priority class: interactive > cover > background.
+"""
+
+import os
+import time
+import asyncio
+import logging
+import contextvars
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+import metrics
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Overall outbound budget (Telegram allows ~30 messages/second per bot)
+RATE_LIMIT_PER_SECOND = float(os.environ.get("RATE_LIMIT_PER_SECOND", "25"))
+# Share of the budget that only interactive replies may use
+INTERACTIVE_RESERVED_SHARE = float(os.environ.get("INTERACTIVE_RESERVED_SHARE", "0.3"))
+RATE_LIMIT_MAX_RETRIES = int(os.environ.get("RATE_LIMIT_MAX_RETRIES", "3"))
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_COVER = 1
+PRIORITY_BACKGROUND = 2
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_COVER: "cover",
+    PRIORITY_BACKGROUND: "background",
+}
+PRIORITY_BY_NAME = {name: level for level, name in PRIORITY_NAMES.items()}
+
+# Calls that don't count against the message budget
+UNLIMITED_ENDPOINTS = {"getUpdates", "getMe", "setMyCommands", "getFile", "getWebhookInfo", "deleteWebhook", "setWebhook"}
+
+# Convenience kwargs for tagging calls: bot.send_message(..., **BACKGROUND)
+COVER = {"rate_limit_args": {"priority": "cover"}}
+BACKGROUND = {"rate_limit_args": {"priority": "background"}}
+
+# Priority of the API call being sent, readable by the request layer (transport picks a pool by it)
+current_priority = contextvars.ContextVar("request_priority", default=PRIORITY_INTERACTIVE)
+
+
+class TokenBucket:
+    """Simple token bucket refilled continuously at `rate` tokens/second"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = max(rate, 0.1)
+        self.capacity = capacity or max(self.rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self, amount: float = 1) -> bool:
+        self.refill()
+        return self.tokens >= amount
+
+    def take(self, amount: float = 1) -> None:
+        self.tokens -= amount
+
+
+class PriorityRateLimiter(BaseRateLimiter):
+    """
+    Admits requests from the highest waiting priority class first.
+    Non-interactive classes also draw from a smaller bucket, so a share of the
+    budget stays reserved for interactive traffic even during broadcasts.
+    """
+
+    def __init__(self, rate: float = RATE_LIMIT_PER_SECOND, reserved_share: float = INTERACTIVE_RESERVED_SHARE,
+                 max_retries: int = RATE_LIMIT_MAX_RETRIES):
+        self.rate = rate
+        self.reserved_share = min(max(reserved_share, 0.0), 0.9)
+        self.max_retries = max_retries
+        self.global_bucket = TokenBucket(rate)
+        self.shared_bucket = TokenBucket(rate * (1 - self.reserved_share))
+        self.waiting = {level: 0 for level in PRIORITY_NAMES}
+        self.admitted = {level: 0 for level in PRIORITY_NAMES}
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    @staticmethod
+    def classify(rate_limit_args) -> int:
+        """Map rate_limit_args ({"priority": "cover"} or an int) to a priority level"""
+        if isinstance(rate_limit_args, dict):
+            value = rate_limit_args.get("priority", PRIORITY_INTERACTIVE)
+        else:
+            value = rate_limit_args
+        if isinstance(value, str):
+            return PRIORITY_BY_NAME.get(value, PRIORITY_INTERACTIVE)
+        if isinstance(value, int) and value in PRIORITY_NAMES:
+            return value
+        return PRIORITY_INTERACTIVE
+
+    async def _acquire(self, priority: int) -> None:
+        started = time.monotonic()
+        self.waiting[priority] += 1
+        try:
+            while True:
+                higher_waiting = any(self.waiting[level] for level in PRIORITY_NAMES if level < priority)
+                if not higher_waiting and self.global_bucket.available():
+                    if priority == PRIORITY_INTERACTIVE:
+                        break
+                    if self.shared_bucket.available():
+                        self.shared_bucket.take()
+                        break
+                await asyncio.sleep(1 / self.global_bucket.rate)
+            self.global_bucket.take()
+        finally:
+            self.waiting[priority] -= 1
+        self.admitted[priority] += 1
+        metrics.observe(f"scheduler.wait.{PRIORITY_NAMES[priority]}", time.monotonic() - started)
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        priority = self.classify(rate_limit_args)
+        if endpoint not in UNLIMITED_ENDPOINTS:
+            await self._acquire(priority)
+        token = current_priority.set(priority)
+        try:
+            retries = 0
+            while True:
+                try:
+                    return await callback(*args, **kwargs)
+                except RetryAfter as e:
+                    if retries >= self.max_retries:
+                        raise
+                    retries += 1
+                    retry_after = e.retry_after
+                    delay = float(getattr(retry_after, "total_seconds", lambda: retry_after)())
+                    logger.warning(f"⏳ Flood control on {endpoint}: sleeping {delay}s (retry {retries})")
+                    await asyncio.sleep(delay + 0.1)
+        finally:
+            current_priority.reset(token)
+
+    def stats(self) -> dict:
+        """Per-class queue length, admitted count and wait times (ms)"""
+        result = {}
+        for level, name in PRIORITY_NAMES.items():
+            wait = metrics.summary(f"scheduler.wait.{name}")
+            result[name] = {
+                "waiting": self.waiting[level],
+                "admitted": self.admitted[level],
+                "avg_wait": wait["avg"],
+                "p95_wait": wait["p95"],
+            }
+        return result
+
+
+"""═══════════════════ BACKGROUND TASKS ═══════════════════"""
+
+_background_tasks = set()
+
+
+def spawn(coro) -> asyncio.Task:
+    """Run a coroutine in the background, keeping a reference until it finishes"""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+async def fan_out(*aws, label: str = "fan-out") -> list:
+    """
+    Await independent calls concurrently. A failure is logged and returned in
+    place of its result; it neither cancels nor fails the other calls.
+    """
+    results = await asyncio.gather(*aws, return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            logger.warning(f"⚠️ {label}: {type(result).__name__}: {result}")
+    return results
+
+
+def pending_background_tasks() -> int:
+    return len(_background_tasks)
+
+
+async def drain_background_tasks(timeout: float) -> bool:
+    """Wait for background tasks (log sends, broadcasts) to finish. Returns True if all finished"""
+    if not _background_tasks:
+        return True
+    done, pending = await asyncio.wait(set(_background_tasks), timeout=timeout)
+    if pending:
+        logger.warning(f"⚠️ {len(pending)} background task(s) still running after {timeout:.0f}s")
+    return not pending
@@ -0,0 +1,171 @@
+"""
+Prerendered Screens for Video Cover Bot
+Menu screens are parsed from HTML into plain text + entities once at startup,
+and a callback edit is skipped when the message already shows the screen
+(Telegram would only answer "message is not modified").
+"""
+
+import logging
+from html.parser import HTMLParser
+
+from telegram import MessageEntity
+from telegram.error import BadRequest
+
+import metrics
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# HTML tags the screens use -> entity types
+TAG_ENTITIES = {
+    "b": MessageEntity.BOLD,
+    "strong": MessageEntity.BOLD,
+    "i": MessageEntity.ITALIC,
+    "em": MessageEntity.ITALIC,
+    "u": MessageEntity.UNDERLINE,
+    "s": MessageEntity.STRIKETHROUGH,
+    "code": MessageEntity.CODE,
+    "pre": MessageEntity.PRE,
+    "a": MessageEntity.TEXT_LINK,
+}
+# Entities Telegram adds on its own (commands, links, mentions) are not part of a screen
+FORMATTING_ENTITIES = frozenset(TAG_ENTITIES.values())
+
+
+def utf16_len(text: str) -> int:
+    """Entity offsets and lengths count UTF-16 code units (emoji count twice)"""
+    return len(text.encode("utf-16-le")) // 2
+
+
+class _EntityParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.position = 0
+        self.open = []
+        self.entities = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in TAG_ENTITIES:
+            self.open.append((tag, self.position, dict(attrs).get("href")))
+
+    def handle_endtag(self, tag):
+        for index in range(len(self.open) - 1, -1, -1):
+            if self.open[index][0] == tag:
+                _, start, url = self.open.pop(index)
+                if self.position > start:
+                    self.entities.append(MessageEntity(
+                        type=TAG_ENTITIES[tag], offset=start, length=self.position - start, url=url
+                    ))
+                return
+
+    def handle_data(self, data):
+        self.parts.append(data)
+        self.position += utf16_len(data)
+
+
+def render_html(html: str) -> tuple[str, tuple]:
+    """Parse the bot's HTML markup into (text, entities), as Telegram would"""
+    parser = _EntityParser()
+    parser.feed(html)
+    parser.close()
+    entities = sorted(parser.entities, key=lambda e: (e.offset, -e.length))
+    return "".join(parser.parts), tuple(entities)
+
+
+def _digest(text: str, entities, markup) -> int:
+    return hash((text, tuple(entities), markup))
+
+
+class Screen:
+    """A rendered screen: plain text, entities and keyboard, plus their digest"""
+
+    __slots__ = ("name", "text", "entities", "markup", "digest")
+
+    def __init__(self, name: str, html: str, markup=None):
+        self.name = name
+        self.text, self.entities = render_html(html)
+        self.markup = markup
+        self.digest = _digest(self.text, self.entities, markup)
+
+
+def shown_digest(message) -> int | None:
+    """Digest of what a message currently shows (the message of a callback query is always current)"""
+    text = getattr(message, "caption", None) or getattr(message, "text", None)
+    if text is None:
+        return None
+    entities = getattr(message, "caption_entities", None) or getattr(message, "entities", None) or ()
+    entities = tuple(e for e in entities if e.type in FORMATTING_ENTITIES)
+    return _digest(text, entities, getattr(message, "reply_markup", None))
+
+
+class ScreenRegistry:
+    """Screens by name, rendered once when registered"""
+
+    def __init__(self):
+        self._screens = {}
+        self.edits = 0
+        self.unchanged = 0
+
+    def add(self, name: str, html: str, markup=None) -> Screen:
+        screen = Screen(name, html, markup)
+        self._screens[name] = screen
+        return screen
+
+    def __getitem__(self, name: str) -> Screen:
+        return self._screens[name]
+
+    def __len__(self) -> int:
+        return len(self._screens)
+
+    async def edit(self, message, screen: Screen) -> bool:
+        """
+        Show `screen` in `message` (caption for photos, text otherwise).
+        Returns False when the message already showed it and no request was made.
+        """
+        if shown_digest(message) == screen.digest:
+            self.unchanged += 1
+            metrics.incr("screens.unchanged")
+            return False
+        try:
+            if getattr(message, "photo", None):
+                await message.edit_caption(
+                    caption=screen.text, caption_entities=screen.entities, reply_markup=screen.markup
+                )
+            else:
+                await message.edit_text(
+                    screen.text, entities=screen.entities, reply_markup=screen.markup
+                )
+        except BadRequest as e:
+            if "not modified" not in str(e):
+                raise
+            # Our digest disagreed with Telegram's rendering; nothing to do either way
+            logger.debug(f"Screen '{screen.name}' was already shown: {e}")
+            self.unchanged += 1
+            metrics.incr("screens.unchanged")
+            return False
+        self.edits += 1
+        metrics.incr("screens.edits")
+        return True
+
+    async def reply(self, message, screen: Screen, photo=None):
+        """Send `screen` as a new message in reply to `message`, with `photo` as banner if given"""
+        if photo is not None:
+            return await message.reply_photo(
+                photo=photo, caption=screen.text, caption_entities=screen.entities, reply_markup=screen.markup
+            )
+        return await message.reply_text(screen.text, entities=screen.entities, reply_markup=screen.markup)
+
+    async def send(self, bot, chat_id: int, screen: Screen, photo=None):
+        """Send `screen` to a chat, with `photo` as banner if given"""
+        if photo is not None:
+            return await bot.send_photo(
+                chat_id=chat_id, photo=photo, caption=screen.text,
+                caption_entities=screen.entities, reply_markup=screen.markup
+            )
+        return await bot.send_message(
+            chat_id=chat_id, text=screen.text, entities=screen.entities, reply_markup=screen.markup
+        )
+
+
+screens = ScreenRegistry()
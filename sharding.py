@@ -0,0 +1,309 @@
+"""
+Multi-Process Update Sharding for Video Cover Bot
+One receiver process polls Telegram and hands each update to one of K worker
+processes, chosen by user/chat id, so per-user ordering holds while handler
+work spreads across CPU cores.
+
+    python sharding.py --bench [updates] [max_workers] [work_ms]
+"""
+
+import os
+import sys
+import time
+import queue
+import signal
+import asyncio
+import logging
+import multiprocessing
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Worker processes (0 or 1 = classic single-process polling)
+SHARD_WORKERS = int(os.environ.get("SHARD_WORKERS", "0"))
+# Long-poll timeout of the receiver (seconds)
+SHARD_POLL_TIMEOUT = int(os.environ.get("SHARD_POLL_TIMEOUT", "10"))
+# Seconds to wait for workers to finish on shutdown
+SHARD_STOP_TIMEOUT = float(os.environ.get("SHARD_STOP_TIMEOUT", "30"))
+
+# Workers are started fresh: forking a process holding a MongoClient and an event loop is unsafe
+_mp = multiprocessing.get_context("spawn")
+
+# Number of workers in the group when this process is a shard worker (0 otherwise)
+worker_count = 0
+
+
+def shard_for(update, workers: int) -> int:
+    """Worker index of an update: same user/chat -> same worker, so their updates stay ordered"""
+    from ingest import UserOrderedUpdateProcessor
+
+    key = UserOrderedUpdateProcessor.ordering_key(update)
+    if key is None:
+        key = update.update_id
+    return abs(key) % workers
+
+
+def shard_rate(rate: float, workers: int = None) -> float:
+    """Outbound API budget of one worker: the workers share the bot token, so they split its rate"""
+    workers = worker_count if workers is None else workers
+    return rate / workers if workers > 1 else rate
+
+
+"""═══════════════════ WORKER ═══════════════════"""
+
+
+def worker_main(build, index: int, workers: int, updates, control) -> None:
+    """Worker process entry point: a full bot without its own polling"""
+    asyncio.run(serve_shard(build, index, workers, updates, control))
+
+
+async def serve_shard(build, index: int, workers: int, updates, control) -> None:
+    """`build` is bot.build_application, passed by reference so the bot module is imported once"""
+    global worker_count
+    from telegram import Update
+    from profiles import PROFILES
+    from shutdown import coordinator
+    from exporter import metrics_server
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    # /restart in any worker restarts the whole group through the receiver
+    coordinator.reexec_handler = lambda: control.put(("restart", index))
+    if metrics_server.port:
+        # Each worker process serves its own metrics, on the ports after METRICS_PORT
+        metrics_server.port += index + 1
+    # Read by shard_rate() when build() creates the rate limiter
+    worker_count = workers
+
+    app = build(PROFILES[0], polling=False)
+
+    async def pump() -> None:
+        while not stop.is_set():
+            try:
+                data = await asyncio.to_thread(updates.get, True, 1.0)
+            except queue.Empty:
+                continue
+            if data is None:
+                stop.set()
+                return
+            await app.update_queue.put(Update.de_json(data, app.bot))
+
+    async with app:
+        await app.post_init(app)
+        await app.start()
+        logger.info(f"⚙️ Shard worker {index} started (pid {os.getpid()})")
+        reader = asyncio.create_task(pump())
+        await stop.wait()
+        reader.cancel()
+        await app.stop()
+    await app.post_shutdown(app)
+    logger.info(f"✅ Shard worker {index} stopped")
+
+
+"""═══════════════════ RECEIVER ═══════════════════"""
+
+
+class ShardSupervisor:
+    """Owns the worker processes and their update queues; respawns workers that die"""
+
+    def __init__(self, workers: int, build):
+        self.build = build
+        self.control = _mp.Queue()
+        self.queues = [_mp.Queue() for _ in range(workers)]
+        self.processes = [None] * workers
+        self.dispatched = [0] * workers
+
+    def start(self) -> None:
+        for index in range(len(self.queues)):
+            self._spawn(index)
+
+    def _spawn(self, index: int) -> None:
+        process = _mp.Process(
+            target=worker_main,
+            args=(self.build, index, len(self.queues), self.queues[index], self.control),
+            name=f"shard-{index}",
+        )
+        process.start()
+        self.processes[index] = process
+
+    def check(self) -> None:
+        for index, process in enumerate(self.processes):
+            if process is not None and not process.is_alive():
+                logger.error(f"❌ Shard worker {index} exited ({process.exitcode}) - respawning")
+                self._spawn(index)
+
+    def dispatch(self, update) -> None:
+        index = shard_for(update, len(self.queues))
+        self.queues[index].put(update.to_dict())
+        self.dispatched[index] += 1
+
+    def restart_requested(self) -> bool:
+        try:
+            message = self.control.get_nowait()
+        except queue.Empty:
+            return False
+        logger.info(f"🔄 Restart requested by shard worker {message[1]}")
+        return message[0] == "restart"
+
+    def stop(self) -> None:
+        for shard_queue in self.queues:
+            shard_queue.put(None)
+        deadline = time.monotonic() + SHARD_STOP_TIMEOUT
+        for process in self.processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                logger.warning(f"⚠️ {process.name} did not stop in time - terminating")
+                process.terminate()
+
+
+async def receive(profile, supervisor: ShardSupervisor, allowed_updates: list, drop_pending: bool) -> bool:
+    """Poll getUpdates and dispatch to the shards until stopped. Returns True if a restart was requested"""
+    from telegram.error import NetworkError
+    from telegram.ext import ApplicationBuilder
+    import botapi
+    import transport
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    builder = transport.configure(botapi.configure(ApplicationBuilder().token(profile.token)))
+    bot = builder.updater(None).build().bot
+    restart = False
+    async with bot:
+        offset = None
+        if drop_pending:
+            await bot.delete_webhook(drop_pending_updates=True)
+        logger.info(f"📡 Receiver polling for {len(supervisor.queues)} shard worker(s)")
+        while not stop.is_set():
+            if supervisor.restart_requested():
+                restart = True
+                break
+            supervisor.check()
+            try:
+                updates = await bot.get_updates(
+                    offset=offset, timeout=SHARD_POLL_TIMEOUT, allowed_updates=allowed_updates
+                )
+            except NetworkError as e:
+                logger.warning(f"⚠️ getUpdates failed: {e}")
+                await asyncio.sleep(1)
+                continue
+            for update in updates:
+                offset = update.update_id + 1
+                supervisor.dispatch(update)
+        # Acknowledge everything dispatched so it is not fetched again
+        if offset:
+            await bot.get_updates(offset=offset, timeout=0, limit=1)
+    return restart
+
+
+def run_sharded(build, profile, workers: int, allowed_updates: list, drop_pending: bool = False) -> None:
+    """Receiver process: start K workers, poll and dispatch, re-exec on /restart"""
+    supervisor = ShardSupervisor(workers, build)
+    supervisor.start()
+    try:
+        restart = asyncio.run(receive(profile, supervisor, allowed_updates, drop_pending))
+    finally:
+        supervisor.stop()
+    logger.info(f"📊 Updates dispatched per shard: {supervisor.dispatched}")
+    if restart:
+        logger.info("🔄 Re-executing receiver process...")
+        logging.shutdown()
+        os.execv(sys.executable, [sys.executable] + sys.argv)
+
+
+"""═══════════════════ BENCHMARK ═══════════════════"""
+
+
+def _bench_update(update_id: int, users: int) -> dict:
+    user_id = 1000 + update_id % users
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "bench"},
+            "text": "/start",
+        },
+    }
+
+
+def _bench_worker(updates, results, work_ms: float, api_rate: float) -> None:
+    """Parse each update, burn `work_ms` of CPU (standing in for handler work) and make one reply if the budget allows"""
+    from telegram import Update
+    from scheduler import TokenBucket
+
+    bucket = TokenBucket(api_rate)
+    handled = 0
+    sent = 0
+    while True:
+        data = updates.get()
+        if data is None:
+            break
+        Update.de_json(data, None)
+        deadline = time.perf_counter() + work_ms / 1000
+        while time.perf_counter() < deadline:
+            pass
+        if bucket.available():
+            bucket.take()
+            sent += 1
+        handled += 1
+    results.put((handled, sent))
+
+
+def benchmark(total: int = 5000, max_workers: int = None, work_ms: float = 2.0, users: int = 500) -> list:
+    """
+    Measure updates/second through the receiver -> shard pipeline for K = 1..max_workers,
+    and the Bot API calls/second the K workers make together within their split budget
+    """
+    from telegram import Update
+    from scheduler import RATE_LIMIT_PER_SECOND
+
+    max_workers = max_workers or os.cpu_count() or 1
+    payloads = [_bench_update(i, users) for i in range(total)]
+    rows = []
+    for workers in range(1, max_workers + 1):
+        queues = [_mp.Queue() for _ in range(workers)]
+        results = _mp.Queue()
+        api_rate = shard_rate(RATE_LIMIT_PER_SECOND, workers)
+        processes = [
+            _mp.Process(target=_bench_worker, args=(queues[i], results, work_ms, api_rate)) for i in range(workers)
+        ]
+        for process in processes:
+            process.start()
+
+        started = time.perf_counter()
+        for data in payloads:
+            update = Update.de_json(data, None)
+            queues[shard_for(update, workers)].put(data)
+        for shard_queue in queues:
+            shard_queue.put(None)
+        counts = [results.get() for _ in processes]
+        handled = sum(c[0] for c in counts)
+        sent = sum(c[1] for c in counts)
+        elapsed = time.perf_counter() - started
+        for process in processes:
+            process.join()
+
+        rate = handled / elapsed
+        api = sent / elapsed
+        rows.append((workers, rate, api))
+        print(
+            f"K={workers:<3} {rate:8.0f} updates/s  x{rate / rows[0][1]:.2f}  "
+            f"API {api:5.1f}/s (budget {RATE_LIMIT_PER_SECOND:g}/s, {api_rate:.1f}/s per worker)"
+        )
+    return rows
+
+
+if __name__ == "__main__":
+    if "--bench" in sys.argv:
+        args = [float(a) for a in sys.argv[sys.argv.index("--bench") + 1:]]
+        benchmark(
+            total=int(args[0]) if len(args) > 0 else 5000,
+            max_workers=int(args[1]) if len(args) > 1 else None,
+            work_ms=args[2] if len(args) > 2 else 2.0,
+        )
@@ -0,0 +1,75 @@
+"""
+Graceful Shutdown Coordinator for Video Cover Bot
+Stops intake, drains in-flight work within a deadline, then re-execs the process.
+"""
+
+import os
+import sys
+import time
+import logging
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for in-flight work before restarting anyway
+SHUTDOWN_DRAIN_TIMEOUT = float(os.environ.get("SHUTDOWN_DRAIN_TIMEOUT", "30"))
+
+
+class ShutdownCoordinator:
+    """
+    Runs registered drain steps in order, sharing one deadline.
+    Each step is `async def step(timeout: float) -> bool` returning True when fully drained.
+    """
+
+    def __init__(self, timeout: float = SHUTDOWN_DRAIN_TIMEOUT):
+        self.timeout = timeout
+        self.draining = False
+        self._steps = []
+        self._applications = []
+        # Set by a supervising process (sharded mode) to restart the whole group instead
+        self.reexec_handler = None
+
+    def add_application(self, app) -> None:
+        """Track an application whose polling is stopped when draining starts"""
+        self._applications.append(app)
+
+    def register(self, name: str, step) -> None:
+        """Add a drain step; steps run in registration order"""
+        self._steps.append((name, step))
+
+    async def drain(self, app) -> dict:
+        """Stop receiving updates, then run every drain step. Returns {step: drained}"""
+        self.draining = True
+        deadline = time.monotonic() + self.timeout
+        report = {}
+
+        # Stop accepting new updates (on every bot in this process); unfetched updates stay on Telegram's side
+        for application in self._applications or [app]:
+            try:
+                if application.updater and application.updater.running:
+                    await application.updater.stop()
+                    logger.info("🛑 Polling stopped - draining in-flight work")
+            except Exception as e:
+                logger.error(f"❌ Error stopping updater: {e}")
+
+        for name, step in self._steps:
+            remaining = max(0.0, deadline - time.monotonic())
+            try:
+                report[name] = bool(await step(remaining))
+            except Exception as e:
+                logger.error(f"❌ Drain step '{name}' failed: {e}")
+                report[name] = False
+            logger.info(f"{'✅' if report[name] else '⚠️'} Drain step '{name}' finished")
+        return report
+
+    def reexec(self) -> None:
+        """Replace the current process with a fresh interpreter running the same command"""
+        if self.reexec_handler:
+            self.reexec_handler()
+            return
+        logger.info("🔄 Re-executing bot process...")
+        logging.shutdown()
+        os.execv(sys.executable, [sys.executable] + sys.argv)
+
+
+coordinator = ShutdownCoordinator()
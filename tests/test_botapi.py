@@ -0,0 +1,164 @@
+"""
+Compatibility tests for botapi.py against a stub Bot API server
+(a local HTTP server that answers getMe like telegram-bot-api does)
+"""
+
+import os
+import sys
+import json
+import asyncio
+import tempfile
+import threading
+import unittest
+import importlib.util
+from types import SimpleNamespace
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import botapi  # noqa: E402
+
+TOKEN = "123456:TEST-token"
+TELEGRAM_INSTALLED = importlib.util.find_spec("telegram") is not None
+
+
+class StubBotAPI(BaseHTTPRequestHandler):
+    """Answers /bot<token>/getMe for TOKEN and 401 for any other token"""
+
+    requests = []
+
+    def _answer(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        StubBotAPI.requests.append(self.path)
+        if self.path == f"/bot{TOKEN}/getMe":
+            status, body = 200, {"ok": True, "result": {
+                "id": 123456, "is_bot": True, "first_name": "Cover Bot", "username": "cover_test_bot",
+                "can_join_groups": True, "can_read_all_group_messages": False, "supports_inline_queries": True,
+            }}
+        else:
+            status, body = 401, {"ok": False, "error_code": 401, "description": "Unauthorized"}
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = _answer
+    do_POST = _answer
+
+    def log_message(self, format, *args):
+        pass
+
+
+class RecordingBuilder:
+    """Stands in for ApplicationBuilder and records the endpoint settings applied to it"""
+
+    def __init__(self):
+        self.calls = {}
+
+    def base_url(self, url):
+        self.calls["base_url"] = url
+        return self
+
+    def base_file_url(self, url):
+        self.calls["base_file_url"] = url
+        return self
+
+    def local_mode(self, enabled):
+        self.calls["local_mode"] = enabled
+        return self
+
+
+class ConfigureTest(unittest.TestCase):
+    def test_default_endpoint_leaves_builder_untouched(self):
+        with mock.patch.multiple(botapi, BOT_API_BASE_URL="", BOT_API_BASE_FILE_URL="", BOT_API_LOCAL_MODE=False):
+            builder = botapi.configure(RecordingBuilder())
+        self.assertEqual(builder.calls, {})
+
+    def test_local_server_settings_are_applied(self):
+        with mock.patch.multiple(
+            botapi,
+            BOT_API_BASE_URL="http://127.0.0.1:8081/bot",
+            BOT_API_BASE_FILE_URL="http://127.0.0.1:8081/file/bot",
+            BOT_API_LOCAL_MODE=True,
+        ):
+            builder = botapi.configure(RecordingBuilder())
+        self.assertEqual(builder.calls, {
+            "base_url": "http://127.0.0.1:8081/bot",
+            "base_file_url": "http://127.0.0.1:8081/file/bot",
+            "local_mode": True,
+        })
+
+
+class LocalPathTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        os.makedirs(os.path.join(self.directory.name, TOKEN, "videos"))
+        self.local_file = os.path.join(self.directory.name, TOKEN, "videos", "file_1.mp4")
+        with open(self.local_file, "wb") as f:
+            f.write(b"\x00")
+
+    def test_cloud_mode_always_downloads(self):
+        with mock.patch.object(botapi, "BOT_API_LOCAL_MODE", False):
+            self.assertIsNone(botapi.local_path(SimpleNamespace(file_path=self.local_file)))
+
+    def test_local_mode_reads_the_server_path(self):
+        with mock.patch.multiple(botapi, BOT_API_LOCAL_MODE=True, BOT_API_SERVER_DIR="", BOT_API_LOCAL_DIR=""):
+            self.assertEqual(botapi.local_path(SimpleNamespace(file_path=self.local_file)), self.local_file)
+
+    def test_server_dir_is_mapped_to_the_local_mount(self):
+        server_path = f"/var/lib/telegram-bot-api/{TOKEN}/videos/file_1.mp4"
+        with mock.patch.multiple(
+            botapi,
+            BOT_API_LOCAL_MODE=True,
+            BOT_API_SERVER_DIR="/var/lib/telegram-bot-api",
+            BOT_API_LOCAL_DIR=self.directory.name,
+        ):
+            self.assertEqual(botapi.local_path(SimpleNamespace(file_path=server_path)), self.local_file)
+
+    def test_missing_file_falls_back_to_download(self):
+        with mock.patch.multiple(botapi, BOT_API_LOCAL_MODE=True, BOT_API_SERVER_DIR="", BOT_API_LOCAL_DIR=""):
+            self.assertIsNone(botapi.local_path(SimpleNamespace(file_path=self.local_file + ".gone")))
+            self.assertIsNone(botapi.local_path(SimpleNamespace(file_path=None)))
+
+
+@unittest.skipUnless(TELEGRAM_INSTALLED, "python-telegram-bot is not installed")
+class CheckEndpointTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubBotAPI)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        StubBotAPI.requests = []
+        patcher = mock.patch.multiple(
+            botapi,
+            BOT_API_BASE_URL=f"{self.base}/bot",
+            BOT_API_BASE_FILE_URL=f"{self.base}/file/bot",
+            BOT_API_LOCAL_MODE=True,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_stub_server_answers_get_me(self):
+        self.assertTrue(asyncio.run(botapi.check_endpoint(TOKEN)))
+        self.assertIn(f"/bot{TOKEN}/getMe", StubBotAPI.requests)
+
+    def test_rejected_token_is_reported(self):
+        self.assertFalse(asyncio.run(botapi.check_endpoint("654321:WRONG")))
+
+
+if __name__ == "__main__":
+    unittest.main()
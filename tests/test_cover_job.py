@@ -0,0 +1,146 @@
+"""
+Cover job tests against a fake Bot API: videos sent as documents (Telegram
+refuses to re-send a document file_id as a video, so the file is uploaded as
+a new video) and the direct-send fallback to placeholder-and-edit
+"""
+
+import os
+import sys
+import asyncio
+import unittest
+import importlib.util
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BOT_IMPORTABLE = all(importlib.util.find_spec(name) is not None for name in ("telegram", "pymongo"))
+
+if BOT_IMPORTABLE:
+    os.environ["BOT_TOKEN"] = os.environ.get("BOT_TOKEN") or "123456:TEST-token"
+    from telegram import InputFile
+    from telegram.error import BadRequest
+    import bot  # noqa: E402
+    from cover_queue import is_retryable  # noqa: E402
+
+DOCUMENT_ID = "BQACAgIAAxkBAAIBdocument"
+UPLOADED_ID = "BAACAgIAAxkBAAIBvideo"
+
+
+class FakeBot:
+    """Answers like the Bot API: document file_ids are not accepted as videos, uploads are"""
+
+    def __init__(self, file_size: int = 1024, send_error: str = None):
+        self.file_size = file_size
+        self.send_error = send_error
+        self.calls = []
+
+    def _video(self, video):
+        if not isinstance(video, InputFile):
+            raise BadRequest("Type of file mismatch")
+        return SimpleNamespace(message_id=2, video=SimpleNamespace(file_id=UPLOADED_ID, file_unique_id="uploaded"))
+
+    async def send_video(self, chat_id, video, **kwargs):
+        self.calls.append("send_video")
+        if self.send_error:
+            raise BadRequest(self.send_error)
+        return self._video(video)
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.calls.append("send_message")
+        return SimpleNamespace(message_id=1)
+
+    async def edit_message_media(self, chat_id, message_id, media, **kwargs):
+        self.calls.append("edit_message_media")
+        return self._video(media.media)
+
+    async def get_file(self, file_id):
+        self.calls.append("get_file")
+        if self.file_size > 20 * 1024 * 1024:
+            raise BadRequest("File is too big")
+
+        async def download_as_bytearray():
+            return bytearray(b"\x00" * self.file_size)
+        return SimpleNamespace(file_path=None, download_as_bytearray=download_as_bytearray)
+
+
+def document_payload(mode: str, file_size: int = 1024) -> dict:
+    return {
+        "chat_id": 42,
+        "user_id": 42,
+        "username": "tester",
+        "cover": "AgACAgIAAxkBAAIBcover",
+        "thumb_key": None,
+        "overlay": None,
+        "auto_cover": None,
+        "video": DOCUMENT_ID,
+        "video_unique_id": "document",
+        "file_size": file_size,
+        "caption": "Episode 1",
+        "reply_to": 7,
+        "date": "2026-01-01 00:00:00",
+        "mode": mode,
+    }
+
+
+@unittest.skipUnless(BOT_IMPORTABLE, "python-telegram-bot or pymongo is not installed")
+class DocumentPayloadTest(unittest.TestCase):
+    def setUp(self):
+        # Log forwarding and inline results run detached; they are not under test here
+        patcher = mock.patch.object(bot, "spawn", side_effect=lambda coroutine: coroutine.close())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_direct_mode_uploads_the_document_as_a_video(self):
+        fake, payload = FakeBot(), document_payload("direct")
+        asyncio.run(bot.process_cover_job(fake, payload))
+        # No placeholder/edit fallback for a file-type rejection
+        self.assertEqual(fake.calls, ["send_video", "get_file", "send_video"])
+        self.assertEqual(payload["video"], UPLOADED_ID)
+
+    def test_edit_mode_uploads_into_the_placeholder(self):
+        fake, payload = FakeBot(), document_payload("edit")
+        asyncio.run(bot.process_cover_job(fake, payload))
+        self.assertEqual(fake.calls, ["send_message", "edit_message_media", "get_file", "edit_message_media"])
+        self.assertEqual(payload["placeholder_id"], 1)
+        self.assertEqual(payload["video"], UPLOADED_ID)
+
+    def test_file_over_the_download_limit_is_rejected_clearly(self):
+        size = (bot.botapi.DOWNLOAD_LIMIT_MB + 1) * 1024 * 1024
+        fake, payload = FakeBot(size), document_payload("direct", size)
+        with self.assertRaises(ValueError) as raised:
+            asyncio.run(bot.process_cover_job(fake, payload))
+        self.assertIn("ɴᴏᴛ ᴀᴄᴄᴇᴘᴛᴇᴅ ᴀs ᴠɪᴅᴇᴏ", str(raised.exception))
+        # Not retryable: the job is dead-lettered at once with this message
+        self.assertFalse(is_retryable(raised.exception))
+        self.assertEqual(fake.calls, ["send_video"])
+
+    def test_unknown_size_over_the_limit_is_rejected_clearly(self):
+        size = (bot.botapi.DOWNLOAD_LIMIT_MB + 1) * 1024 * 1024
+        fake, payload = FakeBot(size), document_payload("direct", 0)
+        with self.assertRaises(ValueError):
+            asyncio.run(bot.process_cover_job(fake, payload))
+        self.assertEqual(fake.calls, ["send_video", "get_file"])
+
+
+
+@unittest.skipUnless(BOT_IMPORTABLE, "python-telegram-bot or pymongo is not installed")
+class DirectFallbackTest(unittest.TestCase):
+    def send(self, fake):
+        return asyncio.run(bot.apply_cover(fake, 42, InputFile(b"\x00", filename="v.mp4"), "cover", mode="direct"))
+
+    def test_cover_rejection_falls_back_to_edit(self):
+        fake = FakeBot(send_error="Wrong type of cover")
+        _, mode = self.send(fake)
+        self.assertEqual(mode, "edit")
+        self.assertEqual(fake.calls, ["send_video", "send_message", "edit_message_media"])
+
+    def test_other_rejections_are_raised_without_placeholder(self):
+        fake = FakeBot(send_error="Chat not found")
+        with self.assertRaises(BadRequest):
+            self.send(fake)
+        self.assertEqual(fake.calls, ["send_video"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,357 @@
+"""
+Request Tracing for Video Cover Bot
+Sampled trace spans around the steps of handling a video (force-sub check,
+thumbnail lookup, placeholder reply, media edit, log send), carried across
+the cover job queue. Finished spans are exported to a JSONL file and/or an
+OTLP/HTTP collector, and the recent traces are kept in memory for /traces.
+"""
+
+import os
+import json
+import time
+import random
+import asyncio
+import logging
+import secrets
+import functools
+import contextvars
+from collections import OrderedDict, deque
+
+import httpx
+
+from profiles import current_profile
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Share of videos traced (0 = off, 1 = every video)
+TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", "0"))
+# Finished spans are appended here, one JSON object per line (empty = no file)
+TRACE_FILE = os.environ.get("TRACE_FILE", "traces.jsonl")
+# OTLP/HTTP (JSON) collector, e.g. http://127.0.0.1:4318/v1/traces (empty = off)
+TRACE_OTLP_ENDPOINT = os.environ.get("TRACE_OTLP_ENDPOINT", "")
+TRACE_SERVICE_NAME = os.environ.get("TRACE_SERVICE_NAME", "video-cover-bot")
+# Recent traces kept in memory for /traces
+TRACE_KEEP = int(os.environ.get("TRACE_KEEP", "200"))
+# Seconds between exports of finished spans
+TRACE_FLUSH_INTERVAL = float(os.environ.get("TRACE_FLUSH_INTERVAL", "5"))
+
+# Finished spans waiting for export; the oldest are dropped if exports fall behind
+MAX_PENDING_SPANS = 5000
+
+_current = contextvars.ContextVar("trace_span", default=None)
+
+
+class Span:
+    """One timed step of a trace; use as a context manager"""
+
+    __slots__ = ("trace", "span_id", "parent_id", "name", "attrs", "start", "duration", "error", "_started", "_token")
+
+    def __init__(self, trace, name: str, parent_id: str = None, attrs: dict = None):
+        self.trace = trace
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.attrs = attrs or {}
+        self.start = None
+        self.duration = None
+        self.error = None
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self._started
+        _current.reset(self._token)
+        if isinstance(exc, Exception):
+            self.error = f"{exc_type.__name__}: {exc}"[:200]
+        tracer.finish(self)
+        return False
+
+    @property
+    def end(self) -> float:
+        return self.start + self.duration
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": round(self.start, 6),
+            "duration_ms": round(self.duration * 1000, 3),
+            "attrs": self.attrs,
+            "error": self.error,
+        }
+
+
+class _NoSpan:
+    """Stand-in when the current work is not sampled: does nothing"""
+
+    def set(self, **attrs) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NO_SPAN = _NoSpan()
+
+
+class Trace:
+    """The finished spans of one trace seen by this process"""
+
+    __slots__ = ("trace_id", "name", "spans")
+
+    def __init__(self, trace_id: str, name: str):
+        self.trace_id = trace_id
+        self.name = name
+        self.spans = []
+
+    @property
+    def started(self) -> float | None:
+        return min(span.start for span in self.spans) if self.spans else None
+
+    @property
+    def duration(self) -> float:
+        """Seconds from the first span's start to the last span's end"""
+        if not self.spans:
+            return 0.0
+        return max(span.end for span in self.spans) - self.started
+
+    def attr(self, key: str, default=None):
+        for span in self.spans:
+            if key in span.attrs:
+                return span.attrs[key]
+        return default
+
+    def tree(self) -> list:
+        """(depth, span) pairs, children under their parent in start order"""
+        ids = {span.span_id for span in self.spans}
+        children = {}
+        for span in sorted(self.spans, key=lambda s: s.start):
+            parent = span.parent_id if span.parent_id in ids else None
+            children.setdefault(parent, []).append(span)
+        ordered = []
+
+        def walk(parent, depth):
+            for span in children.get(parent, ()):
+                ordered.append((depth, span))
+                walk(span.span_id, depth + 1)
+        walk(None, 0)
+        return ordered
+
+
+def otlp_payload(spans: list) -> dict:
+    """OTLP/HTTP JSON body for finished spans"""
+    def value(v):
+        if isinstance(v, bool):
+            return {"boolValue": v}
+        if isinstance(v, int):
+            return {"intValue": str(v)}
+        if isinstance(v, float):
+            return {"doubleValue": v}
+        return {"stringValue": str(v)}
+
+    otlp_spans = []
+    for span in spans:
+        item = {
+            "traceId": span.trace.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 1,
+            "startTimeUnixNano": str(int(span.start * 1e9)),
+            "endTimeUnixNano": str(int(span.end * 1e9)),
+            "attributes": [{"key": k, "value": value(v)} for k, v in span.attrs.items()],
+            # 1 = OK, 2 = ERROR
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+        }
+        if span.parent_id:
+            item["parentSpanId"] = span.parent_id
+        otlp_spans.append(item)
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": TRACE_SERVICE_NAME}}]},
+        "scopeSpans": [{"scope": {"name": "coverbot.tracing"}, "spans": otlp_spans}],
+    }]}
+
+
+class Tracer:
+    """Sampling decisions, recent traces and the background exporter (one per process)"""
+
+    def __init__(self, sample_rate: float = TRACE_SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self._traces = OrderedDict()
+        self._pending = deque(maxlen=MAX_PENDING_SPANS)
+        self._task = None
+        self._client = None
+        self.sampled = 0
+        self.exported = 0
+        self.export_errors = 0
+        # Spans no export target accepted, or pushed out of a full pending queue
+        self.dropped = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0
+
+    def _trace(self, trace_id: str, name: str) -> Trace:
+        trace = self._traces.get(trace_id)
+        if trace is None:
+            trace = self._traces[trace_id] = Trace(trace_id, name)
+            while len(self._traces) > TRACE_KEEP:
+                self._traces.popitem(last=False)
+        return trace
+
+    def start_trace(self, name: str, **attrs):
+        """Root span of a new trace, if this one is sampled (a child span inside an open trace)"""
+        parent = _current.get()
+        if parent is not None:
+            return Span(parent.trace, name, parent.span_id, attrs)
+        if not self.enabled or random.random() >= self.sample_rate:
+            return NO_SPAN
+        self.sampled += 1
+        attrs.setdefault("bot", current_profile().name)
+        return Span(self._trace(secrets.token_hex(16), name), name, None, attrs)
+
+    def resume_trace(self, name: str, context: dict | None, **attrs):
+        """Continue a trace handed over with `current_context()` (e.g. through the job queue)"""
+        if not context or not context.get("trace_id"):
+            return NO_SPAN
+        trace = self._trace(context["trace_id"], name)
+        return Span(trace, name, context.get("span_id"), attrs)
+
+    def finish(self, span: Span) -> None:
+        span.trace.spans.append(span)
+        if len(self._pending) == self._pending.maxlen:
+            self.dropped += 1
+        self._pending.append(span)
+
+    def slowest(self, limit: int = 5) -> list:
+        traces = [trace for trace in self._traces.values() if trace.spans]
+        return sorted(traces, key=lambda t: t.duration, reverse=True)[:limit]
+
+    def stats(self) -> dict:
+        return {
+            "sample_rate": self.sample_rate,
+            "sampled": self.sampled,
+            "kept": len(self._traces),
+            "pending": len(self._pending),
+            "exported": self.exported,
+            "export_errors": self.export_errors,
+            "dropped": self.dropped,
+        }
+
+    async def start(self) -> None:
+        """Start the exporter (once per process; later calls are no-ops)"""
+        if not self.enabled or self._task or not (TRACE_FILE or TRACE_OTLP_ENDPOINT):
+            return
+        if TRACE_OTLP_ENDPOINT:
+            self._client = httpx.AsyncClient(timeout=10)
+        self._task = asyncio.create_task(self._export_loop())
+        targets = ", ".join(filter(None, [TRACE_FILE, TRACE_OTLP_ENDPOINT]))
+        logger.info(f"🔍 Tracing {self.sample_rate:.1%} of videos -> {targets}")
+
+    async def stop(self) -> None:
+        if not self._task:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        await self.flush()
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+
+    async def _export_loop(self) -> None:
+        while True:
+            await asyncio.sleep(TRACE_FLUSH_INTERVAL)
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Export the finished spans; a batch no target accepted is dropped"""
+        if not self._pending:
+            return
+        batch = list(self._pending)
+        self._pending.clear()
+        accepted = False
+        if TRACE_FILE:
+            try:
+                await asyncio.to_thread(self._write, batch)
+                accepted = True
+            except OSError as e:
+                self.export_errors += 1
+                logger.warning(f"⚠️ Could not write traces to {TRACE_FILE}: {e}")
+        if self._client:
+            try:
+                response = await self._client.post(TRACE_OTLP_ENDPOINT, json=otlp_payload(batch))
+                response.raise_for_status()
+                accepted = True
+            except httpx.HTTPError as e:
+                self.export_errors += 1
+                logger.warning(f"⚠️ OTLP trace export failed: {e}")
+        if accepted:
+            self.exported += len(batch)
+        else:
+            self.dropped += len(batch)
+
+    @staticmethod
+    def _write(batch: list) -> None:
+        with open(TRACE_FILE, "a", encoding="utf-8") as f:
+            for span in batch:
+                f.write(json.dumps(span.to_dict(), ensure_ascii=False, default=str) + "\n")
+
+
+tracer = Tracer()
+
+
+def span(name: str, **attrs):
+    """Child span of the current span; does nothing outside a sampled trace"""
+    parent = _current.get()
+    if parent is None:
+        return NO_SPAN
+    return Span(parent.trace, name, parent.span_id, attrs)
+
+
+def annotate(**attrs) -> None:
+    """Add attributes to the current span"""
+    current = _current.get()
+    if current is not None:
+        current.set(**attrs)
+
+
+def current_context() -> dict | None:
+    """Serializable reference to the current span, for `resume_trace` in another task or process"""
+    current = _current.get()
+    if current is None:
+        return None
+    return {"trace_id": current.trace.trace_id, "span_id": current.span_id}
+
+
+async def traced(name: str, aw):
+    """Await `aw` inside a span (for calls handed to gather/fan_out)"""
+    with span(name):
+        return await aw
+
+
+def trace(name: str):
+    """Decorator: run an async function as the root span of a sampled trace"""
+    def decorate(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with tracer.start_trace(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+start_trace = tracer.start_trace
+resume_trace = tracer.resume_trace
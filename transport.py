@@ -0,0 +1,170 @@
+"""
+HTTP Transport for Video Cover Bot
+Tuned HTTPX connection pools: one for interactive and cover calls, a
+smaller one for background sends (broadcasts, logs) and a dedicated one for
+getUpdates, each reporting utilization and slot wait times.
+"""
+
+import os
+import time
+import asyncio
+import logging
+import functools
+import importlib.util
+
+from telegram.error import TimedOut
+from telegram.request import HTTPXRequest
+
+import metrics
+from profiles import ProfileLocal
+from scheduler import PRIORITY_BACKGROUND, current_priority
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Connections for interactive replies and cover sends
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", "64"))
+# Connections for background sends; they can never take the interactive pool's slots
+HTTP_BACKGROUND_POOL_SIZE = int(os.environ.get("HTTP_BACKGROUND_POOL_SIZE", "8"))
+# "1.1" or "2" (HTTP/2 needs the h2 package: pip install httpx[http2])
+HTTP_VERSION = os.environ.get("HTTP_VERSION", "1.1")
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT", "5"))
+HTTP_WRITE_TIMEOUT = float(os.environ.get("HTTP_WRITE_TIMEOUT", "20"))
+# Seconds a call may wait for a free connection before failing with TimedOut
+HTTP_POOL_TIMEOUT = float(os.environ.get("HTTP_POOL_TIMEOUT", "3"))
+# getUpdates: added on top of the long-poll timeout
+HTTP_UPDATES_READ_TIMEOUT = float(os.environ.get("HTTP_UPDATES_READ_TIMEOUT", "5"))
+
+
+@functools.cache
+def http_version() -> str:
+    if HTTP_VERSION == "2" and importlib.util.find_spec("h2") is None:
+        logger.warning("⚠️ HTTP_VERSION=2 needs the h2 package (pip install httpx[http2]) - using HTTP/1.1")
+        return "1.1"
+    return HTTP_VERSION
+
+
+def api_method(url: str) -> str:
+    """Bot API method of a request URL; file downloads share one name"""
+    if "/file/bot" in url:
+        return "download"
+    return url.rsplit("/", 1)[-1]
+
+
+class InstrumentedRequest(HTTPXRequest):
+    """
+    HTTPXRequest that admits calls through a semaphore sized like its pool, so the
+    time spent waiting for a connection and the pool's occupancy can be measured.
+    """
+
+    def __init__(self, name: str, connection_pool_size: int, pool_timeout: float = HTTP_POOL_TIMEOUT, **kwargs):
+        super().__init__(
+            connection_pool_size=connection_pool_size,
+            pool_timeout=pool_timeout,
+            http_version=http_version(),
+            **kwargs
+        )
+        self.name = name
+        self.size = connection_pool_size
+        self.pool_timeout = pool_timeout
+        self._slots = asyncio.Semaphore(connection_pool_size)
+        self.in_use = 0
+        self.peak = 0
+        self.waiting = 0
+        self.requests = 0
+        self.timeouts = 0
+
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        started = time.monotonic()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.pool_timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            metrics.incr(f"http.{self.name}.pool_timeouts")
+            raise TimedOut(f"Pool timeout: all {self.size} '{self.name}' connections are occupied")
+        finally:
+            self.waiting -= 1
+        acquired = time.monotonic()
+        metrics.observe(f"http.{self.name}.wait", acquired - started)
+        self.in_use += 1
+        self.peak = max(self.peak, self.in_use)
+        name = f"api.{api_method(url)}"
+        try:
+            with metrics.tracked(name):
+                status, payload = await super().do_request(url, method, *args, **kwargs)
+            if status >= 400:
+                metrics.incr(f"{name}.errors")
+            return status, payload
+        except TimedOut:
+            self.timeouts += 1
+            raise
+        finally:
+            self.in_use -= 1
+            self.requests += 1
+            self._slots.release()
+            metrics.observe(f"http.{self.name}", time.monotonic() - acquired)
+
+    def stats(self) -> dict:
+        wait = metrics.summary(f"http.{self.name}.wait")
+        latency = metrics.summary(f"http.{self.name}")
+        return {
+            "size": self.size,
+            "in_use": self.in_use,
+            "peak": self.peak,
+            "waiting": self.waiting,
+            "requests": self.requests,
+            "timeouts": self.timeouts,
+            "p95_wait": wait["p95"],
+            "p95_latency": latency["p95"],
+        }
+
+
+class PriorityRoutedRequest(InstrumentedRequest):
+    """The bot's main request: background-priority calls are handed to their own pool"""
+
+    def __init__(self, background: InstrumentedRequest, **kwargs):
+        super().__init__(**kwargs)
+        self.background = background
+
+    async def initialize(self) -> None:
+        await asyncio.gather(super().initialize(), self.background.initialize())
+
+    async def shutdown(self) -> None:
+        await asyncio.gather(super().shutdown(), self.background.shutdown())
+
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        # Set by the rate limiter for the call being sent
+        if current_priority.get() == PRIORITY_BACKGROUND:
+            return await self.background.do_request(url, method, *args, **kwargs)
+        return await super().do_request(url, method, *args, **kwargs)
+
+
+# Pools of each bot, by name
+pools = ProfileLocal(dict)
+
+
+def configure(builder):
+    """Give an ApplicationBuilder the tuned pools (replaces its default HTTPXRequest objects)"""
+    timeouts = {
+        "connect_timeout": HTTP_CONNECT_TIMEOUT,
+        "read_timeout": HTTP_READ_TIMEOUT,
+        "write_timeout": HTTP_WRITE_TIMEOUT,
+    }
+    background = InstrumentedRequest("background", HTTP_BACKGROUND_POOL_SIZE, **timeouts)
+    main = PriorityRoutedRequest(background, name="api", connection_pool_size=HTTP_POOL_SIZE, **timeouts)
+    # One long poll at a time; never competes with sends for a connection
+    updates = InstrumentedRequest(
+        "updates", 1,
+        connect_timeout=HTTP_CONNECT_TIMEOUT,
+        read_timeout=HTTP_UPDATES_READ_TIMEOUT,
+        write_timeout=HTTP_WRITE_TIMEOUT,
+    )
+    pools.current().update({"api": main, "background": background, "updates": updates})
+    return builder.request(main).get_updates_request(updates)
+
+
+def stats() -> dict:
+    """Per-pool utilization of the current bot"""
+    return {name: request.stats() for name, request in pools.current().items()}
@@ -1,40 +1,194 @@
 import os
-import subprocess
+import ast
+import sys
+import asyncio
 import logging
+import importlib.util
+
+from config import config
 
 logger = logging.getLogger(__name__)
 
-UPSTREAM_REPO = os.environ.get("UPSTREAM_REPO")
-UPSTREAM_BRANCH = os.environ.get("UPSTREAM_BRANCH", "")
+UPSTREAM_REPO = getattr(config, "UPSTREAM_REPO", None)
+UPSTREAM_BRANCH = getattr(config, "UPSTREAM_BRANCH", "")
+# Per-command timeout in seconds
+UPDATE_STEP_TIMEOUT = int(os.environ.get("UPDATE_STEP_TIMEOUT", "120"))
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Handlers that make a failed import optional (the module copes without it)
+OPTIONAL_IMPORT_ERRORS = {"ImportError", "ModuleNotFoundError", "Exception"}
+
+
+async def run_cmd(cmd: str, timeout: int = UPDATE_STEP_TIMEOUT) -> tuple[int, str]:
+    """Run a shell command without blocking the event loop. Returns (exit code, output)"""
+    proc = await asyncio.create_subprocess_shell(
+        cmd,
+        cwd=REPO_DIR,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+    )
+    try:
+        output, _ = await asyncio.wait_for(proc.communicate(), timeout=timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        return -1, f"timed out after {timeout}s"
+    return proc.returncode, output.decode(errors="replace").strip()
+
+
+async def _report(progress, text: str) -> None:
+    if progress is None:
+        return
+    try:
+        await progress(text)
+    except Exception as e:
+        logger.debug(f"Progress update failed: {e}")
+
+
+def _module_imports(body: list):
+    """Import statements run at module level, skipping those guarded by `except ImportError`"""
+    for node in body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            yield node
+        elif isinstance(node, ast.Try):
+            handled = {
+                getattr(name, "id", None)
+                for handler in node.handlers
+                for name in (handler.type.elts if isinstance(handler.type, ast.Tuple) else [handler.type])
+            }
+            if not handled & OPTIONAL_IMPORT_ERRORS:
+                yield from _module_imports(node.body)
+        elif isinstance(node, ast.If):
+            yield from _module_imports(node.body)
+            yield from _module_imports(node.orelse)
+
+
+def _defined_names(tree) -> set:
+    """Names a module defines (permissive: any name bound anywhere in it)"""
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            names.update((alias.asname or alias.name).split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+            names.add(node.id)
+    return names
+
 
+def check_imports(root: str = REPO_DIR) -> list:
+    """
+    Module-level imports of the tree that would fail, found without running any
+    of it (importing bot.py would connect to MongoDB and load the live profiles):
+    packages that are not installed, and names missing from the tree's own modules.
+    """
+    trees = {}
+    for filename in sorted(os.listdir(root)):
+        if filename.endswith(".py"):
+            with open(os.path.join(root, filename), "r", encoding="utf-8") as f:
+                trees[filename[:-3]] = ast.parse(f.read(), filename)
 
-def run_cmd(cmd: str) -> int:
-    return subprocess.call(cmd, shell=True)
+    problems = []
+    for module, tree in trees.items():
+        for node in _module_imports(tree.body):
+            if isinstance(node, ast.ImportFrom) and node.level:
+                continue
+            targets = [node.module] if isinstance(node, ast.ImportFrom) else [a.name for a in node.names]
+            for target in targets:
+                top = target.split(".")[0]
+                if top in trees:
+                    continue
+                try:
+                    found = importlib.util.find_spec(top) is not None
+                except (ImportError, ValueError):
+                    found = False
+                if not found:
+                    problems.append(f"{module}.py: module '{top}' not installed")
+            if isinstance(node, ast.ImportFrom) and node.module in trees:
+                defined = _defined_names(trees[node.module])
+                for alias in node.names:
+                    if alias.name != "*" and alias.name not in defined:
+                        problems.append(f"{module}.py: '{alias.name}' not found in {node.module}.py")
+    return problems
 
 
-def update_from_upstream() -> bool:
+async def verify_tree() -> tuple[bool, str]:
+    """
+    Byte-compile the tree and check its imports statically. Nothing in the new
+    tree is executed, so verification has no side effects on the live database.
+    """
+    code, output = await run_cmd(f"{sys.executable} -m compileall -q .")
+    if code != 0:
+        return False, output or "compileall failed"
+
+    try:
+        problems = await asyncio.to_thread(check_imports)
+    except (OSError, SyntaxError) as e:
+        return False, f"import check failed: {e}"
+    if problems:
+        return False, "\n".join(problems[:20])
+    return True, ""
+
+
+async def update_from_upstream(progress=None) -> bool:
+    """
+    Fetch and apply upstream changes, verify the new tree and roll back on failure.
+    `progress` is an optional `async def progress(text)` called after each step.
+    """
     if not UPSTREAM_REPO:
         logger.error("UPSTREAM_REPO not set")
         return False
 
     logger.info("Starting upstream update...")
 
-    cmds = [
+    prepare = [
         "git init",
         "git config user.name 'bot-updater'",
         "git config user.email 'bot@localhost'",
         "git add .",
         "git commit -m 'local changes' || true",
-        f"git remote remove origin || true",
+        "git remote remove origin || true",
         f"git remote add origin {UPSTREAM_REPO}",
-        "git fetch origin",
-        f"git reset --hard origin/{UPSTREAM_BRANCH}",
     ]
-
-    for cmd in cmds:
-        if run_cmd(cmd) != 0:
-            logger.error(f"Command failed: {cmd}")
+    for cmd in prepare:
+        code, output = await run_cmd(cmd)
+        if code != 0:
+            logger.error(f"Command failed: {cmd}\n{output}")
+            await _report(progress, f"❌ {cmd}")
             return False
+    await _report(progress, "✅ ʀᴇᴘᴏsɪᴛᴏʀʏ ᴘʀᴇᴘᴀʀᴇᴅ")
+
+    # Remember the current revision so a bad update can be rolled back
+    code, previous_head = await run_cmd("git rev-parse HEAD")
+    previous_head = previous_head if code == 0 else None
+
+    code, output = await run_cmd("git fetch origin")
+    if code != 0:
+        logger.error(f"Command failed: git fetch origin\n{output}")
+        await _report(progress, "❌ ꜰᴇᴛᴄʜ ꜰᴀɪʟᴇᴅ")
+        return False
+    await _report(progress, "✅ ᴜᴘsᴛʀᴇᴀᴍ ꜰᴇᴛᴄʜᴇᴅ")
+
+    code, output = await run_cmd(f"git reset --hard origin/{UPSTREAM_BRANCH}")
+    if code != 0:
+        logger.error(f"Command failed: git reset --hard origin/{UPSTREAM_BRANCH}\n{output}")
+        await _report(progress, "❌ ʀᴇsᴇᴛ ꜰᴀɪʟᴇᴅ")
+        return False
+    await _report(progress, "✅ ɴᴇᴡ ᴛʀᴇᴇ ᴄʜᴇᴄᴋᴇᴅ ᴏᴜᴛ")
+
+    ok, reason = await verify_tree()
+    if not ok:
+        logger.error(f"Verification of updated tree failed:\n{reason}")
+        await _report(progress, "❌ ᴠᴇʀɪꜰɪᴄᴀᴛɪᴏɴ ꜰᴀɪʟᴇᴅ - ʀᴏʟʟɪɴɢ ʙᴀᴄᴋ")
+        if previous_head:
+            code, output = await run_cmd(f"git reset --hard {previous_head}")
+            if code != 0:
+                logger.error(f"Rollback failed:\n{output}")
+            else:
+                logger.info(f"Rolled back to {previous_head}")
+        return False
+    await _report(progress, "✅ ɴᴇᴡ ᴛʀᴇᴇ ᴠᴇʀɪꜰɪᴇᴅ")
 
     logger.info("Upstream update successful")
     return True